@@ -0,0 +1,72 @@
+# filename: action_executor.py
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from clock import RealClock
+
+# ผลของ Action หนึ่งครั้ง (หลัง retry ครบแล้ว): error = None เมื่อสำเร็จ
+# key = ชื่อที่ใช้เก็บ cooldown / ความล้มเหลว (ปกติเท่ากับ action แต่ Action ชนิดเดียวกันที่ต่างวัตถุประสงค์ใช้ key แยกได้)
+ActionResult = collections.namedtuple('ActionResult', ['action', 'params', 'duration', 'error', 'attempts', 'elapsed', 'key'])
+
+class _Pending:
+    __slots__ = ('action', 'params', 'duration', 'key', 'future', 'attempts', 'started', 'submitted', 'retry_at')
+    def __init__(self, action, params, duration, now, key):
+        self.action = action; self.params = params; self.duration = duration; self.key = key
+        self.future = None; self.attempts = 0; self.started = now; self.submitted = now; self.retry_at = None
+
+class ActionExecutor:
+    """
+    รัน subprocess.run(action, params) บน thread pool แทนการเรียกตรงใน tick ของ Agent:
+    - submit() คืนทันที; Action key เดียวกันที่ยังค้างอยู่ (กำลังรันหรือรอ retry) จะถูกรวม (coalesce) ไม่ส่งซ้ำ
+    - ความล้มเหลวชนิด retry_on (เช่น PermissionError จากระบบที่เครียด) ถูกลองใหม่แบบ exponential backoff สูงสุด retries ครั้ง
+    - Action ที่เกิน timeout วินาทีถูกรายงานเป็น TimeoutError (thread ที่ค้างอยู่ถูกปล่อยทิ้ง ไม่บล็อก Agent)
+    - poll() คืน ActionResult ที่จบแล้วให้ Agent นำไปอัปเดต failure_tracker / active_optimizations
+    backend ของ subprocess ต้องปลอดภัยเมื่อถูกเรียกจาก thread อื่น (เช่น DryRunSubprocess หรือระบบจริง)
+    """
+    def __init__(self, subprocess, max_workers=4, timeout=5.0, retries=2, backoff=0.5, retry_on=(PermissionError,), clock=None):
+        self.subprocess = subprocess; self.timeout = timeout; self.retries = retries; self.backoff = backoff
+        self.retry_on = retry_on; self.clock = clock or RealClock()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="action")
+        self._pending = {} # key -> _Pending
+        self.counters = {'submitted': 0, 'coalesced': 0, 'retries': 0, 'timeouts': 0, 'successes': 0, 'failures': 0}
+
+    def __len__(self): return len(self._pending)
+    def in_flight(self, key): return key in self._pending
+
+    def submit(self, action_name, params, duration=60, key=None):
+        """ส่ง Action เข้าคิว คืน False ถ้าถูกรวมกับ Action key เดียวกันที่ยังไม่จบ (key ตั้งต้น = action_name)"""
+        key = key or action_name
+        if key in self._pending: self.counters['coalesced'] += 1; return False
+        pending = self._pending[key] = _Pending(action_name, dict(params), duration, self.clock.now(), key)
+        self._start(pending); self.counters['submitted'] += 1
+        return True
+
+    def _start(self, pending):
+        pending.attempts += 1; pending.retry_at = None; pending.submitted = self.clock.now()
+        pending.future = self.pool.submit(self.subprocess.run, pending.action, pending.params)
+
+    def _finish(self, pending, error, now):
+        del self._pending[pending.key]
+        self.counters['successes' if error is None else 'failures'] += 1
+        return ActionResult(pending.action, pending.params, pending.duration, error, pending.attempts, now - pending.started, pending.key)
+
+    def poll(self):
+        """เก็บผลของ Action ที่จบแล้ว ส่ง retry ที่ถึงเวลา และตัด Action ที่เกินเวลา (ไม่บล็อก)"""
+        if not self._pending: return []
+        now = self.clock.now(); results = []
+        for pending in list(self._pending.values()):
+            if pending.retry_at is not None:
+                if now >= pending.retry_at: self._start(pending); self.counters['retries'] += 1
+                continue
+            future = pending.future
+            if future.done():
+                error = future.exception()
+                if error is not None and isinstance(error, self.retry_on) and pending.attempts <= self.retries:
+                    pending.retry_at = now + self.backoff * 2 ** (pending.attempts - 1); continue
+                results.append(self._finish(pending, error, now))
+            elif self.timeout is not None and now - pending.submitted > self.timeout:
+                future.cancel(); self.counters['timeouts'] += 1
+                results.append(self._finish(pending, TimeoutError(f"{pending.action} timed out after {self.timeout:g}s"), now))
+        return results
+
+    def shutdown(self, wait=False):
+        self.pool.shutdown(wait=wait, cancel_futures=True); self._pending.clear()
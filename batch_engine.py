@@ -0,0 +1,314 @@
+# filename: batch_engine.py
+import argparse
+import numpy as np
+from simulation_env import SimulationEnvironment, PROTECTED_APPS
+from isolated_agent import Strategy, ACTION_NAMES
+from policy import load_policy
+from scoring import ScoringEngine, load_rules
+
+# ลำดับคอลัมน์ต้องตรงกับลำดับใน Enum เพื่อให้ argmax เลือกกลยุทธ์แบบเดียวกับ max(scores, key=scores.get)
+STRATEGIES = tuple(Strategy)
+STRATEGY_INDEX = {s: i for i, s in enumerate(STRATEGIES)}
+GOVERNORS = ('schedutil', 'performance', 'powersave')
+APP_STATES = ('idle', 'active') # ค่า -1 ในเมทริกซ์ = แอปไม่ได้ทำงาน
+ACTIONS = ACTION_NAMES
+
+_DEFAULT_RES = {'cpu': [1, 0], 'mem': 1}
+_GOVERNOR_FOR_STRATEGY = np.array([
+    GOVERNORS.index("performance" if s in (Strategy.GAMING, Strategy.WORKSTATION) else "powersave" if s == Strategy.POWER_SAVE else "schedutil")
+    for s in STRATEGIES], dtype=np.int8)
+
+def _rows(mask):
+    return slice(None) if mask is None else mask
+
+class BatchSimulationEnvironment:
+    """
+    SimulationEnvironment หลายร้อย/หลายพันตัวที่เก็บสถานะเป็นคอลัมน์ NumPy และก้าวไปพร้อมกันในครั้งเดียว
+    ใช้กฎ thrashing, การลดลงของ io_wait และ CPU spike เดียวกับ SimulationEnvironment.update_system_load
+    หากแก้ไข app_state โดยตรง (ไม่ผ่าน add_app/remove_app/set_app_state) ต้องเพิ่มค่า app_version ด้วย
+    """
+    def __init__(self, n, seed=None, resource_map=None, apps=()):
+        self.n = n; self.rng = np.random.default_rng(seed)
+        self.resource_map = resource_map if resource_map is not None else SimulationEnvironment.default_resource_map()
+        self.app_names = list(self.resource_map) + [a for a in apps if a not in self.resource_map]
+        self.app_index = {name: i for i, name in enumerate(self.app_names)}
+        n_apps = len(self.app_names)
+
+        # ตาราง [app, state] ที่คำนวณไว้ล่วงหน้า แทนการค้น dict ทุก tick
+        self._base_cpu = np.empty((n_apps, len(APP_STATES))); self._spike_cpu = np.empty_like(self._base_cpu); self._mem = np.empty_like(self._base_cpu)
+        for a, name in enumerate(self.app_names):
+            for s, state in enumerate(APP_STATES):
+                res = self.resource_map.get(name, {}).get(state, _DEFAULT_RES)
+                self._base_cpu[a, s], self._spike_cpu[a, s] = res['cpu']; self._mem[a, s] = res['mem']
+        self._killable = np.array([name not in PROTECTED_APPS for name in self.app_names])
+
+        self.cpu_percent = np.full(n, 5.0); self.mem_percent = np.full(n, 18.0)
+        self.io_wait = np.zeros(n); self.system_stress_factor = np.ones(n)
+        self.governor = np.zeros(n, dtype=np.int8)
+        self.app_state = np.full((n, n_apps), -1, dtype=np.int8)
+        self.app_version = 0; self._profile_version = -1 # เพิ่มทุกครั้งที่ app_state เปลี่ยน
+        for name in ('python3', 'cinnamon'): self.add_app(name)
+        self.kill_count = np.zeros(n, dtype=np.int64)
+
+    def _app(self, app_name):
+        if app_name not in self.app_index: raise KeyError(f"Unknown app '{app_name}'; pass it via apps=... when creating the batch")
+        return self.app_index[app_name]
+
+    # การกระทำของผู้ใช้/Scenario: mask เลือกว่าจะกระทำกับ sandbox ใดบ้าง (None = ทั้งหมด)
+    def add_app(self, app_name, state='idle', mask=None): self.app_state[_rows(mask), self._app(app_name)] = APP_STATES.index(state); self.app_version += 1
+    def remove_app(self, app_name, mask=None): self.app_state[_rows(mask), self._app(app_name)] = -1; self.app_version += 1
+    def set_app_state(self, app_name, new_state, mask=None):
+        col = self.app_state[:, self._app(app_name)]; running = col >= 0
+        if mask is not None: running &= self._mask(mask)
+        col[running] = APP_STATES.index(new_state); self.app_version += 1
+    def close_all_apps(self, mask=None):
+        self.app_state[_rows(mask), self._killable] = -1; self.app_version += 1
+    def trigger_memory_stress(self, level=95.0, mask=None): self.mem_percent[_rows(mask)] = level
+    def trigger_io_stress(self, level=40.0, mask=None): self.io_wait[_rows(mask)] = level
+
+    def _mask(self, mask):
+        m = np.zeros(self.n, dtype=bool); m[mask] = True; return m
+
+    def running_mask(self): return self.app_state >= 0
+
+    def _refresh_profiles(self):
+        # ผลรวม base cpu/mem และ spike ต่อแอปเปลี่ยนเฉพาะเมื่อมีการเปิด/ปิด/เปลี่ยนสถานะแอป จึงคำนวณใหม่เฉพาะตอนนั้น
+        running = self.app_state >= 0; st = np.maximum(self.app_state, 0); cols = np.arange(len(self.app_names))
+        self._spike_cols = np.flatnonzero((running & (self._spike_cpu[cols, st] > 0)).any(axis=0))
+        self._cur_spike = np.where(running, self._spike_cpu[cols, st], 0.0)[:, self._spike_cols]
+        self._base_cpu_sum = np.where(running, self._base_cpu[cols, st], 0.0).sum(axis=1)
+        self._base_mem_sum = np.where(running, self._mem[cols, st], 0.0).sum(axis=1)
+        self._profile_version = self.app_version
+
+    def update_system_load(self):
+        if self._profile_version != self.app_version: self._refresh_profiles()
+        spikes = self.rng.random(self._cur_spike.shape) < 0.1 # สุ่ม spike เฉพาะคอลัมน์แอปที่มี spike จริง
+        potential_cpu = self._base_cpu_sum + (spikes * self._cur_spike).sum(axis=1)
+        base_mem = self._base_mem_sum
+
+        # System Thrashing Logic (แบบเวกเตอร์)
+        thrashing = potential_cpu > 100
+        self.system_stress_factor = np.where(thrashing, potential_cpu / 100.0, 1.0)
+        actual_cpu = np.where(thrashing, 100 - (self.system_stress_factor - 1) * 10, potential_cpu)
+        self.io_wait = np.where(thrashing, np.minimum(99.0, self.io_wait + self.system_stress_factor * 5), np.maximum(0.0, self.io_wait - 5))
+
+        self.cpu_percent = np.minimum(99.9, actual_cpu + self.rng.uniform(-2, 2, self.n))
+        mem_noise = self.rng.uniform(-1, 1, self.n)
+        self.mem_percent = np.where(self.mem_percent < 90, np.minimum(99.9, base_mem + mem_noise), self.mem_percent)
+
+    def kill_most_mem_proc(self, mask):
+        """ฆ่าแอปผู้ใช้ที่ใช้ mem สูงสุดใน sandbox ที่ mask เลือก คืนค่า mask ของ sandbox ที่ฆ่าได้จริง"""
+        # จัดอันดับด้วย mem ของสถานะปัจจุบันของแต่ละแอป เหมือน ProcessTable.top_mem()
+        candidates = (self.app_state >= 0) & self._killable; cols = np.arange(len(self.app_names))
+        rank = np.where(candidates, self._mem[cols, np.maximum(self.app_state, 0)], -1.0)
+        target = rank.argmax(axis=1); rows = np.arange(self.n)
+        killed = mask & (rank[rows, target] >= 0)
+        self.app_state[rows[killed], target[killed]] = -1; self.kill_count += killed; self.app_version += 1
+        return killed
+
+    def sandbox_state(self, i):
+        """คืนสถานะของ sandbox ตัวที่ i ในรูปแบบเดียวกับ SimulationEnvironment.state"""
+        running = {name: {'state': APP_STATES[self.app_state[i, a]]} for a, name in enumerate(self.app_names) if self.app_state[i, a] >= 0}
+        return {'cpu_percent': float(self.cpu_percent[i]), 'mem_percent': float(self.mem_percent[i]), 'running_apps': running,
+                'governor': GOVERNORS[self.governor[i]], 'resource_map': self.resource_map,
+                'io_wait': float(self.io_wait[i]), 'system_stress_factor': float(self.system_stress_factor[i])}
+
+class BatchNeuralAI:
+    """
+    คู่ขนานแบบ batch ของ PanyarinNeuralAI: ตัดสินใจให้ทุก sandbox ใน BatchSimulationEnvironment พร้อมกัน
+    เวลาของ AI นับจาก tick (tick_seconds ต่อ tick) จึงไม่ต้องรอนาฬิกาจริง และไม่มีการพิมพ์ Log ราย sandbox
+    เกณฑ์ทั้งหมดมาจาก AgentPolicy และคะแนนจากตารางกฎเดียวกับ Agent ปกติ (ScoringEngine) จึงตัดสินใจเหมือนกันเมื่อเห็นสถานะเดียวกัน
+    ยังไม่รองรับ forecast_mem / forecast_io
+    """
+    HISTORY_LEN = 10
+
+    def __init__(self, batch_env, tick_seconds=1.0, policy=None, scoring_rules=None):
+        self.env = batch_env; n = batch_env.n; self.n = n; self.tick_seconds = tick_seconds
+        self.policy = policy = policy or load_policy()
+        if policy.forecast_mem or policy.forecast_io: raise ValueError("BatchNeuralAI does not support forecast_mem / forecast_io policies")
+        self.tick_counter = 0; self.now = 0.0
+        self.current_strategy = np.full(n, STRATEGY_INDEX[Strategy.DEFAULT], dtype=np.int8)
+        self.strategy_weights = np.ones((n, len(STRATEGIES)))
+        self.expiry = np.full((n, len(ACTIONS)), -np.inf) # active_optimizations
+        self.last_failure = np.full((n, len(ACTIONS)), np.nan) # failure_tracker
+        self._hist_strategy = np.zeros((n, self.HISTORY_LEN), dtype=np.int8); self._hist_cpu = np.zeros((n, self.HISTORY_LEN))
+        self._hist_io = np.zeros((n, self.HISTORY_LEN)); self._hist_failures = np.zeros((n, self.HISTORY_LEN), dtype=np.int16)
+        self._hist_len = 0
+        self.action_attempts = np.zeros(len(ACTIONS), dtype=np.int64); self.action_failures = np.zeros(len(ACTIONS), dtype=np.int64)
+        self.reflex_active = np.zeros(n, dtype=bool)
+
+        # ตารางกฎที่ ScoringEngine แปลงแล้ว -> เมทริกซ์: กฎแอปแต่ละข้อเป็นรายการคอลัมน์แอปของ batch (แอปที่ batch ไม่รู้จักไม่มีทางทำงาน)
+        rules = scoring_rules if isinstance(scoring_rules, dict) else load_rules(scoring_rules)
+        engine = ScoringEngine(rules, policy, STRATEGIES); idx = batch_env.app_index
+        self._base_vector = np.array(engine.base, dtype=float); self._app_rule_vectors = np.array(engine.app_vectors, dtype=float).reshape(-1, len(STRATEGIES))
+        self._app_rule_cols = [[idx[app] for app, bits in engine.app_bits.items() if bits >> i & 1 and app in idx] for i in range(len(engine.app_vectors))]
+        self._cpu_rules = [(above, below, fewer, tuple((k, x) for k, x in enumerate(v) if x)) for above, below, fewer, v in engine.cpu_rules] # เฉพาะคอลัมน์ที่กฎให้คะแนน
+        self._dampers = engine.dampers; self._io_high = engine.io_high
+        self._app_scores_version = -1
+
+    def failure_count(self): return (~np.isnan(self.last_failure)).sum(axis=1)
+
+    def strategy_counts(self):
+        counts = np.bincount(self.current_strategy, minlength=len(STRATEGIES))
+        return {s: int(counts[i]) for i, s in enumerate(STRATEGIES)}
+
+    def _app_scores(self):
+        # คะแนนส่วนที่ขึ้นกับชุดแอปอย่างเดียว คำนวณใหม่เมื่อ app_version ของ env เปลี่ยน
+        if self._app_scores_version != self.env.app_version:
+            running = self.env.running_mask()
+            hits = np.zeros((self.n, len(self._app_rule_cols)))
+            for i, cols in enumerate(self._app_rule_cols):
+                if cols: hits[:, i] = running[:, cols].any(axis=1)
+            self._base_scores = self._base_vector + hits @ self._app_rule_vectors; self._n_apps = running.sum(axis=1)
+            self._app_scores_version = self.env.app_version
+        return self._base_scores, self._n_apps
+
+    def strategic_assessment(self, cpu, io_wait):
+        base_scores, n_apps = self._app_scores(); scores = base_scores.copy()
+        for above, below, fewer, columns in self._cpu_rules:
+            hit = None
+            for cond in ((cpu > above) if above is not None else None, (cpu < below) if below is not None else None, (n_apps < fewer) if fewer is not None else None):
+                if cond is not None: hit = cond if hit is None else hit & cond
+            if hit is None: hit = np.ones(self.n, dtype=bool)
+            for k, x in columns: scores[:, k] += hit * x
+
+        high_io = io_wait > self._io_high
+        for k, damper in self._dampers: scores[:, k] *= np.where(high_io, damper, 1.0)
+        scores *= self.strategy_weights
+
+        new_strategy = scores.argmax(axis=1).astype(np.int8)
+        changed = new_strategy != self.current_strategy
+        self.current_strategy = new_strategy
+        if changed.any(): self.apply_strategy(changed)
+
+        h = self._hist_len % self.HISTORY_LEN
+        self._hist_strategy[:, h] = self.current_strategy; self._hist_cpu[:, h] = cpu
+        self._hist_io[:, h] = io_wait; self._hist_failures[:, h] = self.failure_count()
+        self._hist_len += 1
+        return scores
+
+    def apply_strategy(self, mask):
+        ok = self.perform_action('set_governor', mask)
+        self.env.governor[ok] = _GOVERNOR_FOR_STRATEGY[self.current_strategy[ok]]
+
+    def tactical_maneuver(self, cpu):
+        self.perform_action('renice_high_cpu', cpu > self.policy.tactical_cpu, duration=120)
+
+    def reflexive_response(self, mem):
+        self.reflex_active = mem > self.policy.reflex_mem
+        if not self.reflex_active.any(): return
+        a = ACTIONS.index('drop_caches')
+        recent_fail = self.now - self.last_failure[:, a] < self.policy.drop_caches_retry_window # NaN เปรียบเทียบแล้วได้ False = ไม่เคยล้มเหลว
+        escalate = self.reflex_active & recent_fail
+        ok = self.perform_action('kill_most_mem_proc', escalate)
+        if ok.any(): self.env.kill_most_mem_proc(ok)
+        ok = self.perform_action('drop_caches', self.reflex_active & ~recent_fail, duration=self.policy.drop_caches_duration)
+        if ok.any():
+            env = self.env; mem_reduction = np.where(env.io_wait < 15, 10, 3)
+            env.mem_percent = np.where(ok, np.maximum(20.0, env.mem_percent - mem_reduction), env.mem_percent)
+
+    def perform_action(self, action_name, mask, duration=60):
+        """พยายามทำ Action ใน sandbox ที่ mask เลือก คืนค่า mask ของ sandbox ที่ทำสำเร็จ (ผู้เรียกเป็นผู้ใช้ผลของ Action)"""
+        a = ACTIONS.index(action_name)
+        attempt = mask & ~(self.now < self.expiry[:, a])
+        # Action มีโอกาสล้มเหลว 30% เมื่อระบบเครียด เหมือน MockSubprocess.run
+        failed = attempt & (self.env.system_stress_factor > 1.2) & (self.env.rng.random(self.n) < 0.3)
+        ok = attempt & ~failed
+        self.expiry[ok, a] = self.now + duration; self.last_failure[failed, a] = self.now
+        self.action_attempts[a] += attempt.sum(); self.action_failures[a] += failed.sum()
+        return ok
+
+    def learning_cycle(self):
+        length = min(self._hist_len, self.HISTORY_LEN)
+        if not length: return
+        cpu = self._hist_cpu[:, :length]; strat = self._hist_strategy[:, :length]; p = self.policy
+        poor = ((cpu.mean(axis=1) > p.learning_poor_cpu) | (self._hist_io[:, :length].max(axis=1) > p.learning_poor_io)
+                | ((self._hist_failures[:, :length] > 0).sum(axis=1) > p.learning_poor_failures))
+
+        # most_common(1) ของ Counter: นับมากสุด และถ้าเสมอกันเลือกตัวที่ปรากฏก่อน
+        rank = np.empty((self.n, len(STRATEGIES)), dtype=np.int64)
+        for s in range(len(STRATEGIES)):
+            seen = strat == s; count = seen.sum(axis=1)
+            rank[:, s] = count * (length + 1) - np.where(count > 0, seen.argmax(axis=1), length)
+        most_used = rank.argmax(axis=1)
+
+        rows = np.arange(self.n); w = self.strategy_weights[rows, most_used]
+        self.strategy_weights[rows, most_used] = np.where(poor, w * p.learning_penalty, np.minimum(p.weight_cap, w * p.learning_reward))
+        self._hist_len = 0; self.last_failure.fill(np.nan)
+
+    def main_loop_step(self):
+        """เทียบเท่า PanyarinNeuralAI.main_loop_step สำหรับทุก sandbox ใน batch"""
+        self.tick_counter += 1; self.now = self.tick_counter * self.tick_seconds
+        env = self.env; cpu = env.cpu_percent; mem = env.mem_percent; io_wait = env.io_wait
+        self.strategic_assessment(cpu, io_wait)
+        self.tactical_maneuver(cpu)
+        self.reflexive_response(mem)
+        if self.tick_counter % 10 == 0: self.learning_cycle()
+
+    def run(self, ticks):
+        for _ in range(ticks): self.env.update_system_load(); self.main_loop_step()
+
+# นโยบายที่ไม่ใช่ค่าตั้งต้นสำหรับ check_parity: ทุกเกณฑ์ต่างจากเดิม จึงจับได้ถ้าส่วนใดของ batch ยังใช้ค่าตายตัว
+PARITY_POLICY = {'cpu_very_busy': 65.0, 'cpu_busy': 40.0, 'cpu_idle': 25.0, 'idle_max_apps': 4, 'io_high': 15.0,
+                 'io_gaming_damper': 0.4, 'io_workstation_damper': 0.8, 'tactical_cpu': 60.0, 'reflex_mem': 85.0,
+                 'drop_caches_retry_window': 20.0, 'drop_caches_duration': 10.0, 'learning_poor_cpu': 60.0, 'learning_poor_io': 25.0,
+                 'learning_penalty': 0.9, 'learning_reward': 1.1, 'weight_cap': 1.3}
+
+def check_parity(policy=None, sandboxes=32, ticks=200, seed=0, scoring_rules=None):
+    """
+    ป้อนสถานะชุดเดียวกัน (cpu/mem/io/ชุดแอปแบบสุ่ม) ให้ BatchNeuralAI และ PanyarinNeuralAI หนึ่งตัวต่อ sandbox ทุก tick
+    แล้วเทียบกลยุทธ์, governor, Action ที่ยังมีผล, mem หลัง reflex และน้ำหนักกลยุทธ์ คืนรายการจุดที่ไม่ตรงกัน
+    system_stress_factor คงที่ 1.0 เพราะความล้มเหลวของ Action สุ่มจาก RNG คนละตัว (เส้นทาง failure/kill จึงไม่ถูกเทียบ)
+    """
+    from clock import VirtualClock
+    from isolated_agent import PanyarinNeuralAI
+    from logger import Logger, NullSink
+    policy = policy or load_policy(); rules = scoring_rules if isinstance(scoring_rules, dict) else load_rules(scoring_rules)
+    rng = np.random.default_rng(seed); benv = BatchSimulationEnvironment(sandboxes, seed=seed); bai = BatchNeuralAI(benv, policy=policy, scoring_rules=rules)
+    togglable = [a for a, name in enumerate(benv.app_names) if name not in ('python3', 'cinnamon')]
+    with Logger.redirect(NullSink()):
+        scalar = []
+        for i in range(sandboxes):
+            clock = VirtualClock(); env = SimulationEnvironment(clock=clock, seed=seed + i)
+            scalar.append((clock, env, PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=env.subprocess_mock, clock=clock, policy=policy, scoring_rules=rules)))
+        mismatches = []
+        for tick in range(1, ticks + 1):
+            if tick % 5 == 1:
+                running = rng.random((sandboxes, len(togglable))) < 0.3
+                benv.app_state[:, togglable] = np.where(running, rng.integers(0, len(APP_STATES), running.shape), -1); benv.app_version += 1
+            benv.cpu_percent = rng.uniform(0, 100, sandboxes); benv.mem_percent = rng.uniform(60, 100, sandboxes)
+            benv.io_wait = rng.uniform(0, 40, sandboxes); benv.system_stress_factor = np.ones(sandboxes)
+            for i, (clock, env, ai) in enumerate(scalar):
+                state = env.state; procs = env.processes
+                state['cpu_percent'] = float(benv.cpu_percent[i]); state['mem_percent'] = float(benv.mem_percent[i]); state['io_wait'] = float(benv.io_wait[i])
+                for a, name in enumerate(benv.app_names):
+                    want = benv.app_state[i, a]
+                    if want < 0: procs.pop(name)
+                    elif name not in procs: procs.spawn(name, APP_STATES[want])
+                    elif procs[name].state != APP_STATES[want]: procs.set_state(name, APP_STATES[want])
+                clock.set(tick * bai.tick_seconds); ai.main_loop_step()
+            bai.main_loop_step(); now = bai.now
+            for i, (clock, env, ai) in enumerate(scalar):
+                active = {name for name, opt in ai.active_optimizations.items() if now < opt['expiry']}
+                checks = (('strategy', ai.current_strategy, STRATEGIES[bai.current_strategy[i]]),
+                          ('governor', env.state['governor'], GOVERNORS[benv.governor[i]]),
+                          ('active_actions', active, {name for a, name in enumerate(ACTIONS) if now < bai.expiry[i, a]}),
+                          ('mem_percent', round(env.state['mem_percent'], 9), round(float(benv.mem_percent[i]), 9)),
+                          ('weights', [round(ai.strategy_weights[s], 9) for s in STRATEGIES], [round(float(w), 9) for w in bai.strategy_weights[i]]))
+                mismatches.extend((tick, i, field, a, b) for field, a, b in checks if a != b)
+    return mismatches
+
+if __name__ == "__main__":
+    from policy import AgentPolicy
+    parser = argparse.ArgumentParser(description="Check that the batch engine decides like the scalar agent on identical observations")
+    parser.add_argument("--policy", default=None, help="policy file to check (default: a policy that changes every threshold)")
+    parser.add_argument("--rules", default=None, help="scoring rules file (default: scoring_rules.json)")
+    parser.add_argument("--sandboxes", type=int, default=32)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    policy = AgentPolicy.load(args.policy) if args.policy else AgentPolicy(**PARITY_POLICY)
+    mismatches = check_parity(policy, args.sandboxes, args.ticks, args.seed, args.rules)
+    for tick, i, field, scalar, batch in mismatches[:20]: print(f"tick {tick} sandbox {i} {field}: scalar {scalar!r} != batch {batch!r}")
+    print(f"{policy!r}: {args.sandboxes} sandboxes x {args.ticks} ticks, {len(mismatches)} mismatches")
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,129 @@
+# filename: benchmark.py
+import argparse, json, os, platform, sys, time, tracemalloc
+from clock import VirtualClock
+from simulation_env import SimulationEnvironment
+from isolated_agent import PanyarinNeuralAI
+from logger import Logger, NullSink
+from scenario import ScenarioScheduler, load_scenario
+
+# จำนวนโปรเซสพื้นหลังที่เพิ่มเข้าไปใน sandbox (นอกเหนือจากแอปของ Scenario)
+SIZES = {'small': 8, 'medium': 256, 'large': 4096}
+SCENARIO_CASES = ('workstation', 'thrashing', 'stress')
+
+def make_sandbox(size, seed=0):
+    """สร้าง env + AI บน VirtualClock แล้วเติม daemon พื้นหลังที่แทบไม่ใช้ทรัพยากร (จึงไม่เปลี่ยนพฤติกรรมของ Scenario)"""
+    clock = VirtualClock(); env = SimulationEnvironment(clock=clock, seed=seed)
+    ai = PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=env.subprocess_mock, clock=clock)
+    for i in range(SIZES[size]):
+        name = f"daemon-{i:05d}"; env.resource_map[name] = {'idle': {'cpu': [0, 0.01], 'mem': 0}}; env.processes.spawn(name)
+    return clock, env, ai
+
+# แต่ละ case คืนฟังก์ชันที่ทำงานหนึ่ง tick (เตรียมสถานะไว้แล้ว)
+def _case_update_system_load(size):
+    clock, env, ai = make_sandbox(size); return env.update_system_load
+
+def _case_main_loop_step(size):
+    clock, env, ai = make_sandbox(size)
+    def tick(): clock.advance(1.0); ai.main_loop_step()
+    return tick
+
+def _case_learning_cycle(size):
+    clock, env, ai = make_sandbox(size)
+    for _ in range(ai.performance_history.window): env.update_system_load(); ai.main_loop_step(); clock.advance(1.0)
+    return ai.learning_cycle
+
+def _case_process_iter(size):
+    clock, env, ai = make_sandbox(size); psutil = env.psutil_mock
+    def tick():
+        for proc in psutil.process_iter(['pid', 'name']): proc.cpu_percent()
+    return tick
+
+def _scenario_case(name):
+    def build(size):
+        clock, env, ai = make_sandbox(size); scheduler = ScenarioScheduler(); scenario = load_scenario(name)
+        def tick():
+            if not scheduler: scheduler.schedule(scenario, start_tick=ai.tick_counter + 1) # วนเล่น Scenario ซ้ำตลอดการวัด
+            scheduler.run_due(env, ai.tick_counter + 1); env.update_system_load(); ai.main_loop_step(); clock.advance(1.0)
+        return tick
+    return build
+
+CASES = {'update_system_load': _case_update_system_load, 'main_loop_step': _case_main_loop_step,
+         'learning_cycle': _case_learning_cycle, 'process_iter': _case_process_iter}
+CASES.update((f"scenario:{name}", _scenario_case(name)) for name in SCENARIO_CASES)
+
+def _percentile(sorted_values, q): return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def measure(build, size, ticks=2000, warmup=200, alloc_ticks=200, max_seconds=2.0):
+    """
+    วัด case หนึ่งที่ขนาดหนึ่ง: ticks/sec และ p50/p99 latency ต่อ tick (รอบหลักไม่เปิด tracemalloc เพื่อไม่ให้เวลาเพี้ยน)
+    แล้ววัดหน่วยความจำสุทธิสูงสุดระหว่าง tick (peak ของ tracemalloc ลบค่าตอนเริ่ม tick) ในอีกรอบแยกต่างหาก
+    ค่านี้ไม่ใช่ปริมาณการจองทั้งหมด: อ็อบเจกต์ชั่วคราวที่ถูกคืนก่อนถึง peak ไม่ถูกนับ
+    แต่ละรอบหยุดเมื่อครบจำนวน tick หรือใช้เวลาเกิน max_seconds (case ขนาดใหญ่จึงไม่ลากเวลาทั้งชุด)
+    """
+    with Logger.redirect(NullSink()):
+        tick = build(size); clock = time.perf_counter_ns; deadline = clock() + max_seconds * 1e9 / 4
+        for _ in range(warmup):
+            tick()
+            if clock() > deadline: break
+        latencies = []; start = clock(); deadline = start + max_seconds * 1e9
+        while len(latencies) < ticks:
+            t0 = clock(); tick(); t1 = clock(); latencies.append(t1 - t0)
+            if t1 > deadline: break
+        ticks = len(latencies); elapsed = (clock() - start) / 1e9
+        alloc_ticks = max(1, min(alloc_ticks, ticks // 4)); tracemalloc.start(); peak_total = 0; peak_max = 0
+        try:
+            for _ in range(alloc_ticks):
+                base = tracemalloc.get_traced_memory()[0]; tracemalloc.reset_peak(); tick()
+                used = tracemalloc.get_traced_memory()[1] - base; peak_total += used; peak_max = max(peak_max, used)
+        finally: tracemalloc.stop()
+    latencies.sort()
+    return {'ticks': ticks, 'ticks_per_sec': ticks / elapsed if elapsed else float('inf'),
+            'p50_us': _percentile(latencies, 0.50) / 1e3, 'p99_us': _percentile(latencies, 0.99) / 1e3,
+            'peak_bytes_per_tick': peak_total / alloc_ticks, 'peak_bytes_max': peak_max}
+
+def run_suite(cases=None, sizes=None, ticks=2000, warmup=200, alloc_ticks=200, max_seconds=2.0, repeat=3, progress=None):
+    """รันทุก case x ขนาด; แต่ละคู่วัด repeat รอบแล้วเก็บรอบที่เร็วที่สุด (ลดสัญญาณรบกวนจากเครื่องก่อนเทียบกับ baseline)"""
+    results = {}
+    for case in cases or CASES:
+        for size in sizes or SIZES:
+            key = f"{case}/{size}"
+            results[key] = max((measure(CASES[case], size, ticks, warmup, alloc_ticks, max_seconds) for _ in range(max(1, repeat))), key=lambda r: r['ticks_per_sec'])
+            if progress: progress(key, results[key])
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'results': results}
+
+def compare(report, baseline, threshold=0.10):
+    """คืนรายการ case ที่ ticks/sec ลดลงมากกว่า threshold (สัดส่วน) เทียบกับ baseline; case ที่ไม่มีใน baseline จะถูกข้าม"""
+    regressions = []
+    for key, result in report['results'].items():
+        old = baseline.get('results', {}).get(key)
+        if not old: continue
+        change = result['ticks_per_sec'] / old['ticks_per_sec'] - 1.0
+        if change < -threshold: regressions.append((key, old['ticks_per_sec'], result['ticks_per_sec'], change))
+    return regressions
+
+def _print_result(key, r):
+    print(f"{key:<34} {r['ticks_per_sec']:>12,.0f} ticks/s  p50 {r['p50_us']:>9.1f}us  p99 {r['p99_us']:>9.1f}us  peak {r['peak_bytes_per_tick']:>10,.0f} B/tick", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite for the Panyarin AI sandbox (ticks/sec, per-tick latency, peak memory per tick)")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="case to run (repeatable; default: all)")
+    parser.add_argument("--size", action="append", choices=list(SIZES), help="background process count (repeatable; default: all)")
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--alloc-ticks", type=int, default=200, help="ticks measured under tracemalloc (peak memory per tick)")
+    parser.add_argument("--max-seconds", type=float, default=2.0, help="time budget per case and size")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed ticks/sec drop versus the baseline (0.10 = 10%%)")
+    args = parser.parse_args()
+    report = run_suite(args.case, args.size, args.ticks, args.warmup, args.alloc_ticks, args.max_seconds, args.repeat, progress=_print_result)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for key, old, new, change in regressions: print(f"REGRESSION {key}: {old:,.0f} -> {new:,.0f} ticks/s ({change:+.1%})")
+        if regressions: sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
@@ -0,0 +1,129 @@
+# filename: checkpoint.py
+import argparse, multiprocessing, os, pickle, time
+from concurrent.futures import ProcessPoolExecutor
+from clock import VirtualClock
+from simulation_env import SimulationEnvironment
+from isolated_agent import PanyarinNeuralAI, Strategy
+from forecast import PressureForecaster
+from scoring import ScoringEngine
+from logger import Logger, NullSink
+
+# ฟิลด์ของ Agent ที่เปลี่ยนระหว่างรัน (ส่วนที่เหลือ เช่น psutil/subprocess/clock ผูกกับ sandbox ปลายทาง)
+AGENT_FIELDS = ('current_strategy', 'active_optimizations', 'last_trigger_reason', 'tick_counter', 'failure_tracker',
+                'performance_history', 'strategy_weights', 'weights_version', 'last_scores', 'tick_events', 'tick_actions_ok', 'tick_actions_failed', '_snapshot', 'forecaster')
+
+class Checkpoint:
+    """
+    สถานะทั้งหมดของ sandbox + Agent ณ ระหว่าง tick เป็น pickle ก้อนเดียว (ไม่กี่ KB):
+    env.state (รวม ProcessTable), resource_map, สถานะ RNG, ตัวนับของ subprocess, ฟิลด์ที่เปลี่ยนได้ของ Agent,
+    AgentPolicy และตารางกฎคะแนนของ Agent, เวลาของนาฬิกา และ ScenarioScheduler (ถ้าให้มา) — วัตถุที่อ้างอิงร่วมกัน (เช่น resource_map) ยังคงร่วมกันหลังคืนสถานะ
+    """
+    __slots__ = ('data', 'tick', 'time')
+    def __init__(self, data, tick, time): self.data = data; self.tick = tick; self.time = time
+    def __len__(self): return len(self.data)
+    def __repr__(self): return f"Checkpoint(tick={self.tick}, time={self.time}, {len(self.data)} bytes)"
+
+    def save(self, path):
+        with open(path, "wb") as f: pickle.dump((self.tick, self.time, self.data), f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f: tick, time, data = pickle.load(f)
+        return Checkpoint(data, tick, time)
+
+    def restore(self, env, ai, scheduler=None):
+        """
+        เขียนทับสถานะของ env/ai ที่มีอยู่แล้ว (in-place จึงไม่ต้องต่อ mock ใหม่) แล้วคืน ScenarioScheduler ที่บันทึกไว้
+        ai ได้ policy และตารางกฎของ checkpoint ด้วย (run ที่ต่อจากนี้จึงตัดสินใจเหมือน run ต้นฉบับ)
+        """
+        state, resource_map, rng_state, counters, agent, saved_scheduler, now, policy, rules = pickle.loads(self.data)
+        env.resource_map = resource_map; env.state.clear(); env.state.update(state); env.processes = env.state['running_apps']
+        env.rng.setstate(rng_state); env.subprocess_mock.counters.clear(); env.subprocess_mock.counters.update(counters)
+        if ai.policy != policy or ai.scoring_rules != rules: ai.policy = policy; ai.scoring_rules = rules; ai.scorer = ScoringEngine(rules, policy, Strategy)
+        else: ai.scorer.clear() # weights_version ที่คืนมาอาจซ้ำกับคีย์ในแคชของ Agent นี้
+        for name, value in agent.items(): setattr(ai, name, value)
+        if (ai.forecaster is not None) != (policy.forecast_mem or policy.forecast_io): ai.forecaster = PressureForecaster.from_policy(policy) # ให้ตรงกับ policy เสมอ
+        ai._snapshot_observed = None
+        for clock in {id(env.clock): env.clock, id(ai.clock): ai.clock}.values():
+            if clock.is_virtual: clock.set(now)
+        return saved_scheduler if saved_scheduler is not None else scheduler
+
+    def build(self, clock=None):
+        """สร้าง sandbox + Agent ใหม่จาก checkpoint (VirtualClock ของตัวเอง) คืน (env, ai, scheduler)"""
+        clock = clock or VirtualClock()
+        with Logger.redirect(NullSink()):
+            env = SimulationEnvironment(clock=clock)
+            ai = PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=env.subprocess_mock, clock=clock)
+        return env, ai, self.restore(env, ai)
+
+def capture(env, ai, scheduler=None):
+    """บันทึก checkpoint ระหว่าง tick (ต้องไม่มี Action ค้างอยู่ใน executor เพราะ thread ที่กำลังรันบันทึกไม่ได้)"""
+    if ai.executor is not None and len(ai.executor): raise ValueError("Cannot checkpoint while actions are in flight; poll the executor first")
+    agent = {name: getattr(ai, name) for name in AGENT_FIELDS}
+    data = pickle.dumps((env.state, env.resource_map, env.rng.getstate(), env.subprocess_mock.counters, agent, scheduler, env.clock.now(),
+                         ai.policy, ai.scoring_rules), pickle.HIGHEST_PROTOCOL)
+    return Checkpoint(data, ai.tick_counter, env.clock.now())
+
+_FORK_SOURCE = None # checkpoint ที่โปรเซสลูกสืบทอดจากหน่วยความจำของโปรเซสแม่ (fork = copy-on-write ไม่ต้องส่งผ่าน pipe)
+
+def _init_fork_child(checkpoint):
+    global _FORK_SOURCE
+    _FORK_SOURCE = checkpoint
+
+def _run_branch(job):
+    fn, branch = job
+    env, ai, scheduler = _FORK_SOURCE.build()
+    with Logger.redirect(NullSink()): return fn(env, ai, scheduler, branch)
+
+def fork(checkpoint, fn, branches, workers=None):
+    """
+    แตกหนึ่ง checkpoint เป็นหลาย run: เรียก fn(env, ai, scheduler, branch) หนึ่งครั้งต่อ branch บนสำเนาอิสระของสถานะ แล้วคืนผลตามลำดับ
+    fn ต้องเป็นฟังก์ชันระดับโมดูล (ส่งข้ามโปรเซสได้) และควรทำให้ branch ต่างกันเอง เช่น env.rng.seed(branch) หรือ schedule Scenario อื่น
+    บนระบบที่มี fork โปรเซสลูกใช้หน้าหน่วยความจำของ checkpoint ร่วมกับโปรเซสแม่ (copy-on-write); ที่อื่นส่ง checkpoint ครั้งเดียวต่อ worker
+    """
+    global _FORK_SOURCE
+    jobs = [(fn, branch) for branch in branches]; workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    previous = _FORK_SOURCE; _FORK_SOURCE = checkpoint
+    try:
+        if workers == 1: return [_run_branch(job) for job in jobs]
+        if 'fork' in multiprocessing.get_all_start_methods(): pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        else: pool = ProcessPoolExecutor(workers, initializer=_init_fork_child, initargs=(checkpoint,))
+        with pool: return list(pool.map(_run_branch, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    finally: _FORK_SOURCE = previous
+
+def _run_scenario_branch(env, ai, scheduler, branch):
+    """branch ของ CLI: (scenario, seed, ticks) ต่อจาก checkpoint"""
+    from scenario import ScenarioScheduler
+    scenario, seed, ticks = branch; env.rng.seed(seed); scheduler = scheduler or ScenarioScheduler()
+    start = ai.tick_counter + 1; scheduler.schedule(scenario, start_tick=start); mem_over_90 = 0
+    for tick in range(start, start + ticks):
+        scheduler.run_due(env, tick); env.update_system_load(); ai.main_loop_step(); env.clock.advance(1.0)
+        mem_over_90 += env.state['mem_percent'] > 90
+    return {'scenario': scenario, 'seed': seed, 'ticks_mem_over_90': mem_over_90, 'final_strategy': ai.current_strategy.name,
+            'kills': env.subprocess_mock.counters['kills'], 'weights': {s.name: round(w, 3) for s, w in ai.strategy_weights.items()}}
+
+if __name__ == "__main__":
+    from scenario import ScenarioScheduler
+    parser = argparse.ArgumentParser(description="Warm up once, checkpoint, then fork what-if branches from the checkpoint")
+    parser.add_argument("--warmup-scenario", default="workstation")
+    parser.add_argument("--warmup-ticks", type=int, default=2000)
+    parser.add_argument("--scenario", action="append", help="branch scenario(s) (default: thrashing, stress)")
+    parser.add_argument("--seeds", type=int, default=4, help="branches per scenario")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--save", default=None, help="also write the checkpoint to this file")
+    args = parser.parse_args()
+    clock = VirtualClock(); start = time.perf_counter()
+    with Logger.redirect(NullSink()):
+        env = SimulationEnvironment(clock=clock, seed=0); ai = PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=env.subprocess_mock, clock=clock)
+        warmup = ScenarioScheduler()
+        for tick in range(1, args.warmup_ticks + 1):
+            if not warmup: warmup.schedule(args.warmup_scenario, start_tick=tick)
+            warmup.run_due(env, tick); env.update_system_load(); ai.main_loop_step(); clock.advance(1.0)
+    warmup_seconds = time.perf_counter() - start
+    start = time.perf_counter(); checkpoint = capture(env, ai); capture_ms = 1e3 * (time.perf_counter() - start)
+    start = time.perf_counter(); checkpoint.build(); restore_ms = 1e3 * (time.perf_counter() - start)
+    if args.save: checkpoint.save(args.save)
+    print(f"warm-up {args.warmup_ticks} ticks: {warmup_seconds:.2f}s | {checkpoint} | capture {capture_ms:.3f}ms | restore {restore_ms:.3f}ms")
+    branches = [(scenario, seed, args.ticks) for scenario in args.scenario or ('thrashing', 'stress') for seed in range(args.seeds)]
+    for result in fork(checkpoint, _run_scenario_branch, branches, args.workers): print(result)
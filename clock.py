@@ -0,0 +1,25 @@
+# filename: clock.py
+import time
+
+class RealClock:
+    """นาฬิกาจริง: now() อ่านเวลาระบบ และ sleep() หน่วงเวลาจริง"""
+    is_virtual = False
+    def now(self): return time.time()
+    def sleep(self, seconds):
+        if seconds > 0: time.sleep(seconds)
+
+class VirtualClock:
+    """
+    นาฬิกาเสมือนที่เดินตาม tick: เวลาขยับเฉพาะเมื่อเรียก sleep()/advance() เท่านั้น
+    ทำให้การจำลองรันเร็วเท่าที่ CPU ทำได้ แต่ AI ยังเห็นช่วงเวลา (expiry, หน้าต่าง 30 วินาที) เหมือนรันตามเวลาจริง
+    """
+    is_virtual = True
+    def __init__(self, start=0.0): self._now = float(start)
+    def now(self): return self._now
+    def sleep(self, seconds):
+        if seconds > 0: self._now += seconds
+    advance = sleep
+    def set(self, now): self._now = float(now) # ใช้ตอนคืนสถานะจาก checkpoint
+
+def make_clock(virtual=False, start=0.0):
+    return VirtualClock(start) if virtual else RealClock()
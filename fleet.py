@@ -0,0 +1,168 @@
+# filename: fleet.py
+import argparse, asyncio, json, multiprocessing, os, pickle, queue, time, traceback
+from clock import VirtualClock
+from simulation_env import SimulationEnvironment
+from isolated_agent import PanyarinNeuralAI, Strategy
+from logger import Logger, NullSink, JsonlSink, BufferedSink, WARNING
+from scenario import ScenarioScheduler, load_scenario
+
+class FleetHost:
+    """env + AI หนึ่งคู่ใน fleet: RNG (seed ของตัวเอง), VirtualClock และชื่อ host สำหรับ Log แยกจาก host อื่นทั้งหมด"""
+    __slots__ = ('host_id', 'clock', 'env', 'ai', 'scenario', 'scheduler', 'tick_seconds')
+    def __init__(self, host_id, seed, scenario, tick_seconds=1.0):
+        self.host_id = host_id; self.clock = VirtualClock(); self.tick_seconds = tick_seconds; self.scenario = scenario
+        with Logger.bind(host_id, self.clock):
+            self.env = SimulationEnvironment(clock=self.clock, seed=seed)
+            self.ai = PanyarinNeuralAI(psutil_mock=self.env.psutil_mock, subprocess_mock=self.env.subprocess_mock, clock=self.clock)
+        self.scheduler = ScenarioScheduler()
+
+    def step(self):
+        ai = self.ai; tick = ai.tick_counter + 1
+        if not self.scheduler: self.scheduler.schedule(self.scenario, start_tick=tick) # วนเล่น Scenario ซ้ำ
+        self.scheduler.run_due(self.env, tick); self.env.update_system_load(); ai.main_loop_step(); self.clock.advance(self.tick_seconds)
+
+def summarize(hosts):
+    """สรุปสถานะปัจจุบันของกลุ่ม host (ค่าที่รวมข้าม shard ได้ด้วย merge_summaries)"""
+    strategies = {s.name: 0 for s in Strategy}; in_reflex = []; attempts = failures = kills = ticks = 0
+    for host in hosts:
+        strategies[host.ai.current_strategy.name] += 1; counters = host.env.subprocess_mock.counters
+        attempts += counters['attempts']; failures += counters['failures']; kills += counters['kills']; ticks += host.ai.tick_counter
+        if host.env.state['mem_percent'] > 90: in_reflex.append(host.host_id)
+    return {'hosts': len(hosts), 'ticks': ticks, 'strategies': strategies, 'hosts_in_reflex': in_reflex,
+            'action_attempts': attempts, 'action_failures': failures, 'kills': kills}
+
+def merge_summaries(summaries):
+    merged = {'hosts': 0, 'ticks': 0, 'strategies': {s.name: 0 for s in Strategy}, 'hosts_in_reflex': [],
+              'action_attempts': 0, 'action_failures': 0, 'kills': 0, 'lagging_shards': 0}
+    for s in summaries:
+        for key in ('hosts', 'ticks', 'action_attempts', 'action_failures', 'kills'): merged[key] += s[key]
+        for name, n in s['strategies'].items(): merged['strategies'][name] += n
+        merged['hosts_in_reflex'] += s['hosts_in_reflex']; merged['lagging_shards'] += s.get('lag', 0.0) > 0
+    merged['hosts_in_reflex'].sort()
+    merged['action_failure_rate'] = merged['action_failures'] / merged['action_attempts'] if merged['action_attempts'] else 0.0
+    return merged
+
+async def _drive(hosts, tick_seconds, ticks, realtime, offset, stop, lag):
+    """หนึ่ง asyncio task ต่อกลุ่ม host: ก้าวทุก host ในกลุ่มหนึ่ง tick แล้วรอถึงรอบถัดไป (กลุ่มต่าง ๆ เหลื่อมเวลากันตาม offset)"""
+    loop = asyncio.get_running_loop(); deadline = loop.time() + offset; n = 0
+    while not stop.is_set() and (ticks is None or n < ticks):
+        if realtime:
+            delay = deadline - loop.time()
+            if delay > 0: await asyncio.sleep(delay)
+            else: lag[0] = max(lag[0], -delay) # ตามไม่ทันเวลาจริง
+            deadline += tick_seconds
+        for host in hosts:
+            with Logger.bind(host.host_id, host.clock): host.step()
+        n += 1
+        if not realtime: await asyncio.sleep(0)
+
+async def _run_shard(hosts, tick_seconds, ticks, realtime, tasks, stop, reports, shard_id, report_interval):
+    groups = [hosts[i::tasks] for i in range(tasks)]; lag = [0.0]
+    drivers = [asyncio.create_task(_drive(g, tick_seconds, ticks, realtime, tick_seconds * i / tasks, stop, lag)) for i, g in enumerate(groups) if g]
+    async def reporter():
+        while True:
+            await asyncio.sleep(report_interval); reports.put((shard_id, {**summarize(hosts), 'lag': lag[0]})); lag[0] = 0.0
+    report_task = asyncio.create_task(reporter())
+    await asyncio.gather(*drivers); report_task.cancel()
+    reports.put((shard_id, {**summarize(hosts), 'lag': lag[0], 'done': True}))
+
+def _shard_main(shard_id, host_ids, config, stop, reports):
+    """จุดเริ่มของโปรเซส shard: สร้าง host ของตัวเองแล้วขับด้วย asyncio; Log ของแต่ละ shard เขียนแยกไฟล์"""
+    try:
+        log_dir = config['log_dir']
+        if log_dir: Logger.configure(BufferedSink(JsonlSink(os.path.join(log_dir, f"shard-{shard_id:03d}.jsonl"))), config['log_level'])
+        else: Logger.configure(NullSink())
+        scenarios = [load_scenario(name) for name in config['scenarios']]
+        hosts = [FleetHost(f"host-{i:05d}", config['seed'] + i, scenarios[i % len(scenarios)], config['tick_seconds']) for i in host_ids]
+        asyncio.run(_run_shard(hosts, config['tick_seconds'], config['ticks'], config['realtime'], config['tasks_per_shard'], stop, reports, shard_id, config['report_interval']))
+        Logger.flush()
+    except BaseException as e:
+        # ส่งสาเหตุจริงกลับให้ controller ซึ่งโยนต่อพร้อม traceback (Exception ที่ pickle ไม่ได้ถูกแทนด้วย RuntimeError ที่มีข้อความเดิม)
+        tb = traceback.format_exc()
+        try: pickle.dumps(e)
+        except Exception: e = RuntimeError(f"{type(e).__name__}: {e}")
+        reports.put((shard_id, {'error': e, 'traceback': tb})); reports.close(); reports.join_thread()
+        raise SystemExit(1) # traceback พิมพ์ครั้งเดียวที่ controller
+
+class FleetController:
+    """
+    ควบคุม host จำนวนมาก: แบ่ง host เป็น shard ละโปรเซส (ค่าเริ่มต้น = จำนวนคอร์) และในแต่ละโปรเซสแบ่งเป็น asyncio task
+    host แต่ละตัวมี seed = seed + host index จึงได้ผลเหมือนเดิมไม่ว่าจะแบ่ง shard อย่างไร (เมื่อรันแบบไม่อิงเวลาจริง)
+    aggregate() รวมรายงานล่าสุดของทุก shard: การกระจายกลยุทธ์, host ที่อยู่ในภาวะ reflex (mem > 90%), อัตราความล้มเหลวของ Action
+    """
+    def __init__(self, n_hosts, workers=None, tasks_per_shard=8, tick_seconds=1.0, scenarios=('demo',), seed=0,
+                 log_dir=None, log_level=WARNING, report_interval=1.0):
+        self.n_hosts = n_hosts; self.workers = max(1, min(workers or os.cpu_count() or 1, n_hosts))
+        self.config = {'tick_seconds': tick_seconds, 'scenarios': list(scenarios), 'seed': seed, 'log_dir': log_dir, 'log_level': log_level,
+                       'tasks_per_shard': tasks_per_shard, 'report_interval': report_interval, 'ticks': None, 'realtime': True}
+        self._ctx = multiprocessing.get_context(); self._stop = self._ctx.Event(); self._reports = self._ctx.Queue()
+        self._processes = []; self._latest = {}; self._done = set(); self._errors = {}
+        if log_dir: os.makedirs(log_dir, exist_ok=True)
+
+    def start(self, ticks=None, realtime=True):
+        config = {**self.config, 'ticks': ticks, 'realtime': realtime}
+        for shard in range(self.workers):
+            host_ids = list(range(shard, self.n_hosts, self.workers))
+            p = self._ctx.Process(target=_shard_main, args=(shard, host_ids, config, self._stop, self._reports), name=f"fleet-shard-{shard}", daemon=True)
+            p.start(); self._processes.append(p)
+        return self
+
+    def _collect(self, timeout=0.0):
+        try:
+            while True:
+                shard, summary = self._reports.get(timeout=timeout) if timeout else self._reports.get_nowait()
+                timeout = 0.0
+                if 'error' in summary: self._errors[shard] = summary; continue
+                self._latest[shard] = summary
+                if summary.get('done'): self._done.add(shard)
+        except queue.Empty: pass
+
+    def _check_shards(self):
+        """โยน RuntimeError ถ้ามี shard ที่ล้มเหลวหรือจบไปโดยไม่รายงาน done (หยุด shard ที่เหลือก่อน เพื่อไม่ให้ controller รอไปตลอด)"""
+        dead = [(shard, p) for shard, p in enumerate(self._processes) if shard not in self._done and (shard in self._errors or not p.is_alive())]
+        if not dead: return
+        self._collect() # รายงานที่ shard ส่งไว้ก่อนจบอาจยังค้างอยู่ใน queue
+        dead = [(shard, p) for shard, p in dead if shard not in self._done]
+        if not dead: return
+        shard, p = dead[0]; error = self._errors.get(shard)
+        self._stop.set()
+        for other in self._processes:
+            other.join(timeout=1.0)
+            if other.is_alive(): other.terminate(); other.join()
+        self._processes = []
+        if error is not None: raise RuntimeError(f"Fleet shard {shard} failed (exit code {p.exitcode}):\n{error['traceback']}") from error['error']
+        raise RuntimeError(f"Fleet shard {shard} exited with code {p.exitcode} before reporting done")
+
+    def aggregate(self):
+        """สรุปรวมจากรายงานล่าสุดของทุก shard (ไม่บล็อก)"""
+        self._collect(); return merge_summaries(self._latest.values())
+
+    def stop(self):
+        self._stop.set()
+        while len(self._done) < len(self._processes) and any(p.is_alive() for p in self._processes): self._collect(timeout=0.1)
+        self._collect(); self._check_shards()
+        for p in self._processes: p.join()
+        self._processes = []; return merge_summaries(self._latest.values())
+
+    def run(self, ticks, realtime=False):
+        """รันทุก host ครบ ticks แล้วคืนสรุปสุดท้าย (realtime=False = เร็วที่สุดเท่าที่ทำได้)"""
+        self.start(ticks, realtime)
+        while len(self._done) < len(self._processes): self._collect(timeout=0.5); self._check_shards()
+        for p in self._processes: p.join()
+        self._processes = []; return merge_summaries(self._latest.values())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fleet of sandboxed hosts, each with its own Panyarin AI agent")
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="shard processes (default: CPU count)")
+    parser.add_argument("--tasks", type=int, default=8, help="asyncio tasks per shard")
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--tick-seconds", type=float, default=1.0)
+    parser.add_argument("--realtime", action="store_true", help="pace every host at one tick per --tick-seconds of wall time")
+    parser.add_argument("--scenario", action="append", help="scenario(s) assigned round-robin to hosts (default: demo)")
+    parser.add_argument("--log-dir", default=None, help="write per-shard JSONL logs (records carry the host id)")
+    args = parser.parse_args()
+    fleet = FleetController(args.hosts, args.workers, args.tasks, args.tick_seconds, args.scenario or ('demo',), log_dir=args.log_dir)
+    start = time.perf_counter(); summary = fleet.run(args.ticks, realtime=args.realtime); elapsed = time.perf_counter() - start
+    summary['host_ticks_per_second'] = summary['ticks'] / elapsed; summary['hosts_in_reflex'] = len(summary['hosts_in_reflex'])
+    print(json.dumps(summary, indent=2))
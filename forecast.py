@@ -0,0 +1,73 @@
+# filename: forecast.py
+import argparse, math
+
+class HoltForecaster:
+    """
+    Holt linear trend (double EWMA) ของค่าเดียว อัปเดต O(1) ต่อ observation
+    trend เก็บเป็น "ต่อวินาที" จึงใช้ได้ทั้ง tick ละ 1 วินาทีและลูปที่รันคนละอัตรา (ช่วงเวลาไม่เท่ากัน)
+    """
+    __slots__ = ('alpha', 'beta', 'level', 'trend', 'last_time')
+    def __init__(self, alpha=0.5, beta=0.3):
+        self.alpha = alpha; self.beta = beta; self.level = None; self.trend = 0.0; self.last_time = None
+
+    def update(self, value, now):
+        level = self.level
+        if level is None: self.level = value; self.last_time = now; return value
+        dt = now - self.last_time
+        if dt <= 0: self.level = level + self.alpha * (value - level); return self.level # observation ซ้ำในเวลาเดียวกัน: ปรับเฉพาะ level
+        predicted = level + self.trend * dt
+        self.level = predicted + self.alpha * (value - predicted)
+        self.trend += self.beta * ((self.level - level) / dt - self.trend); self.last_time = now
+        return self.level
+
+    def predict(self, seconds): return self.level + self.trend * seconds if self.level is not None else None
+
+    def breach_in(self, threshold):
+        """วินาทีจนกว่าค่าจะเกิน threshold ตาม trend ปัจจุบัน (0 = เกินแล้ว, inf = ไม่มีแนวโน้มจะเกิน)"""
+        if self.level is None: return math.inf
+        if self.level > threshold: return 0.0
+        return (threshold - self.level) / self.trend if self.trend > 0 else math.inf
+
+class PressureForecaster:
+    """
+    ตัวพยากรณ์ mem_percent และ io_wait ใน snapshot pipeline ของ Agent: observe(snapshot) เพิ่มค่าคาดการณ์
+    ล่วงหน้า horizon วินาที ('mem_forecast', 'io_forecast') ลงใน snapshot ให้ reflex/strategic ใช้แทนค่าปัจจุบัน
+    """
+    __slots__ = ('horizon', 'mem', 'io')
+    def __init__(self, alpha=0.5, beta=0.3, horizon=3.0):
+        self.horizon = horizon; self.mem = HoltForecaster(alpha, beta); self.io = HoltForecaster(alpha, beta)
+
+    def observe(self, snapshot):
+        now = snapshot['timestamp']; horizon = self.horizon
+        self.mem.update(snapshot['mem_percent'], now); self.io.update(snapshot['io_wait'], now)
+        snapshot['mem_forecast'] = self.mem.predict(horizon); snapshot['io_forecast'] = self.io.predict(horizon)
+        return snapshot
+
+    @classmethod
+    def from_policy(cls, policy):
+        return cls(policy.forecast_alpha, policy.forecast_beta, policy.forecast_horizon) if policy.forecast_mem or policy.forecast_io else None
+
+if __name__ == "__main__":
+    from montecarlo import run_monte_carlo
+    from policy import load_policy
+    parser = argparse.ArgumentParser(description="Compare reactive and forecast-driven reflexes on Monte Carlo runs of the bundled scenarios")
+    parser.add_argument("--scenario", action="append", help="scenarios (default: thrashing, stress)")
+    parser.add_argument("--seeds", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--horizon", type=float, default=None, help="override the policy's forecast horizon (seconds)")
+    args = parser.parse_args()
+    base = load_policy().replace(forecast_mem=False, forecast_io=False, **({'forecast_horizon': args.horizon} if args.horizon is not None else {}))
+    variants = {'reactive': base, 'forecast_io': base.replace(forecast_io=True), 'forecast_mem': base.replace(forecast_mem=True),
+                'forecast_both': base.replace(forecast_io=True, forecast_mem=True)}
+    keys = ('ticks_mem_over_90', 'ticks_io_over_20', 'action_attempts', 'action_failures', 'kills')
+    for scenario in args.scenario or ('thrashing', 'stress'):
+        reports = {label: run_monte_carlo(scenario, args.seeds, args.ticks, workers=args.workers, policy=policy) for label, policy in variants.items()}
+        print(f"{scenario} ({args.seeds} seeds x {args.ticks} ticks)")
+        print("  " + f"{'':<15}" + "".join(f"{key:>19}" for key in keys))
+        for label, report in reports.items():
+            cells = []
+            for key in keys:
+                value = report[key]; reactive = reports['reactive'][key]
+                cells.append(f"{value:>11}" + (f" ({(value - reactive) / reactive:+.0%})" if label != 'reactive' and reactive else " " * 7).rjust(8))
+            print(f"  {label:<15}" + "".join(cells))
@@ -1,22 +1,46 @@
 # filename: gui_simulator.py
-import sys, customtkinter, tkinter as tk
+import sys, queue, customtkinter, tkinter as tk
 import traceback
+from clock import make_clock
 from simulation_env import SimulationEnvironment
 from isolated_agent import PanyarinNeuralAI, Strategy
 from logger import Logger
+from sim_worker import SimulationWorker, SIM_SECONDS_PER_TICK
+from scenario import load_scenario
 
 class TextRedirector:
-    def __init__(self, widget): self.widget = widget
-    def write(self, text):
+    """
+    รับข้อความจาก print ทุก thread เข้าคิว แล้วให้ Tk loop ดึงออกทุก drain_ms เพื่อแทรกครั้งเดียว
+    และตัด Textbox ให้เหลือไม่เกิน max_lines บรรทัด (write() ไม่แตะ widget จึงปลอดภัยจาก thread อื่น)
+    """
+    def __init__(self, widget, max_lines=2000, drain_ms=100):
+        self.widget = widget; self.max_lines = max_lines; self.drain_ms = drain_ms
+        self._queue = queue.SimpleQueue()
+        self.widget.after(self.drain_ms, self._drain)
+    def write(self, text): self._queue.put(text)
+    def flush(self): pass
+
+    def _drain(self):
+        parts = []
+        try:
+            while True: parts.append(self._queue.get_nowait())
+        except queue.Empty: pass
         try:
-            if self.widget.winfo_exists():
-                self.widget.configure(state="normal")
-                self.widget.insert(tk.END, text)
-                self.widget.see(tk.END)
-                self.widget.configure(state="disabled")
+            if not self.widget.winfo_exists(): return
+            if parts: self._append("".join(parts))
+            self.widget.after(self.drain_ms, self._drain)
         except Exception:
-            sys.__stdout__.write(text)
-    def flush(self): pass
+            sys.__stdout__.write("".join(parts))
+
+    def _append(self, text):
+        lines = text.split("\n")
+        if len(lines) > self.max_lines: text = "\n".join(lines[-self.max_lines:]) # ไม่ต้องแทรกส่วนที่จะถูกตัดทิ้งอยู่ดี
+        self.widget.configure(state="normal")
+        self.widget.insert(tk.END, text)
+        line_count = int(self.widget.index("end-1c").split(".")[0])
+        if line_count > self.max_lines: self.widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        self.widget.see(tk.END)
+        self.widget.configure(state="disabled")
 
 class PanyarinAIControlRoom(customtkinter.CTk):
     ASCII_MOODS = {
@@ -28,16 +52,31 @@ class PanyarinAIControlRoom(customtkinter.CTk):
         "CONFUSED":           " (•ิ_•ิ)?\n---------\n ADAPTING"
     }
 
-    def __init__(self):
+    FRAME_MS = 33 # อัตราวาด Dashboard (~30 FPS) แยกจากอัตรา tick ของการจำลอง
+    COLOR_MAP = {"GAMING": "#E53935", "WORKSTATION": "#F57C00", "POWER_SAVE": "#43A047", "DEFAULT": "#78909C"}
+    # ปุ่ม Scenario: ชื่อไฟล์ใน scenarios/ -> (ข้อความปกติ, ข้อความระหว่างทำงาน, สี, สีเมื่อชี้)
+    SCENARIO_BUTTONS = {
+        'workstation': ("💼 Run Workstation Task", "Working...", None, None),
+        'thrashing': ("💥 System Thrashing Test", "Thrashing...", "#6A1B9A", "#4A148C"),
+        'stress': ("🔥 Ultimate Stress Test", "Testing...", "#D32F2F", "#B71C1C"),
+    }
+
+    def __init__(self, clock=None, max_log_lines=2000, tick_speed_ms=1000, sim_seconds_per_tick=SIM_SECONDS_PER_TICK):
         super().__init__(); self.title("Panyarin AI Control Room (Hostile Environment Sim)"); self.geometry("1280x800")
         customtkinter.set_appearance_mode("Dark"); customtkinter.set_default_color_theme("blue")
-        self.env = SimulationEnvironment(); self.ai = PanyarinNeuralAI(psutil_mock=self.env.psutil_mock, subprocess_mock=self.env.subprocess_mock)
-        self.is_running = False; self.tick_speed_ms = 1000; self.app_checkboxes = {}; self.is_in_reflex_state = False
+        # VirtualClock: เวลาของ AI เดินทีละ sim_seconds_per_tick ต่อ tick ไม่ว่า tick_speed_ms (จังหวะเวลาจริง) หรือหน้าต่างจะช้าเร็วแค่ไหน
+        self.clock = clock or make_clock()
+        self.env = SimulationEnvironment(clock=self.clock); self.ai = PanyarinNeuralAI(psutil_mock=self.env.psutil_mock, subprocess_mock=self.env.subprocess_mock, clock=self.clock)
+        self.is_running = False; self.tick_speed_ms = tick_speed_ms; self.app_checkboxes = {}; self.is_in_reflex_state = False
+        # การจำลองและ AI ทำงานบน worker thread; Tk thread แค่วาด snapshot ล่าสุดตามจังหวะ FRAME_MS
+        self.worker = SimulationWorker(self.env, self.ai, tick_interval=tick_speed_ms / 1000, sim_seconds_per_tick=sim_seconds_per_tick, clock=self.clock)
+        self._rendered = {}; self._rendered_snapshot = None
         self._create_widgets()
-        sys.stdout = TextRedirector(self.log_textbox); sys.stderr = TextRedirector(self.log_textbox)
+        sys.stdout = sys.stderr = TextRedirector(self.log_textbox, max_lines=max_log_lines)
         Logger.info("Panyarin AI Control Room Initialized.")
         Logger.info("✅ System ready. Engage simulation scenarios.")
-        self.update_dashboard()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.worker.start(); self.render_frame()
 
     def _create_widgets(self):
         self.grid_columnconfigure(1, weight=1); self.grid_rowconfigure(0, weight=1)
@@ -46,9 +85,11 @@ class PanyarinAIControlRoom(customtkinter.CTk):
         sim_control_frame = customtkinter.CTkFrame(left_panel, fg_color="transparent"); sim_control_frame.grid(row=0, column=0, padx=10, pady=10, sticky="new"); sim_control_frame.grid_columnconfigure((0, 1), weight=1); customtkinter.CTkLabel(sim_control_frame, text="SIMULATION CONTROL", font=customtkinter.CTkFont(size=14, weight="bold")).grid(row=0, column=0, columnspan=2, pady=(0, 10)); self.start_button = customtkinter.CTkButton(sim_control_frame, text="▶️ Start", command=self.start_simulation); self.start_button.grid(row=1, column=0, padx=(0, 5), pady=5, sticky="ew"); self.stop_button = customtkinter.CTkButton(sim_control_frame, text="⏸️ Pause", command=self.stop_simulation, state="disabled"); self.stop_button.grid(row=1, column=1, padx=(5, 0), pady=5, sticky="ew")
         
         scenario_frame = customtkinter.CTkFrame(left_panel, fg_color="transparent"); scenario_frame.grid(row=1, column=0, padx=10, pady=10, sticky="new"); scenario_frame.grid_columnconfigure(0, weight=1); customtkinter.CTkLabel(scenario_frame, text="AUTOMATED SCENARIOS", font=customtkinter.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=(10, 10))
-        self.work_test_button = customtkinter.CTkButton(scenario_frame, text="💼 Run Workstation Task", command=self.run_workstation_test); self.work_test_button.grid(row=1, column=0, padx=0, pady=5, sticky="ew")
-        self.thrashing_button = customtkinter.CTkButton(scenario_frame, text="💥 System Thrashing Test", fg_color="#6A1B9A", hover_color="#4A148C", command=self.run_thrashing_test); self.thrashing_button.grid(row=2, column=0, padx=0, pady=5, sticky="ew")
-        self.stress_test_button = customtkinter.CTkButton(scenario_frame, text="🔥 Ultimate Stress Test", fg_color="#D32F2F", hover_color="#B71C1C", command=self.run_stress_test); self.stress_test_button.grid(row=3, column=0, padx=0, pady=5, sticky="ew")
+        self.scenario_buttons = {}
+        for row, (name, (text, _, color, hover)) in enumerate(self.SCENARIO_BUTTONS.items(), start=1):
+            colors = {"fg_color": color, "hover_color": hover} if color else {}
+            button = customtkinter.CTkButton(scenario_frame, text=text, command=lambda n=name: self.run_scenario(n), **colors); button.grid(row=row, column=0, padx=0, pady=5, sticky="ew")
+            self.scenario_buttons[name] = button
 
         manual_frame = customtkinter.CTkFrame(left_panel, fg_color="transparent"); manual_frame.grid(row=2, column=0, padx=10, pady=10, sticky="new"); manual_frame.grid_columnconfigure(0, weight=1)
         customtkinter.CTkLabel(manual_frame, text="MANUAL APP CONTROL", font=customtkinter.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=(10, 10))
@@ -99,40 +140,52 @@ class PanyarinAIControlRoom(customtkinter.CTk):
         self.log_textbox.grid(row=1, column=0, padx=0, pady=(10,0), sticky="nsew")
         # ^^^^^^ THIS IS THE CORRECTED/RESTORED SECTION ^^^^^^
         
-    def launch_selected_apps(self): Logger.user_action("Launching selected apps..."); [self.env.add_app(app_name) for app_name, (_, cb_var) in self.app_checkboxes.items() if cb_var.get() == "on"]
-    def launch_all_apps(self): Logger.user_action("Launching ALL test applications..."); [self.env.add_app(app_name) or cb_var.set("on") for app_name, (_, cb_var) in self.app_checkboxes.items()]
-    def close_all_apps(self): Logger.user_action("Closing all user applications..."); [cb_var.set("off") for _, (_, cb_var) in self.app_checkboxes.items()]; [self.env.remove_app(app) for app in list(self.env.state['running_apps'].keys() - {'python3', 'cinnamon'})]
-    def run_workstation_test(self): Logger.scenario("INITIATING WORKSTATION TASK"); self.start_simulation() if not self.is_running else None; self.close_all_apps(); self.after(1000, lambda: self.env.add_app('blender')); self.after(3000, lambda: (Logger.scenario("Blender enters 'active' rendering state..."), self.env.set_app_state('blender', 'active'))); self.after(9000, lambda: (Logger.scenario("Blender render finished, returning to 'idle'."), self.env.set_app_state('blender', 'idle'))); self.after(11000, lambda: (self.close_all_apps(), Logger.scenario("WORKSTATION TASK COMPLETE.")))
-    def run_thrashing_test(self): Logger.scenario("INITIATING SYSTEM THRASHING TEST"); self.thrashing_button.configure(state="disabled",text="Thrashing..."); self.start_simulation() if not self.is_running else None; self.close_all_apps(); self.after(1000, lambda: (Logger.scenario("PHASE 1: High CPU Task (Kdenlive)"), self.env.add_app('kdenlive', 'active'))); self.after(3000, lambda: (Logger.scenario("PHASE 2: Contention Task (Blender)"), self.env.add_app('blender', 'active'))); self.after(5000, lambda: (Logger.scenario("PHASE 3: I/O Saturation Event"), self.env.trigger_io_stress(40))); self.after(7000, lambda: (Logger.scenario("PHASE 4: Memory Crisis"), self.env.trigger_memory_stress(95))); self.after(12000, lambda: (Logger.scenario("PHASE 5: System Cooldown"), self.close_all_apps())); self.after(15000, lambda: (Logger.scenario("THRASHING TEST COMPLETE"), self.thrashing_button.configure(state="normal",text="💥 System Thrashing Test")))
-    def run_stress_test(self): Logger.scenario("INITIATING ULTIMATE STRESS TEST"); self.stress_test_button.configure(state="disabled", text="Testing..."); self.start_simulation() if not self.is_running else None; self.close_all_apps(); self.after(2000, lambda: (Logger.scenario("PHASE 1: Launching light app..."), self.env.add_app('firefox'))); self.after(4000, lambda: (Logger.scenario("PHASE 2: Launching workstation app..."), self.env.add_app('blender', state='active'))); self.after(6000, lambda: (Logger.scenario("PHASE 3: Simulating gaming conflict..."), self.env.add_app('steam'))); self.after(8000, lambda: (Logger.scenario("PHASE 4: Triggering memory crisis..."), self.env.trigger_memory_stress(96))); self.after(10000, lambda: (Logger.scenario("PHASE 5: System cooldown..."), self.env.remove_app('steam'), self.env.remove_app('blender'))); self.after(12000, lambda: self.env.remove_app('firefox')); self.after(14000, lambda: (Logger.scenario("TEST COMPLETE."), self.stress_test_button.configure(state="normal", text="🔥 Ultimate Stress Test")))
+    def launch_selected_apps(self): Logger.user_action("Launching selected apps..."); [self._sim(self.env.add_app, app_name) for app_name, (_, cb_var) in self.app_checkboxes.items() if cb_var.get() == "on"]
+    def launch_all_apps(self): Logger.user_action("Launching ALL test applications..."); [self._sim(self.env.add_app, app_name) or cb_var.set("on") for app_name, (_, cb_var) in self.app_checkboxes.items()]
+    def close_all_apps(self): Logger.user_action("Closing all user applications..."); [cb_var.set("off") for _, (_, cb_var) in self.app_checkboxes.items()]; self._sim(self.env.close_all_apps)
+    def run_scenario(self, name):
+        # ไทม์ไลน์อยู่ใน scenarios/<name>.json และเล่นบน worker ตาม tick (ปุ่มกลับมาใช้ได้เมื่อ Scenario หายจาก active_scenarios)
+        scenario = load_scenario(name); [cb_var.set("off") for _, (_, cb_var) in self.app_checkboxes.items()]
+        self.scenario_buttons[name].configure(state="disabled", text=self.SCENARIO_BUTTONS[name][1]); self._rendered.pop(("scenario", name), None)
+        self.start_simulation() if not self.is_running else None; self.worker.schedule_scenario(scenario)
+    def _sim(self, fn, *args, **kwargs): self.worker.submit(fn, *args, **kwargs) # แก้ไข env บน worker thread เท่านั้น
+    def on_close(self): self.worker.stop(); self.destroy()
     def start_simulation(self):
-        if not self.is_running: self.is_running = True; self.start_button.configure(state="disabled"); self.stop_button.configure(state="normal"); Logger.info("Simulation Started."); self.simulation_tick()
+        if not self.is_running: self.is_running = True; self.start_button.configure(state="disabled"); self.stop_button.configure(state="normal"); Logger.info("Simulation Started."); self.worker.set_running(True)
     def stop_simulation(self):
-        if self.is_running: self.is_running = False; self.start_button.configure(state="normal"); self.stop_button.configure(state="disabled"); Logger.info("Simulation Paused.")
-    def simulation_tick(self):
-        if not self.is_running: return
-        self.env.update_system_load(); self.ai.main_loop_step(); self.update_dashboard(); self.after(self.tick_speed_ms, self.simulation_tick)
-
-    def update_dashboard(self):
-        cpu_val = self.env.state['cpu_percent']; mem_info = self.env.psutil_mock.virtual_memory(); io_val = self.env.state['io_wait']
-        self.cpu_bar.set(cpu_val / 100); self.cpu_percent_label.configure(text=f"{cpu_val:.1f} %")
-        self.mem_bar.set(mem_info.percent / 100); self.mem_percent_label.configure(text=f"{mem_info.percent:.1f} %")
-        self.io_bar.set(io_val / 100); self.io_percent_label.configure(text=f"{io_val:.1f} %")
-        self.failures_label.configure(text=str(len(self.ai.failure_tracker)))
-        
-        strategy_name = self.ai.current_strategy.name; strategy_text = strategy_name.replace("_", " ").upper()
-        color_map = {"GAMING": "#E53935", "WORKSTATION": "#F57C00", "POWER_SAVE": "#43A047", "DEFAULT": "#78909C"}
-        self.strategy_label.configure(text=strategy_text, text_color=color_map.get(strategy_name, "white"))
-        self.governor_label.configure(text=self.env.state['governor']); self.trigger_label.configure(text=self.ai.last_trigger_reason)
+        if self.is_running: self.is_running = False; self.start_button.configure(state="normal"); self.stop_button.configure(state="disabled"); Logger.info("Simulation Paused."); self.worker.set_running(False)
+
+    def render_frame(self):
+        snapshot = self.worker.latest
+        if snapshot is not self._rendered_snapshot: self.update_dashboard(snapshot); self._rendered_snapshot = snapshot
+        self.after(self.FRAME_MS, self.render_frame)
+
+    def _update(self, key, value, apply):
+        # แตะ widget เฉพาะเมื่อค่าที่แสดงเปลี่ยนจากเฟรมก่อน
+        if self._rendered.get(key) != value: self._rendered[key] = value; apply(value)
+
+    def update_dashboard(self, snapshot):
+        cpu_val = snapshot.cpu_percent; mem_val = snapshot.mem_percent; io_val = snapshot.io_wait
+        self._update("cpu_bar", round(cpu_val / 100, 3), self.cpu_bar.set); self._update("cpu_label", f"{cpu_val:.1f} %", lambda t: self.cpu_percent_label.configure(text=t))
+        self._update("mem_bar", round(mem_val / 100, 3), self.mem_bar.set); self._update("mem_label", f"{mem_val:.1f} %", lambda t: self.mem_percent_label.configure(text=t))
+        self._update("io_bar", round(io_val / 100, 3), self.io_bar.set); self._update("io_label", f"{io_val:.1f} %", lambda t: self.io_percent_label.configure(text=t))
+        self._update("failures", str(snapshot.failures), lambda t: self.failures_label.configure(text=t))
+
+        strategy_name = snapshot.strategy.name; strategy_text = strategy_name.replace("_", " ").upper()
+        self._update("strategy", (strategy_text, self.COLOR_MAP.get(strategy_name, "white")), lambda v: self.strategy_label.configure(text=v[0], text_color=v[1]))
+        self._update("governor", snapshot.governor, lambda t: self.governor_label.configure(text=t)); self._update("trigger", snapshot.trigger_reason, lambda t: self.trigger_label.configure(text=t))
 
-        mood_color = color_map.get(strategy_name, "white"); mood_art = self.ASCII_MOODS.get(self.ai.current_strategy, self.ASCII_MOODS[Strategy.DEFAULT])
-        if self.ai.tick_counter % 10 < 2 and self.ai.tick_counter > 0: mood_art = self.ASCII_MOODS["CONFUSED"]; mood_color="#90CAF9"
-        if mem_info.percent > 90: mood_art = self.ASCII_MOODS["REFLEX"]; mood_color="#FBC02D"
-        self.ai_mood_label.configure(text=mood_art, text_color=mood_color)
+        mood_color = self.COLOR_MAP.get(strategy_name, "white"); mood_art = self.ASCII_MOODS.get(snapshot.strategy, self.ASCII_MOODS[Strategy.DEFAULT])
+        if snapshot.tick % 10 < 2 and snapshot.tick > 0: mood_art = self.ASCII_MOODS["CONFUSED"]; mood_color="#90CAF9"
+        if mem_val > 90: mood_art = self.ASCII_MOODS["REFLEX"]; mood_color="#FBC02D"
+        self._update("mood", (mood_art, mood_color), lambda v: self.ai_mood_label.configure(text=v[0], text_color=v[1]))
+        for name, button in self.scenario_buttons.items():
+            busy = name in snapshot.active_scenarios
+            self._update(("scenario", name), busy, lambda b, button=button, name=name: button.configure(state="disabled" if b else "normal", text=self.SCENARIO_BUTTONS[name][1 if b else 0]))
 
 if __name__ == "__main__":
     try:
-        app = PanyarinAIControlRoom()
+        app = PanyarinAIControlRoom(clock=make_clock(virtual="--virtual" in sys.argv))
         app.mainloop()
     except Exception as e:
         print("="*80)
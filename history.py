@@ -0,0 +1,63 @@
+# filename: history.py
+import collections
+from array import array
+
+class PerformanceHistory:
+    """
+    ประวัติประสิทธิภาพแบบ ring buffer คอลัมน์คงที่ (strategy id, cpu, io_wait, failures) ขนาด window tick ล่าสุด
+    ค่าสถิติของหน้าต่าง (mean cpu, max io_wait, จำนวน tick ที่มีความล้มเหลว, จำนวนครั้งต่อกลยุทธ์) ถูกอัปเดตทีละ tick
+    จึงอ่านได้ใน O(1) และหน่วยความจำคงที่ไม่ว่าจะรันนานแค่ไหน
+    """
+    __slots__ = ('window', 'labels', '_label_index', '_strategy', '_cpu', '_io_wait', '_failures', '_head', '_size', '_seq',
+                 '_cpu_sum', '_failed_ticks', '_io_max', '_positions')
+
+    def __init__(self, window, labels):
+        if window < 1: raise ValueError("window must be at least 1 tick")
+        self.window = window; self.labels = tuple(labels); self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self._strategy = array('b', bytes(window)); self._cpu = array('d', bytes(8 * window))
+        self._io_wait = array('d', bytes(8 * window)); self._failures = array('I', [0]) * window
+        self.clear()
+
+    def clear(self):
+        self._head = 0; self._size = 0; self._seq = 0; self._cpu_sum = 0.0; self._failed_ticks = 0
+        self._io_max = collections.deque() # (seq, io_wait) เรียงลดลง: ตัวหน้าสุดคือค่าสูงสุดของหน้าต่าง
+        self._positions = [collections.deque() for _ in self.labels] # seq ของแต่ละกลยุทธ์ในหน้าต่าง (ใช้นับ + หาตัวที่ปรากฏก่อน)
+
+    def __len__(self): return self._size
+
+    def append(self, label, cpu, io_wait, failures):
+        i = self._head; seq = self._seq; oldest = seq - self.window
+        if self._size == self.window: # ดันค่าเก่าสุดออกจากหน้าต่าง
+            self._cpu_sum -= self._cpu[i]; self._failed_ticks -= self._failures[i] > 0
+            self._positions[self._strategy[i]].popleft()
+            if self._io_max and self._io_max[0][0] <= oldest: self._io_max.popleft()
+        else:
+            self._size += 1
+        sid = self._label_index[label]
+        self._strategy[i] = sid; self._cpu[i] = cpu; self._io_wait[i] = io_wait; self._failures[i] = failures
+        self._cpu_sum += cpu; self._failed_ticks += failures > 0; self._positions[sid].append(seq)
+        while self._io_max and self._io_max[-1][1] <= io_wait: self._io_max.pop()
+        self._io_max.append((seq, io_wait))
+        self._seq = seq + 1; self._head = (i + 1) % self.window
+        # คำนวณผลรวมใหม่ทุกครั้งที่วนครบรอบ (O(1) เฉลี่ย) เพื่อไม่ให้ error ของ float สะสม
+        if self._head == 0 and self._size == self.window: self._cpu_sum = sum(self._cpu)
+
+    def mean_cpu(self): return self._cpu_sum / self._size if self._size else 0.0
+    def max_io(self): return self._io_max[0][1] if self._io_max else 0.0
+    def failed_ticks(self): return self._failed_ticks
+    def strategy_counts(self): return {label: len(self._positions[i]) for i, label in enumerate(self.labels) if self._positions[i]}
+
+    def most_common_strategy(self):
+        """เหมือน Counter.most_common(1): นับมากสุด ถ้าเสมอกันเลือกตัวที่ปรากฏในหน้าต่างก่อน"""
+        best = None; best_key = None
+        for i, positions in enumerate(self._positions):
+            if positions:
+                key = (len(positions), -positions[0])
+                if best_key is None or key > best_key: best = self.labels[i]; best_key = key
+        return best
+
+    def rows(self):
+        """คืนข้อมูลในหน้าต่างเรียงจากเก่าไปใหม่เป็น (label, cpu, io_wait, failures)"""
+        start = (self._head - self._size) % self.window
+        return [(self.labels[self._strategy[j]], self._cpu[j], self._io_wait[j], self._failures[j])
+                for j in ((start + k) % self.window for k in range(self._size))]
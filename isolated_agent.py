@@ -1,6 +1,11 @@
 # filename: isolated_agent.py
-import time, enum, statistics, os
+import enum, os, time
 from logger import Logger
+from clock import RealClock
+from history import PerformanceHistory
+from policy import load_policy
+from forecast import PressureForecaster
+from scoring import ScoringEngine, load_rules
 
 class Event(enum.Enum):
     STRATEGY_APPLIED="กลยุทธ์ใหม่"; TACTICAL_BOOST="เสริมสมรรถนะเชิงรุก"; REFLEX_TRIGGERED="ตอบสนองฉับพลัน"
@@ -10,138 +15,185 @@ class Event(enum.Enum):
 class Strategy(enum.Enum):
     DEFAULT="DEFAULT"; WORKSTATION="WORKSTATION"; GAMING="GAMING"; POWER_SAVE="POWER_SAVE"
 
+ACTION_NAMES = ('set_governor', 'drop_caches', 'renice_high_cpu', 'kill_most_mem_proc')
+# บิตของแต่ละ Event / Action สำหรับ bitmask ราย tick (ลำดับคงที่ ใช้ร่วมกับ tick_trace)
+EVENT_BITS = {event: 1 << i for i, event in enumerate(Event)}
+ACTION_BITS = {name: 1 << i for i, name in enumerate(ACTION_NAMES)}
+PREEMPTIVE_DROP = 'drop_caches_preemptive' # key ของ drop_caches ล่วงหน้าจากการพยากรณ์ (cooldown / ความล้มเหลวแยกจาก reflex ปกติ)
+
 class PanyarinNeuralAI:
-    def __init__(self, psutil_mock, subprocess_mock):
+    strategy_index = {strategy: i for i, strategy in enumerate(Strategy)}
+
+    def __init__(self, psutil_mock, subprocess_mock, clock=None, history_window=10, metrics=None, executor=None, policy=None, scoring_rules=None):
         self.psutil = psutil_mock; self.subprocess = subprocess_mock; self.current_strategy = Strategy.DEFAULT
+        self.clock = clock or RealClock() # นาฬิกาที่ใช้ทั้ง expiry ของ Action และหน้าต่างความล้มเหลว
+        self.metrics = metrics # AgentMetrics (ไม่บังคับ); None = ไม่วัดผล
+        self.executor = executor # ActionExecutor (ไม่บังคับ); None = รัน Action แบบ synchronous ภายใน tick
+        self.policy = policy or load_policy() # AgentPolicy: เกณฑ์การตัดสินใจทั้งหมด (ค่าตั้งต้น หรือไฟล์จาก $PANYARIN_POLICY)
+        self.forecaster = PressureForecaster.from_policy(self.policy) # None = ตอบสนองจากค่าปัจจุบันเท่านั้น
+        self.scoring_rules = scoring_rules if isinstance(scoring_rules, dict) else load_rules(scoring_rules) # พาธไฟล์กฎหรือ dict ที่โหลดแล้ว (None = scoring_rules.json)
+        self.scorer = ScoringEngine(self.scoring_rules, self.policy, Strategy)
         self.active_optimizations = {}; self.cpu_count = self.psutil.cpu_count() or 1
         self.last_trigger_reason = "Initial State"; self.model, self.encoder, self.model_score = self._load_model()
-        self.tick_counter = 0
+        self.tick_counter = 0; self._snapshot = self._snapshot_observed = None # snapshot ล่าสุด (ใช้ร่วมกันระหว่างลูปที่รันคนละอัตรา)
         self.failure_tracker = {} # ติดตามความล้มเหลวของ Action
-        self.performance_history = [] # เก็บประวัติประสิทธิภาพเพื่อการเรียนรู้
+        self.last_scores = {} # คะแนนของแต่ละกลยุทธ์จาก strategic_assessment ครั้งล่าสุด
+        self.tick_events = self.tick_actions_ok = self.tick_actions_failed = 0 # bitmask สะสมจนกว่าจะ drain_tick_flags()
+        self.performance_history = PerformanceHistory(history_window, Strategy) # หน้าต่างประวัติประสิทธิภาพเพื่อการเรียนรู้ (ขนาดคงที่)
         
         # น้ำหนักเริ่มต้นสำหรับแต่ละกลยุทธ์ (AI จะปรับค่าเหล่านี้เอง)
         self.strategy_weights = {
             Strategy.GAMING: 1.0, Strategy.WORKSTATION: 1.0,
             Strategy.POWER_SAVE: 1.0, Strategy.DEFAULT: 1.0
         }
+        self.weights_version = 0 # เพิ่มทุกครั้งที่ strategy_weights เปลี่ยน (ใช้เป็นส่วนหนึ่งของคีย์แคชคะแนน)
         
         Logger.info("Panyarin AI Agent Core v2.0 (Adaptive) initialized.")
 
+    def _emit(self, event, details):
+        """นับ Event (ถ้าเปิด metrics) แล้วส่งให้ Logger; details เป็น dict หรือฟังก์ชันที่สร้าง dict เมื่อจำเป็นต้อง Log จริง"""
+        self.tick_events |= EVENT_BITS[event]
+        if self.metrics is not None: self.metrics.count_event(event)
+        if Logger.event_enabled(event): Logger.log_ai_event(event, details() if callable(details) else details)
+
+    def drain_tick_flags(self):
+        """คืน (events, actions_ok, actions_failed) bitmask ที่สะสมตั้งแต่การเรียกครั้งก่อน แล้วล้างค่า"""
+        flags = (self.tick_events, self.tick_actions_ok, self.tick_actions_failed)
+        self.tick_events = self.tick_actions_ok = self.tick_actions_failed = 0
+        return flags
+
     def _load_model(self):
         Logger.info("Simulation mode: Neural Network model is not loaded.")
         return "SimulatedModel", "SimulatedEncoder", 0.85 
 
     def get_system_snapshot(self):
         mem = self.psutil.virtual_memory()
-        return {
-            "timestamp": time.time(),
+        snapshot = {
+            "timestamp": self.clock.now(),
             "cpu_percent": self.psutil.cpu_percent(),
             "mem_percent": mem.percent,
-            "running_apps": set(self.psutil.system_state['running_apps'].keys()),
-            "io_wait": self.psutil.system_state['io_wait'] # ดึงข้อมูลใหม่
+            "running_apps": self.psutil.running_app_names(),
+            "io_wait": self.psutil.io_wait() # backend (จำลอง/จริง) เป็นผู้ให้ค่า ไม่อ่าน system_state ตรง ๆ
         }
+        if self.forecaster is not None: self.forecaster.observe(snapshot) # เพิ่ม mem_forecast / io_forecast
+        return snapshot
+
+    def get_snapshot(self, max_age=0.0):
+        """snapshot ที่อายุไม่เกิน max_age วินาที (อ่านใหม่จาก backend เมื่อเก่ากว่านั้น)"""
+        snapshot = self._snapshot
+        if snapshot is None or self.clock.now() - snapshot["timestamp"] > max_age: snapshot = self._snapshot = self.get_system_snapshot()
+        return snapshot
 
     def strategic_assessment(self, snapshot):
         apps = snapshot["running_apps"]; cpu = snapshot["cpu_percent"]; io_wait = snapshot["io_wait"]
-        scores = {s: 0 for s in Strategy}
-        
-        scores[Strategy.DEFAULT] = 10
-        if any(app in {'steam', 'lutris'} for app in apps): scores[Strategy.GAMING] += 60
-        if 'obs' in apps: scores[Strategy.GAMING] += 20; scores[Strategy.WORKSTATION] += 20
-        if any(app in {'kdenlive', 'blender'} for app in apps): scores[Strategy.WORKSTATION] += 50
-        if cpu > 75: scores[Strategy.GAMING] += 15; scores[Strategy.WORKSTATION] += 15
-        if cpu > 50: scores[Strategy.GAMING] += 10; scores[Strategy.WORKSTATION] += 10
-        if cpu < 20 and len(apps) < 5: scores[Strategy.POWER_SAVE] += 40
-        
-        # AI เรียนรู้ที่จะกลัว I/O Wait! มันจะลดคะแนนโหมด Performance ถ้า I/O สูง
-        if io_wait > 20:
-            scores[Strategy.GAMING] *= 0.5
-            scores[Strategy.WORKSTATION] *= 0.7
-            reason_io = f" (High I/O: {io_wait:.0f}%)"
-        else:
-            reason_io = ""
-
-        # นำน้ำหนักที่ได้จากการเรียนรู้มาคูณกับคะแนน
-        for strategy in scores:
-            scores[strategy] *= self.strategy_weights[strategy]
-
-        new_strategy = max(scores, key=scores.get)
-        
-        reason_map = {
-            Strategy.GAMING: "Gaming session", Strategy.WORKSTATION: "Workstation task",
-            Strategy.POWER_SAVE: "Low system activity", Strategy.DEFAULT: "System idle"
-        }
-        reason = reason_map.get(new_strategy, "Complex assessment") + reason_io
+        # คะแนนจากตารางกฎที่คอมไพล์แล้ว (scoring_rules.json) คูณน้ำหนักที่ได้จากการเรียนรู้; แคชไว้จนกว่าสถานะหรือน้ำหนักจะเปลี่ยน
+        # AI เรียนรู้ที่จะกลัว I/O Wait! กฎ io_dampers ลดคะแนนโหมด Performance ถ้า I/O สูง (หรือคาดว่าจะสูงเมื่อเปิด forecast_io)
+        scores, new_strategy, io_mode = self.scorer.score(apps, cpu, io_wait, snapshot.get("io_forecast"), self.strategy_weights, self.weights_version)
+        self.last_scores = scores
 
         if new_strategy != self.current_strategy:
-            self.current_strategy = new_strategy; self.last_trigger_reason = reason
-            Logger.log_ai_event(Event.STRATEGY_APPLIED, {"new_strategy": self.current_strategy.name, "reason": self.last_trigger_reason, "score": scores[new_strategy]})
+            reason_io = f" (High I/O: {io_wait:.0f}%)" if io_mode == 1 else f" (I/O rising: {snapshot['io_forecast']:.0f}% expected)" if io_mode == 2 else ""
+            self.current_strategy = new_strategy; self.last_trigger_reason = self.scorer.reasons[new_strategy] + reason_io
+            self._emit(Event.STRATEGY_APPLIED, {"new_strategy": self.current_strategy.name, "reason": self.last_trigger_reason, "score": scores[new_strategy]})
             self.apply_strategy()
         
         # บันทึกข้อมูลสำหรับ Learning Cycle
-        self.performance_history.append({'strategy': self.current_strategy, 'cpu': cpu, 'io_wait': io_wait, 'failures': len(self.failure_tracker)})
+        self.performance_history.append(self.current_strategy, cpu, io_wait, len(self.failure_tracker))
 
     def apply_strategy(self):
         gov = "performance" if self.current_strategy in [Strategy.GAMING, Strategy.WORKSTATION] else "powersave" if self.current_strategy == Strategy.POWER_SAVE else "schedutil"
         self.perform_action("set_governor", {"governor": gov})
 
     def tactical_maneuver(self, snapshot):
-        if snapshot['cpu_percent'] > 70:
-            Logger.log_ai_event(Event.TACTICAL_BOOST, {"reason": f"High CPU Load ({snapshot['cpu_percent']:.0f}%) detected"})
+        if snapshot['cpu_percent'] > self.policy.tactical_cpu:
+            self._emit(Event.TACTICAL_BOOST, lambda: {"reason": f"High CPU Load ({snapshot['cpu_percent']:.0f}%) detected"})
             self.perform_action("renice_high_cpu", {}, duration=120)
 
     def reflexive_response(self, snapshot):
-        if snapshot["mem_percent"] > 90:
-            Logger.log_ai_event(Event.REFLEX_TRIGGERED, {"reason": f"Critical Memory Pressure ({snapshot['mem_percent']:.0f}%)"})
+        mem = snapshot["mem_percent"]; p = self.policy
+        if mem > p.reflex_mem:
+            self._emit(Event.REFLEX_TRIGGERED, lambda: {"reason": f"Critical Memory Pressure ({mem:.0f}%)"})
             # ตรวจสอบว่าเคยทำ drop_caches ล้มเหลวหรือไม่
-            if "drop_caches" in self.failure_tracker and time.time() - self.failure_tracker["drop_caches"] < 30:
-                Logger.log_ai_event(Event.EMERGENCY_ACTION, {"action": "Attempting to kill highest memory process", "reason": "drop_caches failed recently"})
+            if "drop_caches" in self.failure_tracker and self.clock.now() - self.failure_tracker["drop_caches"] < p.drop_caches_retry_window:
+                self._emit(Event.EMERGENCY_ACTION, {"action": "Attempting to kill highest memory process", "reason": "drop_caches failed recently"})
                 self.perform_action("kill_most_mem_proc", {})
             else:
-                self.perform_action("drop_caches", {}, duration=15)
+                self.perform_action("drop_caches", {}, duration=p.drop_caches_duration)
+        elif p.forecast_mem and snapshot["mem_forecast"] > p.reflex_mem:
+            # คาดว่าจะเกินเกณฑ์ภายใน forecast_horizon: drop_caches ล่วงหน้า (ไม่ยกระดับเป็นการฆ่าโปรเซส)
+            # ใช้ key PREEMPTIVE_DROP แยกทั้ง cooldown และความล้มเหลว: reflex ปกติจึงยังทำงานได้ถ้าเกินจริงก่อนคาด
+            # และความล้มเหลวของการทำล่วงหน้าไม่นับเป็นเหตุให้ฆ่าโปรเซส; cooldown อย่างน้อยเท่า drop_caches ปกติ
+            # (ระดับที่ปรับเรียบแล้วอาจเกินเกณฑ์ขณะค่าจริงยังไม่เกิน ทำให้ breach_in = 0 และทำซ้ำทุก tick)
+            breach_in = self.forecaster.mem.breach_in(p.reflex_mem)
+            self._emit(Event.REFLEX_TRIGGERED, lambda: {"reason": f"Memory Pressure Expected ({snapshot['mem_forecast']:.0f}% in {breach_in:.1f}s)"})
+            self.perform_action("drop_caches", {}, duration=max(breach_in, p.drop_caches_duration), key=PREEMPTIVE_DROP)
 
     def learning_cycle(self):
-        if not self.performance_history: return
+        history = self.performance_history; p = self.policy
+        if not history: return
         
-        # วิเคราะห์ข้อมูลย้อนหลัง
-        avg_cpu = statistics.mean(p['cpu'] for p in self.performance_history)
-        max_io = max(p['io_wait'] for p in self.performance_history)
-        total_failures = sum(1 for p in self.performance_history if p['failures'] > 0)
+        # วิเคราะห์ข้อมูลย้อนหลัง (สถิติของหน้าต่างถูกอัปเดตไว้แล้วทุก tick จึงอ่านได้ทันที)
+        avg_cpu = history.mean_cpu()
+        max_io = history.max_io()
+        total_failures = history.failed_ticks()
+        most_used_strategy = history.most_common_strategy()
         
         adjustments = []
         # ตรรกะการเรียนรู้แบบง่าย: ถ้าประสิทธิภาพโดยรวมแย่ ให้ลดความมั่นใจในกลยุทธ์ที่ใช้บ่อย
-        if avg_cpu > 80 or max_io > 30 or total_failures > 1:
-            strategy_counts = statistics.Counter(p['strategy'] for p in self.performance_history)
-            most_used_strategy = strategy_counts.most_common(1)[0][0]
-            
+        if avg_cpu > p.learning_poor_cpu or max_io > p.learning_poor_io or total_failures > p.learning_poor_failures:
             # ลดน้ำหนักของกลยุทธ์ที่ใช้แล้วผลออกมาไม่ดี
-            self.strategy_weights[most_used_strategy] *= 0.95
+            self.strategy_weights[most_used_strategy] *= p.learning_penalty; self.weights_version += 1
             adjustments.append(f"Reduced weight for {most_used_strategy.name} due to poor performance (High CPU/IO/Failures)")
         else:
              # ถ้าผลงานดี ให้รางวัลกลยุทธ์ที่ใช้บ่อย
-            strategy_counts = statistics.Counter(p['strategy'] for p in self.performance_history)
-            most_used_strategy = strategy_counts.most_common(1)[0][0]
-            self.strategy_weights[most_used_strategy] = min(1.2, self.strategy_weights[most_used_strategy] * 1.05)
+            weight = min(p.weight_cap, self.strategy_weights[most_used_strategy] * p.learning_reward)
+            if weight != self.strategy_weights[most_used_strategy]: self.strategy_weights[most_used_strategy] = weight; self.weights_version += 1 # ถึงเพดานแล้วไม่ต้องล้างแคช
             adjustments.append(f"Increased weight for {most_used_strategy.name} due to good performance")
 
-        Logger.log_ai_event(Event.LEARNING_CYCLE, {"adjustments": " | ".join(adjustments) if adjustments else "No adjustments needed."})
-        self.performance_history.clear() # เริ่มเก็บข้อมูลใหม่
+        self._emit(Event.LEARNING_CYCLE, {"adjustments": " | ".join(adjustments) if adjustments else "No adjustments needed."})
+        # ไม่ล้างประวัติ: หน้าต่างเลื่อนไปเอง (เมื่อ history_window = 10 จะได้ชุดข้อมูลเดียวกับการล้างทุก 10 tick)
         self.failure_tracker.clear()
 
-    def perform_action(self, action_name, params, duration=60):
-        if action_name in self.active_optimizations and time.time() < self.active_optimizations[action_name]['expiry']: return
+    def perform_action(self, action_name, params, duration=60, key=None):
+        """key = ชื่อที่ใช้เก็บ cooldown (active_optimizations) และความล้มเหลว (failure_tracker) ตั้งต้นเป็น action_name"""
+        key = key or action_name
+        if key in self.active_optimizations and self.clock.now() < self.active_optimizations[key]['expiry']:
+            if self.metrics is not None: self.metrics.count_action(action_name, "skipped")
+            return
+        if self.executor is not None:
+            # ส่งให้ executor แล้วไปต่อทันที ผลจะกลับมาทาง poll_actions() ใน tick ถัดไป
+            if not self.executor.submit(action_name, params, duration, key) and self.metrics is not None: self.metrics.count_action(action_name, "coalesced")
+            return
         try:
             # subprocess.run ตอนนี้สามารถโยน Exception ได้
             self.subprocess.run(action_name, params)
-            Logger.log_ai_event(Event.ACTION_SUCCESS, {"action": action_name, "params": params})
-            self.active_optimizations[action_name] = {'expiry': time.time() + duration}
         except Exception as e:
-            self.failure_tracker[action_name] = time.time() # บันทึกความล้มเหลว
-            Logger.log_ai_event(Event.ACTION_FAIL, {"action": action_name, "error": str(e)})
+            self._action_failed(action_name, e, key)
+        else:
+            self._action_succeeded(action_name, params, duration, key)
+
+    def _action_succeeded(self, action_name, params, duration, key):
+        self.tick_actions_ok |= ACTION_BITS.get(action_name, 0)
+        self._emit(Event.ACTION_SUCCESS, {"action": action_name, "params": params})
+        self.active_optimizations[key] = {'expiry': self.clock.now() + duration}
+        if self.metrics is not None: self.metrics.count_action(action_name, "success")
+
+    def _action_failed(self, action_name, error, key):
+        self.failure_tracker[key] = self.clock.now(); self.tick_actions_failed |= ACTION_BITS.get(action_name, 0) # บันทึกความล้มเหลว
+        self._emit(Event.ACTION_FAIL, {"action": action_name, "error": str(error)})
+        if self.metrics is not None: self.metrics.count_action(action_name, "timeout" if isinstance(error, TimeoutError) else "failure")
+
+    def poll_actions(self):
+        """นำผลของ Action ที่ executor ทำเสร็จแล้วมาอัปเดต failure_tracker / active_optimizations (ไม่บล็อก)"""
+        for result in self.executor.poll():
+            if result.error is None: self._action_succeeded(result.action, result.params, result.duration, result.key)
+            else: self._action_failed(result.action, result.error, result.key)
 
     def main_loop_step(self):
+        if self.metrics is not None: return self._instrumented_loop_step()
         try:
             self.tick_counter += 1
+            if self.executor is not None: self.poll_actions()
             snapshot = self.get_system_snapshot()
             self.strategic_assessment(snapshot)
             self.tactical_maneuver(snapshot)
@@ -149,4 +201,38 @@ class PanyarinNeuralAI:
             if self.tick_counter % 10 == 0: # เรียนรู้ทุก 10 Ticks
                 self.learning_cycle()
         except Exception as e:
-            import traceback; Logger.log_ai_event(Event.APP_CRASH, {"reason": str(e), "traceback": traceback.format_exc()})
\ No newline at end of file
+            import traceback; self._emit(Event.APP_CRASH, {"reason": str(e), "traceback": traceback.format_exc()})
+
+    PHASE_METHODS = {'strategic': 'strategic_assessment', 'tactical': 'tactical_maneuver', 'reflex': 'reflexive_response'}
+
+    def run_phase(self, phase, max_age=0.0):
+        """รันเฟสเดียว (reflex / tactical / strategic / learning) สำหรับ MultiRateScheduler ที่ให้แต่ละเฟสมีคาบของตัวเอง"""
+        metrics = self.metrics
+        try:
+            start = time.perf_counter() if metrics is not None else 0.0
+            if self.executor is not None: self.poll_actions()
+            if phase == 'learning': self.learning_cycle()
+            else:
+                if phase == 'strategic': self.tick_counter += 1
+                snapshot = self.get_snapshot(max_age)
+                if metrics is not None and snapshot is not self._snapshot_observed: metrics.observe_snapshot(snapshot); self._snapshot_observed = snapshot
+                getattr(self, self.PHASE_METHODS[phase])(snapshot)
+            if metrics is not None: metrics.observe_phase(phase, time.perf_counter() - start)
+        except Exception as e:
+            import traceback; self._emit(Event.APP_CRASH, {"reason": str(e), "traceback": traceback.format_exc()})
+
+    def _instrumented_loop_step(self):
+        """main_loop_step แบบจับเวลาแต่ละเฟสลง self.metrics"""
+        metrics = self.metrics; clock = time.perf_counter
+        try:
+            start = clock(); self.tick_counter += 1
+            if self.executor is not None: self.poll_actions()
+            snapshot = self.get_system_snapshot(); t1 = clock(); metrics.observe_phase('snapshot', t1 - start); metrics.observe_snapshot(snapshot)
+            self.strategic_assessment(snapshot); t2 = clock(); metrics.observe_phase('strategic', t2 - t1)
+            self.tactical_maneuver(snapshot); t3 = clock(); metrics.observe_phase('tactical', t3 - t2)
+            self.reflexive_response(snapshot); t4 = clock(); metrics.observe_phase('reflex', t4 - t3)
+            if self.tick_counter % 10 == 0: # เรียนรู้ทุก 10 Ticks
+                self.learning_cycle(); t5 = clock(); metrics.observe_phase('learning', t5 - t4); t4 = t5
+            metrics.observe_phase('tick', t4 - start)
+        except Exception as e:
+            import traceback; self._emit(Event.APP_CRASH, {"reason": str(e), "traceback": traceback.format_exc()})
\ No newline at end of file
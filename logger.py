@@ -1,89 +1,233 @@
 # filename: logger.py
-import datetime
+import atexit, collections, contextlib, contextvars, datetime, json, sys, threading, time
+
+DEBUG, INFO, WARNING, ERROR, OFF = 10, 20, 30, 40, 100
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR", OFF: "OFF"}
+
+EMOJI_MAP = {
+    "AI_DECISION": "🧠",
+    "AI_ACTION": "⚡️",
+    "AI_REFLEX": "🩹",
+    "EMERGENCY_ACTION": "💀", # เพิ่ม Event สำหรับการกระทำขั้นรุนแรง
+    "SUCCESS": "✅",
+    "FAILURE": "❌",
+    "INFO": "ℹ️",
+    "USER": "🧑‍💻",
+    "SCENARIO": "🔥",
+    "LEARNING_CYCLE": "📚"
+}
+
+# Record หนึ่งรายการ: (timestamp, level, kind, message, args, details, host)
+# kind = INFO/USER/SCENARIO/ACTION หรือชื่อ Event ของ AI; host = ชื่อ host จาก Logger.bind() (None = ไม่มี)
+# การจัดรูปแบบข้อความทำใน Sink เท่านั้น
+def format_message(record):
+    message, args = record[3], record[4]
+    return message % args if args else message
+
+# ตัวแปลง Event ของ AI เป็นประโยคที่มนุษย์อ่านเข้าใจ (ตารางแทน if/elif)
+_EVENT_FORMATTERS = {
+    "STRATEGY_APPLIED": lambda d: f"{EMOJI_MAP['AI_DECISION']} Strategy set to {d.get('new_strategy', 'UNKNOWN').replace('_', ' ')} (Score: {d.get('score', 0):.0f}). Reason: {d.get('reason', 'no reason specified')}",
+    "TACTICAL_BOOST": lambda d: f"{EMOJI_MAP['AI_DECISION']} Tactical Boost: Proactively managing resources. Reason: {d.get('reason', 'High CPU load expected')}",
+    "REFLEX_TRIGGERED": lambda d: f"{EMOJI_MAP['AI_REFLEX']} Reflex Action Triggered! Reason: {d.get('reason', 'System critical')}",
+    "EMERGENCY_ACTION": lambda d: f"{EMOJI_MAP['EMERGENCY_ACTION']} Escalation! {d.get('action', 'unspecified action')}. Reason: {d.get('reason', 'no reason specified')}",
+    "ACTION_SUCCESS": lambda d: f"  {EMOJI_MAP['SUCCESS']} Action '{d.get('action', 'unspecified action')}' executed successfully.",
+    "ACTION_FAIL": lambda d: f"  {EMOJI_MAP['FAILURE']} Action '{d.get('action', 'unspecified action')}' failed! Error: {d.get('error', 'unknown error')}",
+    "APP_CRASH": lambda d: f"{EMOJI_MAP['FAILURE']} CRITICAL ERROR: {d.get('reason', 'Unknown critical failure')}",
+    "LEARNING_CYCLE": lambda d: f"{EMOJI_MAP['LEARNING_CYCLE']} Learning cycle: Analyzing performance... Adjustments: {d.get('adjustments', 'No adjustments made.')}",
+}
+
+class NullSink:
+    """ทิ้งทุก Record; Logger.configure(NullSink()) ตั้งระดับเป็น OFF เพื่อให้ทุกการเรียก return ก่อนสร้าง Record (ระดับเดิมกลับมาเมื่อเปลี่ยนเป็น Sink อื่น)"""
+    def emit(self, record): pass
+    def emit_batch(self, records): pass
+    def flush(self): pass
+    def close(self): pass
+
+class ConsoleSink:
+    """รูปแบบ emoji ดั้งเดิมบนคอนโซล (อ่าน sys.stdout ตอนเขียน เพื่อให้ GUI redirect ได้)"""
+    def __init__(self, stream=None):
+        self.stream = stream; self._last_second = None; self._last_stamp = ""
+
+    def _stamp(self, ts):
+        second = int(ts) # strftime ครั้งเดียวต่อวินาที
+        if second != self._last_second: self._last_second = second; self._last_stamp = datetime.datetime.fromtimestamp(second).strftime("%H:%M:%S")
+        return self._last_stamp
+
+    def format(self, record):
+        ts, _, kind, _, _, details, host = record
+        stamp = f"{self._stamp(ts)} {host}" if host is not None else self._stamp(ts)
+        if kind == "ACTION": return f"  [{stamp}] {EMOJI_MAP['AI_ACTION']} {format_message(record)}"
+        if details is None: return f"[{stamp}] {EMOJI_MAP[kind]} {format_message(record)}"
+        formatter = _EVENT_FORMATTERS.get(kind)
+        return f"[{stamp}] {formatter(details) if formatter else f'{kind}: {details}'}"
+
+    def emit(self, record): (self.stream or sys.stdout).write(self.format(record) + "\n")
+    def emit_batch(self, records):
+        if records: (self.stream or sys.stdout).write("".join(self.format(r) + "\n" for r in records))
+    def flush(self): (self.stream or sys.stdout).flush()
+    def close(self): self.flush()
+
+class JsonlSink:
+    """หนึ่ง Record ต่อหนึ่งบรรทัด JSON สำหรับนำไปวิเคราะห์ต่อ"""
+    def __init__(self, path_or_stream):
+        self._owns = isinstance(path_or_stream, str)
+        self.stream = open(path_or_stream, "a", encoding="utf-8") if self._owns else path_or_stream
+
+    @staticmethod
+    def format(record):
+        ts, level, kind, message, args, details, host = record
+        row = {"ts": ts, "level": LEVEL_NAMES.get(level, level), "kind": kind}
+        if host is not None: row["host"] = host
+        if message is not None: row["message"] = format_message(record)
+        if details is not None: row["details"] = details
+        return json.dumps(row, ensure_ascii=False, default=str)
+
+    def emit(self, record): self.stream.write(self.format(record) + "\n")
+    def emit_batch(self, records):
+        if records: self.stream.write("".join(self.format(r) + "\n" for r in records))
+    def flush(self): self.stream.flush()
+    def close(self):
+        self.flush()
+        if self._owns: self.stream.close()
+
+class BufferedSink:
+    """
+    เก็บ Record ใน ring buffer ขนาดจำกัด แล้วให้ writer thread เบื้องหลังจัดรูปแบบและเขียนลง Sink ปลายทางทีละชุด
+    ถ้า buffer เต็ม Record เก่าสุดจะถูกทิ้ง (นับไว้ใน dropped) แทนที่จะบล็อก hot path
+    """
+    def __init__(self, inner, capacity=10000, flush_interval=0.2):
+        self.inner = inner; self.flush_interval = flush_interval; self.dropped = 0
+        self._buffer = collections.deque(maxlen=capacity); self._wakeup = threading.Event(); self._closed = False
+        self._io_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._writer, name="logger-writer", daemon=True); self._thread.start()
+        atexit.register(self.flush) # writer เป็น daemon thread จึงต้อง flush ส่วนที่เหลือเองตอนปิดโปรแกรม
+
+    def emit(self, record):
+        if len(self._buffer) == self._buffer.maxlen: self.dropped += 1
+        self._buffer.append(record)
+
+    def emit_batch(self, records):
+        for record in records: self.emit(record)
+
+    def _drain(self):
+        with self._io_lock:
+            batch = []; popleft = self._buffer.popleft
+            try:
+                while True: batch.append(popleft())
+            except IndexError: pass
+            if batch: self.inner.emit_batch(batch); self.inner.flush()
+
+    def _writer(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval); self._wakeup.clear()
+            self._drain()
+
+    def flush(self): self._drain()
+    def close(self):
+        self._closed = True; self._wakeup.set(); self._thread.join(); self._drain(); self.inner.close()
+
+# (host, clock) ของงานที่กำลังรัน: แยกตาม thread/asyncio task จึงใช้ Logger ร่วมกันได้หลาย host ในโปรเซสเดียว
+_context = contextvars.ContextVar('logger_context', default=(None, None))
 
 class Logger:
     """
     คลาสสำหรับจัดการการแสดงผล Log ทั้งหมดให้สวยงามและเข้าใจง่าย
     ใช้ static methods เพื่อให้สามารถเรียกใช้ได้จากทุกที่โดยไม่ต้องสร้าง object
+    ระดับ Log ถูกตรวจก่อนสร้าง Record เสมอ ส่วนการจัดรูปแบบข้อความ (รวมถึง message % args) ทำใน Sink
     """
-    EMOJI_MAP = {
-        "AI_DECISION": "🧠",
-        "AI_ACTION": "⚡️",
-        "AI_REFLEX": "🩹",
-        "EMERGENCY_ACTION": "💀", # เพิ่ม Event สำหรับการกระทำขั้นรุนแรง
-        "SUCCESS": "✅",
-        "FAILURE": "❌",
-        "INFO": "ℹ️",
-        "USER": "🧑‍💻",
-        "SCENARIO": "🔥",
-        "LEARNING_CYCLE": "📚"
+    DEBUG, INFO, WARNING, ERROR, OFF = DEBUG, INFO, WARNING, ERROR, OFF
+    EMOJI_MAP = EMOJI_MAP
+    # ระดับของแต่ละ Event ของ AI
+    EVENT_LEVELS = {
+        "STRATEGY_APPLIED": INFO, "TACTICAL_BOOST": INFO, "REFLEX_TRIGGERED": WARNING, "EMERGENCY_ACTION": ERROR,
+        "ACTION_SUCCESS": DEBUG, "ACTION_FAIL": WARNING, "APP_CRASH": ERROR, "LEARNING_CYCLE": INFO
     }
 
+    clock = None # ถ้ากำหนด จะใช้เวลาจากนาฬิกานี้ (เช่น VirtualClock) แทนเวลาจริง
+    sink = ConsoleSink()
+    level = DEBUG
+    _muted_level = None # ระดับก่อนเปลี่ยนเป็น NullSink (คืนให้เมื่อเปลี่ยนกลับเป็น Sink จริงโดยไม่ระบุระดับ)
+
+    @staticmethod
+    def configure(sink=None, level=None):
+        """เปลี่ยน Sink และ/หรือระดับ Log; Sink เดิมจะถูก flush ก่อน (ไม่ปิด เพราะผู้เรียกอาจยังใช้อยู่)"""
+        if sink is not None: Logger.sink.flush(); Logger.sink = sink
+        if level is not None: Logger.level = level
+        if isinstance(Logger.sink, NullSink):
+            if Logger.level != OFF: Logger._muted_level = Logger.level
+            Logger.level = OFF
+        elif Logger._muted_level is not None:
+            if level is None: Logger.level = Logger._muted_level
+            Logger._muted_level = None
+
+    @staticmethod
+    @contextlib.contextmanager
+    def redirect(sink, level=None):
+        """ใช้ Sink/ระดับชั่วคราวภายใน with-block แล้วคืนค่าเดิม (เช่น ปิด Log ระหว่างรัน episode)"""
+        previous = (Logger.sink, Logger.level, Logger._muted_level)
+        Logger.configure(sink, level)
+        try: yield
+        finally: Logger.sink.flush(); Logger.sink, Logger.level, Logger._muted_level = previous
+
+    @staticmethod
+    def enabled(level):
+        return Logger.level <= level
+
+    @staticmethod
+    def event_enabled(event):
+        """ใช้ตรวจก่อนสร้าง details ที่มีการจัดรูปแบบข้อความบน hot path"""
+        return Logger.level <= Logger.EVENT_LEVELS.get(event.name, INFO)
+
+    @staticmethod
+    def flush():
+        Logger.sink.flush()
+
+    @staticmethod
+    def set_clock(clock):
+        Logger.clock = clock
+
+    @staticmethod
+    @contextlib.contextmanager
+    def bind(host=None, clock=None):
+        """ติดชื่อ host (และนาฬิกาของ host นั้น) ให้ทุก Record ที่สร้างภายใน with-block ของ thread/task ปัจจุบัน"""
+        token = _context.set((host, clock))
+        try: yield
+        finally: _context.reset(token)
+
+    @staticmethod
+    def _now():
+        clock = _context.get()[1] or Logger.clock
+        return clock.now() if clock is not None else time.time()
+
     @staticmethod
     def _get_timestamp():
-        return datetime.datetime.now().strftime("%H:%M:%S")
+        return datetime.datetime.fromtimestamp(Logger._now()).strftime("%H:%M:%S")
 
     @staticmethod
-    def info(message):
-        print(f"[{Logger._get_timestamp()}] {Logger.EMOJI_MAP['INFO']} {message}")
+    def info(message, *args):
+        if Logger.level > INFO: return
+        Logger.sink.emit((Logger._now(), INFO, "INFO", message, args, None, _context.get()[0]))
 
     @staticmethod
-    def user_action(message):
-        print(f"[{Logger._get_timestamp()}] {Logger.EMOJI_MAP['USER']} {message}")
-        
+    def user_action(message, *args):
+        if Logger.level > INFO: return
+        Logger.sink.emit((Logger._now(), INFO, "USER", message, args, None, _context.get()[0]))
+
     @staticmethod
-    def scenario(message):
-        print(f"[{Logger._get_timestamp()}] {Logger.EMOJI_MAP['SCENARIO']} {message}")
+    def scenario(message, *args):
+        if Logger.level > INFO: return
+        Logger.sink.emit((Logger._now(), INFO, "SCENARIO", message, args, None, _context.get()[0]))
 
     @staticmethod
-    def action(message):
-        print(f"  [{Logger._get_timestamp()}] {Logger.EMOJI_MAP['AI_ACTION']} {message}")
+    def action(message, *args):
+        if Logger.level > DEBUG: return
+        Logger.sink.emit((Logger._now(), DEBUG, "ACTION", message, args, None, _context.get()[0]))
 
     @staticmethod
     def log_ai_event(event, details):
         """
-        แปลง Event และ Details ของ AI ให้เป็นประโยคที่มนุษย์อ่านเข้าใจ
+        ส่ง Event และ Details ของ AI ไปยัง Sink (ConsoleSink แปลงเป็นประโยคที่มนุษย์อ่านเข้าใจ)
         """
-        timestamp = Logger._get_timestamp()
-        msg = ""
-
-        if event.name == "STRATEGY_APPLIED":
-            strategy = details.get('new_strategy', 'UNKNOWN').replace("_", " ")
-            reason = details.get('reason', 'no reason specified')
-            score = details.get('score', 0)
-            msg = f"{Logger.EMOJI_MAP['AI_DECISION']} Strategy set to {strategy} (Score: {score:.0f}). Reason: {reason}"
-        
-        elif event.name == "TACTICAL_BOOST":
-            reason = details.get('reason', 'High CPU load expected')
-            msg = f"{Logger.EMOJI_MAP['AI_DECISION']} Tactical Boost: Proactively managing resources. Reason: {reason}"
-
-        elif event.name == "REFLEX_TRIGGERED":
-            reason = details.get('reason', 'System critical')
-            msg = f"{Logger.EMOJI_MAP['AI_REFLEX']} Reflex Action Triggered! Reason: {reason}"
-        
-        elif event.name == "EMERGENCY_ACTION":
-            action = details.get('action', 'unspecified action')
-            reason = details.get('reason', 'no reason specified')
-            msg = f"{Logger.EMOJI_MAP['EMERGENCY_ACTION']} Escalation! {action}. Reason: {reason}"
-            
-        elif event.name == "ACTION_SUCCESS":
-            action = details.get('action', 'unspecified action')
-            msg = f"  {Logger.EMOJI_MAP['SUCCESS']} Action '{action}' executed successfully."
-            
-        elif event.name == "ACTION_FAIL":
-            action = details.get('action', 'unspecified action')
-            error = details.get('error', 'unknown error')
-            msg = f"  {Logger.EMOJI_MAP['FAILURE']} Action '{action}' failed! Error: {error}"
-
-        elif event.name == "APP_CRASH":
-            reason = details.get('reason', 'Unknown critical failure')
-            msg = f"{Logger.EMOJI_MAP['FAILURE']} CRITICAL ERROR: {reason}"
-        
-        elif event.name == "LEARNING_CYCLE":
-            adjustments = details.get('adjustments', 'No adjustments made.')
-            msg = f"{Logger.EMOJI_MAP['LEARNING_CYCLE']} Learning cycle: Analyzing performance... Adjustments: {adjustments}"
-
-        else:
-            msg = f"{event.name}: {details}"
-
-        print(f"[{timestamp}] {msg}")
\ No newline at end of file
+        level = Logger.EVENT_LEVELS.get(event.name, INFO)
+        if Logger.level > level: return
+        Logger.sink.emit((Logger._now(), level, event.name, None, (), details, _context.get()[0]))
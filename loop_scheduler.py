@@ -0,0 +1,115 @@
+# filename: loop_scheduler.py
+import argparse, asyncio, heapq, itertools, time
+from clock import RealClock
+
+# คาบ (วินาที) และอายุ snapshot สูงสุดที่ยอมรับได้ของแต่ละลูปของ Agent
+DEFAULT_PERIODS = {'reflex': 0.05, 'tactical': 0.5, 'strategic': 2.0, 'learning': 30.0}
+DEFAULT_FRESHNESS = {'reflex': 0.0, 'tactical': 0.5, 'strategic': 1.0, 'learning': None}
+
+class LoopTask:
+    __slots__ = ('name', 'period', 'fn', 'runs', 'busy_seconds', 'max_lateness')
+    def __init__(self, name, period, fn):
+        if period <= 0: raise ValueError(f"Loop '{name}' needs a positive period")
+        self.name = name; self.period = period; self.fn = fn; self.runs = 0; self.busy_seconds = 0.0; self.max_lateness = 0.0
+
+class MultiRateScheduler:
+    """
+    ตัวจัดตารางหลายอัตราที่ขับด้วยนาฬิกา: แต่ละลูปมีคาบของตัวเองและอยู่ใน heap ตามเวลาครบกำหนด
+    run_until()/run_for() ใช้กับ VirtualClock (กระโดดเวลาไปยังงานถัดไปทันที) ส่วน run_async() ใช้กับเวลาจริงบน asyncio
+    ลูปที่ครบกำหนดพร้อมกันจะรันตามลำดับที่ add() (จึงควรเพิ่มลูปของ env ก่อนลูปของ Agent)
+    """
+    def __init__(self, clock=None):
+        self.clock = clock or RealClock(); self.tasks = {}
+        self._heap = []; self._seq = itertools.count(); self._started = self.clock.now()
+
+    def add(self, name, period, fn, offset=0.0):
+        task = self.tasks[name] = LoopTask(name, period, fn)
+        heapq.heappush(self._heap, (self.clock.now() + offset, next(self._seq), task)); return task
+
+    def next_due(self): return self._heap[0][0] if self._heap else None
+
+    def _run_next(self, now):
+        due, _, task = heapq.heappop(self._heap)
+        task.max_lateness = max(task.max_lateness, now - due)
+        start = time.perf_counter(); task.fn(); task.busy_seconds += time.perf_counter() - start; task.runs += 1
+        # ถ้าตามไม่ทัน ข้ามรอบที่เลยไปแล้วแทนการรันติดกันหลายรอบ
+        next_due = due + task.period
+        if next_due < now: next_due = now + task.period - (now - due) % task.period
+        heapq.heappush(self._heap, (next_due, next(self._seq), task))
+
+    def run_until(self, deadline):
+        """รันทุกงานที่ครบกำหนดก่อน deadline โดยเลื่อน VirtualClock ไปยังเวลาของแต่ละงาน"""
+        clock = self.clock
+        while self._heap and self._heap[0][0] <= deadline:
+            due = self._heap[0][0]
+            if due > clock.now(): clock.advance(due - clock.now())
+            self._run_next(clock.now())
+        if deadline > clock.now(): clock.advance(deadline - clock.now())
+
+    def run_for(self, seconds): self.run_until(self.clock.now() + seconds)
+
+    async def run_async(self, until=None):
+        """รันตามเวลาจริงบน asyncio จนถึงเวลา until (ค่าจาก clock.now()) หรือจนกว่าจะถูก cancel"""
+        clock = self.clock
+        while self._heap:
+            due = self._heap[0][0]
+            if until is not None and due > until: break
+            delay = due - clock.now()
+            if delay > 0: await asyncio.sleep(delay); continue
+            self._run_next(clock.now())
+            await asyncio.sleep(0) # เปิดโอกาสให้ task อื่นบน event loop
+
+    def stats(self):
+        """จำนวนรอบ, เวลา CPU ที่ใช้ (มิลลิวินาทีต่อวินาทีของนาฬิกา) และความล่าช้าสูงสุดของแต่ละลูป"""
+        elapsed = max(self.clock.now() - self._started, 1e-9)
+        return {name: {'period': t.period, 'runs': t.runs, 'cpu_ms_per_second': 1e3 * t.busy_seconds / elapsed, 'max_lateness': t.max_lateness}
+                for name, t in self.tasks.items()}
+
+def add_agent_loops(scheduler, ai, periods=None, freshness=None, offset=0.0):
+    """ลงทะเบียนลูป reflex / tactical / strategic / learning ของ Agent ด้วยคาบและนโยบายความสดของ snapshot ของแต่ละลูป"""
+    periods = {**DEFAULT_PERIODS, **(periods or {})}; freshness = {**DEFAULT_FRESHNESS, **(freshness or {})}
+    for phase in ('reflex', 'tactical', 'strategic', 'learning'):
+        scheduler.add(phase, periods[phase], lambda phase=phase, max_age=freshness[phase]: ai.run_phase(phase, max_age), offset=offset)
+    return scheduler
+
+class _RecordingSubprocess:
+    """ตัวห่อ subprocess ที่จดเวลาที่ Agent สั่งแต่ละ Action (ใช้วัดเวลาตอบสนอง)"""
+    def __init__(self, inner, clock): self.inner = inner; self.clock = clock; self.calls = []
+    def run(self, action_name, params): self.calls.append((self.clock.now(), action_name)); return self.inner.run(action_name, params)
+
+if __name__ == "__main__":
+    from clock import VirtualClock
+    from simulation_env import SimulationEnvironment
+    from isolated_agent import PanyarinNeuralAI
+    from logger import Logger, NullSink
+    from scenario import ScenarioScheduler
+    parser = argparse.ArgumentParser(description="Compare single-rate main loops with the multi-rate scheduler on a scenario (virtual time)")
+    parser.add_argument("--scenario", default="thrashing")
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--phase", type=float, default=0.37, help="offset of the agent loops relative to environment ticks (s)")
+    for phase, period in DEFAULT_PERIODS.items(): parser.add_argument(f"--{phase}-period", type=float, default=period)
+    args = parser.parse_args()
+    periods = {phase: getattr(args, f"{phase}_period") for phase in DEFAULT_PERIODS}
+
+    def run(label, single_period=None):
+        clock = VirtualClock(); crossings = []
+        with Logger.redirect(NullSink()):
+            env = SimulationEnvironment(clock=clock, seed=args.seed); subprocess = _RecordingSubprocess(env.subprocess_mock, clock)
+            ai = PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=subprocess, clock=clock)
+            scenario = ScenarioScheduler(); scenario.schedule(args.scenario, start_tick=1); ticks = itertools.count(1)
+            scheduler = MultiRateScheduler(clock)
+            def environment():
+                was_over = env.state['mem_percent'] > 90; scenario.run_due(env, next(ticks)); env.update_system_load()
+                if env.state['mem_percent'] > 90 and not was_over: crossings.append(clock.now())
+            scheduler.add('environment', 1.0, environment)
+            if single_period is None: add_agent_loops(scheduler, ai, periods, offset=args.phase)
+            else: scheduler.add('main_loop_step', single_period, ai.main_loop_step, offset=args.phase)
+            scheduler.run_for(args.seconds)
+        # เวลาตอบสนอง: จาก mem ข้าม 90% ถึง Action ฉุกเฉินครั้งแรกหลังจากนั้น
+        reflex_times = [t for t, action in subprocess.calls if action in ('drop_caches', 'kill_most_mem_proc')]
+        delays = [next((t - c for t in reflex_times if t >= c), None) for c in crossings]; delays = [d for d in delays if d is not None]
+        stats = scheduler.stats(); stats.pop('environment'); agent_cpu = sum(s['cpu_ms_per_second'] for s in stats.values())
+        print(f"{label:<22} agent CPU {agent_cpu:7.3f} ms/s   memory reflex latency {sum(delays) / len(delays) if delays else float('nan'):.3f}s ({len(delays)} crossings)")
+        for name, s in stats.items(): print(f"    {name:<15} period {s['period']:>6.2f}s runs {s['runs']:>6} cpu {s['cpu_ms_per_second']:.3f} ms/s")
+    run("single-rate @1s", 1.0); run(f"single-rate @{periods['reflex']:g}s", periods['reflex']); run("multi-rate")
@@ -1,7 +1,11 @@
 # filename: main_simulator.py
-import time
+import argparse
+from clock import make_clock
+from metrics import AgentMetrics
 from simulation_env import SimulationEnvironment
 from isolated_agent import PanyarinNeuralAI, Strategy # Import the modified AI
+from scenario import ScenarioScheduler
+from policy import load_policy
 
 def print_dashboard(env, ai):
     """แสดงผลสถานะของระบบและ AI"""
@@ -10,45 +14,55 @@ def print_dashboard(env, ai):
     print(f"🤖 AI STATUS    | Strategy: {ai.current_strategy.name}")
     print("-" * 50)
 
-def main():
+def main(ticks=999, tick_seconds=0.7, clock=None, metrics=None, scenario="demo", trace=None, policy=None):
     print("🚀 Initializing Panyarin AI Digital Sandbox...")
     
-    # 1. สร้างห้องทดลองและ AI
-    env = SimulationEnvironment()
+    # 1. สร้างห้องทดลองและ AI (ใช้นาฬิกาเดียวกัน; VirtualClock = ไม่ต้องรอเวลาจริง)
+    clock = clock or make_clock()
+    env = SimulationEnvironment(clock=clock)
     ai = PanyarinNeuralAI(
         psutil_mock=env.psutil_mock,
-        subprocess_mock=env.subprocess_mock
+        subprocess_mock=env.subprocess_mock,
+        clock=clock, metrics=metrics, policy=policy
     )
+    scheduler = ScenarioScheduler(); scheduler.schedule(scenario) # ไทม์ไลน์เหตุการณ์จากไฟล์ scenarios/<name>.json
+    recorder = None
+    if trace is not None:
+        from tick_trace import TraceRecorder
+        recorder = TraceRecorder(trace) # บันทึกทุก tick ลงไฟล์คอลัมน์ (อ่านด้วย tick_trace.TraceReader)
 
     print("✅ Simulation Ready. Starting main loop...\n")
-    time.sleep(2)
+    clock.sleep(2)
 
     # 2. เริ่ม vòng lặp การจำลอง
-    for tick in range(1, 1000): 
+    for tick in range(1, ticks + 1): 
         print(f"\n--- Tick {tick} ---")
 
         # 3. กำหนดสถานการณ์ (Scenario Injection)
-        if tick == 5:
-            env.add_app('firefox')
-        if tick == 10:
-            env.add_app('steam') # <--- AI ควรจะเปลี่ยนเป็นโหมด GAMING
-        if tick == 20:
-            env.remove_app('steam') # <--- AI ควรจะกลับสู่โหมดปกติ
-            env.add_app('blender')  # <--- AI ควรจะเปลี่ยนเป็นโหมด WORKSTATION
-        if tick == 28:
-            env.remove_app('blender')
-            env.remove_app('firefox')
+        scheduler.run_due(env, tick)
 
         # 4. ให้สภาพแวดล้อมและ AI ทำงาน 1 รอบ
         env.update_system_load()
         ai.main_loop_step()
+        if recorder is not None: recorder.record(env.state, ai)
         
         # 5. แสดงผลลัพธ์
         print_dashboard(env, ai)
         
-        time.sleep(0.7) # หน่วงเวลาเพื่อให้เราอ่านทัน
+        clock.sleep(tick_seconds) # หน่วงเวลาเพื่อให้เราอ่านทัน (VirtualClock แค่เลื่อนเวลาไปข้างหน้า)
 
+    if recorder is not None: recorder.close()
     print("\n✅ Simulation Complete.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Panyarin AI Digital Sandbox (headless)")
+    parser.add_argument("--ticks", type=int, default=999)
+    parser.add_argument("--scenario", default="demo", help="bundled scenario name or path to a scenario file")
+    parser.add_argument("--virtual", action="store_true", help="use a tick-driven virtual clock instead of wall-clock sleeps")
+    parser.add_argument("--metrics-port", type=int, default=None, help="collect agent metrics and serve them in Prometheus format on this port")
+    parser.add_argument("--policy", default=None, help="agent policy file (default: $PANYARIN_POLICY or built-in thresholds)")
+    parser.add_argument("--trace", default=None, help="record every tick into this trace directory")
+    args = parser.parse_args()
+    metrics = None
+    if args.metrics_port is not None: metrics = AgentMetrics(); metrics.serve(args.metrics_port)
+    main(ticks=args.ticks, clock=make_clock(virtual=args.virtual), metrics=metrics, scenario=args.scenario, trace=args.trace, policy=load_policy(args.policy))
\ No newline at end of file
@@ -0,0 +1,98 @@
+# filename: metrics.py
+import bisect, threading
+
+# ขอบบนของ bucket (วินาที) สำหรับ latency ของแต่ละเฟส
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 0.1, 1.0)
+PHASES = ('snapshot', 'strategic', 'tactical', 'reflex', 'learning', 'tick')
+
+class LatencyHistogram:
+    """Histogram แบบ bucket คงที่ (รูปแบบเดียวกับ Prometheus) บันทึกได้ O(log buckets) ไม่จัดสรรหน่วยความจำเพิ่ม"""
+    __slots__ = ('counts', 'count', 'total')
+    def __init__(self): self.counts = [0] * (len(LATENCY_BUCKETS) + 1); self.count = 0; self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1; self.count += 1; self.total += seconds
+
+    def quantile(self, q):
+        """ประมาณค่า quantile จาก bucket (คืนขอบบนของ bucket ที่ครอบคลุม q)"""
+        if not self.count: return 0.0
+        target = q * self.count; running = 0
+        for i, c in enumerate(self.counts):
+            running += c
+            if running >= target: return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float('inf')
+        return float('inf')
+
+class AgentMetrics:
+    """
+    ตัววัดของ PanyarinNeuralAI: latency ต่อเฟสของ main_loop_step, จำนวน Event แต่ละชนิด, ผลของ Action
+    และเวลาที่ระบบอยู่ภายใต้แรงกดดันของหน่วยความจำ/I-O; ปิดได้โดยไม่ส่ง metrics ให้ Agent (ค่าใช้จ่าย = เช็ค None หนึ่งครั้ง)
+    """
+    def __init__(self, mem_threshold=90.0, io_threshold=20.0):
+        self.mem_threshold = mem_threshold; self.io_threshold = io_threshold
+        self.latency = {phase: LatencyHistogram() for phase in PHASES}
+        self.events = {}; self.actions = {} # {event_name: n}, {(action, outcome): n}
+        self.ticks = 0; self.mem_pressure_ticks = 0; self.io_pressure_ticks = 0
+        self.mem_pressure_seconds = 0.0; self.io_pressure_seconds = 0.0
+        self._last_timestamp = None; self._last_mem_pressure = False; self._last_io_pressure = False
+
+    def observe_phase(self, phase, seconds): self.latency[phase].observe(seconds)
+    def count_event(self, event): self.events[event.name] = self.events.get(event.name, 0) + 1
+    def count_action(self, action_name, outcome):
+        key = (action_name, outcome); self.actions[key] = self.actions.get(key, 0) + 1
+
+    def observe_snapshot(self, snapshot):
+        """นับ tick และเวลาที่อยู่ภายใต้แรงกดดัน (ช่วงเวลาระหว่าง tick นับตามสถานะของ tick ก่อนหน้า)"""
+        now = snapshot['timestamp']; mem_pressure = snapshot['mem_percent'] > self.mem_threshold; io_pressure = snapshot['io_wait'] > self.io_threshold
+        if self._last_timestamp is not None:
+            elapsed = now - self._last_timestamp
+            if self._last_mem_pressure: self.mem_pressure_seconds += elapsed
+            if self._last_io_pressure: self.io_pressure_seconds += elapsed
+        self.ticks += 1; self.mem_pressure_ticks += mem_pressure; self.io_pressure_ticks += io_pressure
+        self._last_timestamp = now; self._last_mem_pressure = mem_pressure; self._last_io_pressure = io_pressure
+
+    def as_dict(self):
+        """สรุปค่าทั้งหมดเพื่อใช้ภายในโปรเซส"""
+        return {
+            'ticks': self.ticks,
+            'latency': {phase: {'count': h.count, 'sum': h.total, 'p50': h.quantile(0.5), 'p99': h.quantile(0.99)} for phase, h in self.latency.items()},
+            'events': dict(self.events), 'actions': {f"{a}:{o}": n for (a, o), n in dict(self.actions).items()},
+            'mem_pressure_ticks': self.mem_pressure_ticks, 'io_pressure_ticks': self.io_pressure_ticks,
+            'mem_pressure_seconds': self.mem_pressure_seconds, 'io_pressure_seconds': self.io_pressure_seconds,
+        }
+
+    def render_prometheus(self):
+        """ข้อความรูปแบบ Prometheus exposition (text/plain; version=0.0.4); อ่านได้จาก thread อื่นระหว่างที่ Agent ทำงาน"""
+        events = dict(self.events); actions = dict(self.actions) # คัดลอกก่อน เผื่อ Agent เพิ่ม key ระหว่าง export
+        lines = ["# HELP panyarin_phase_latency_seconds Latency of each main_loop_step phase.", "# TYPE panyarin_phase_latency_seconds histogram"]
+        for phase, h in self.latency.items():
+            running = 0
+            for bound, c in zip(LATENCY_BUCKETS, h.counts):
+                running += c; lines.append(f'panyarin_phase_latency_seconds_bucket{{phase="{phase}",le="{bound}"}} {running}')
+            lines.append(f'panyarin_phase_latency_seconds_bucket{{phase="{phase}",le="+Inf"}} {h.count}')
+            lines.append(f'panyarin_phase_latency_seconds_sum{{phase="{phase}"}} {h.total}')
+            lines.append(f'panyarin_phase_latency_seconds_count{{phase="{phase}"}} {h.count}')
+        lines += ["# HELP panyarin_events_total AI events emitted, by type.", "# TYPE panyarin_events_total counter"]
+        lines += [f'panyarin_events_total{{event="{name}"}} {n}' for name, n in sorted(events.items())]
+        lines += ["# HELP panyarin_actions_total Action attempts, by action and outcome.", "# TYPE panyarin_actions_total counter"]
+        lines += [f'panyarin_actions_total{{action="{a}",outcome="{o}"}} {n}' for (a, o), n in sorted(actions.items())]
+        lines += ["# HELP panyarin_ticks_total Agent ticks.", "# TYPE panyarin_ticks_total counter", f"panyarin_ticks_total {self.ticks}",
+                  "# HELP panyarin_pressure_ticks_total Ticks spent above the memory / I/O pressure threshold.", "# TYPE panyarin_pressure_ticks_total counter",
+                  f'panyarin_pressure_ticks_total{{resource="memory"}} {self.mem_pressure_ticks}', f'panyarin_pressure_ticks_total{{resource="io"}} {self.io_pressure_ticks}',
+                  "# HELP panyarin_pressure_seconds_total Clock time spent above the memory / I/O pressure threshold.", "# TYPE panyarin_pressure_seconds_total counter",
+                  f'panyarin_pressure_seconds_total{{resource="memory"}} {self.mem_pressure_seconds}', f'panyarin_pressure_seconds_total{{resource="io"}} {self.io_pressure_seconds}']
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """เปิด HTTP endpoint /metrics บน thread เบื้องหลัง แล้วคืนค่า server (เรียก shutdown() เพื่อปิด)"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # นำเข้าเมื่อเปิด endpoint จริงเท่านั้น (ลดเวลาเริ่มโปรแกรม ~50ms)
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"): self.send_error(404); return
+                body = metrics.render_prometheus().encode()
+                self.send_response(200); self.send_header("Content-Type", "text/plain; version=0.0.4"); self.send_header("Content-Length", str(len(body))); self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, format, *args): pass
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
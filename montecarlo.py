@@ -0,0 +1,69 @@
+# filename: montecarlo.py
+import argparse, json, os, random
+from concurrent.futures import ProcessPoolExecutor
+from clock import VirtualClock
+from simulation_env import SimulationEnvironment
+from isolated_agent import PanyarinNeuralAI, Strategy
+from logger import Logger, NullSink
+from policy import AgentPolicy
+from scenario import ScenarioScheduler, list_scenarios
+
+def run_episode(scenario, seed, ticks=60, tick_seconds=1.0, policy=None):
+    """รันหนึ่ง episode ด้วย random.Random(seed) และ VirtualClock ของตัวเอง แล้วคืนค่า metrics ของ episode นั้น
+    scenario เป็นชื่อ/พาธของไฟล์ Scenario หรืออ็อบเจกต์ Scenario ที่โหลดแล้ว; policy = AgentPolicy (None = นโยบายที่ Agent โหลดเอง)"""
+    clock = VirtualClock(); scheduler = ScenarioScheduler()
+    with Logger.redirect(NullSink()):
+        env = SimulationEnvironment(clock=clock, rng=random.Random(seed))
+        ai = PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=env.subprocess_mock, clock=clock, policy=policy)
+        scheduler.schedule(scenario); strategy_seconds = {s.name: 0.0 for s in Strategy}; ticks_mem_over_90 = ticks_io_over_20 = 0
+        for tick in range(1, ticks + 1):
+            scheduler.run_due(env, tick)
+            env.update_system_load(); ai.main_loop_step()
+            strategy_seconds[ai.current_strategy.name] += tick_seconds
+            if env.state['mem_percent'] > 90: ticks_mem_over_90 += 1
+            if env.state['io_wait'] > 20: ticks_io_over_20 += 1
+            clock.sleep(tick_seconds)
+    counters = env.subprocess_mock.counters
+    return {'seed': seed, 'ticks': ticks, 'strategy_seconds': strategy_seconds, 'ticks_mem_over_90': ticks_mem_over_90, 'ticks_io_over_20': ticks_io_over_20,
+            'final_strategy': ai.current_strategy.name, 'action_attempts': counters['attempts'], 'action_failures': counters['failures'], 'kills': counters['kills']}
+
+def _run_episode_args(args): return run_episode(*args)
+
+def merge_results(results):
+    """รวม metrics ราย episode เป็นรายงานเดียว"""
+    report = {'episodes': len(results), 'ticks': 0, 'strategy_seconds': {s.name: 0.0 for s in Strategy},
+              'action_attempts': 0, 'action_failures': 0, 'ticks_mem_over_90': 0, 'ticks_io_over_20': 0, 'kills': 0}
+    for r in results:
+        for key in ('ticks', 'action_attempts', 'action_failures', 'ticks_mem_over_90', 'ticks_io_over_20', 'kills'): report[key] += r[key]
+        for name, seconds in r['strategy_seconds'].items(): report['strategy_seconds'][name] += seconds
+    total_seconds = sum(report['strategy_seconds'].values()) or 1.0
+    report['strategy_share'] = {name: seconds / total_seconds for name, seconds in report['strategy_seconds'].items()}
+    report['action_failure_rate'] = report['action_failures'] / report['action_attempts'] if report['action_attempts'] else 0.0
+    episodes = report['episodes'] or 1
+    report['mean_ticks_mem_over_90'] = report['ticks_mem_over_90'] / episodes; report['mean_kills'] = report['kills'] / episodes
+    return report
+
+def run_monte_carlo(scenario, seeds, ticks=60, tick_seconds=1.0, workers=None, policy=None):
+    """
+    กระจาย episode ของ scenario หนึ่งไปยัง process pool (หนึ่ง seed ต่อ episode) แล้วรวมผล
+    seeds เป็นจำนวนเต็ม (ใช้ seed 0..n-1) หรือรายการ seed ก็ได้; ผลลัพธ์ไม่ขึ้นกับจำนวน worker
+    """
+    seeds = list(range(seeds)) if isinstance(seeds, int) else list(seeds)
+    workers = workers or os.cpu_count() or 1
+    jobs = [(scenario, seed, ticks, tick_seconds, policy) for seed in seeds]
+    if workers == 1: return merge_results([_run_episode_args(job) for job in jobs])
+    chunksize = max(1, len(jobs) // (workers * 4)) # ก้อนใหญ่พอให้ค่า IPC ไม่กินเวลา แต่ยังกระจายงานได้สม่ำเสมอ
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_results(list(pool.map(_run_episode_args, jobs, chunksize=chunksize)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo scenario runner for the Panyarin AI sandbox")
+    parser.add_argument("--scenario", default="thrashing", help=f"bundled scenario ({', '.join(list_scenarios())}) or a scenario file")
+    parser.add_argument("--seeds", type=int, default=100, help="number of episodes (seeds 0..N-1)")
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--tick-seconds", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--policy", default=None, help="agent policy file (e.g. written by policy_tuner.py)")
+    args = parser.parse_args()
+    policy = AgentPolicy.load(args.policy) if args.policy else None
+    print(json.dumps(run_monte_carlo(args.scenario, args.seeds, args.ticks, args.tick_seconds, args.workers, policy), indent=2))
@@ -0,0 +1,56 @@
+# filename: policy.py
+import json, os
+
+# ค่าตั้งต้นของเกณฑ์การตัดสินใจ (ตรงกับค่าที่เคยเขียนตายตัวไว้ใน PanyarinNeuralAI)
+DEFAULTS = {
+    # strategic_assessment
+    'cpu_very_busy': 75.0, 'cpu_busy': 50.0, 'cpu_idle': 20.0, 'idle_max_apps': 5,
+    'io_high': 20.0, 'io_gaming_damper': 0.5, 'io_workstation_damper': 0.7,
+    # tactical_maneuver / reflexive_response
+    'tactical_cpu': 70.0, 'reflex_mem': 90.0, 'drop_caches_retry_window': 30.0, 'drop_caches_duration': 15.0,
+    # learning_cycle
+    'learning_poor_cpu': 80.0, 'learning_poor_io': 30.0, 'learning_poor_failures': 1,
+    'learning_penalty': 0.95, 'learning_reward': 1.05, 'weight_cap': 1.2,
+    # การพยากรณ์แรงกดดัน (forecast.py): reflex (mem) / strategic (io) ใช้ค่าคาดการณ์ล่วงหน้า forecast_horizon วินาทีร่วมกับค่าปัจจุบัน
+    'forecast_mem': False, 'forecast_io': False, 'forecast_alpha': 0.5, 'forecast_beta': 0.3, 'forecast_horizon': 3.0,
+}
+POLICY_ENV = 'PANYARIN_POLICY' # พาธไฟล์นโยบายที่ Agent โหลดตอนเริ่ม (ถ้าไม่กำหนด = ค่าตั้งต้น)
+
+class AgentPolicy:
+    """
+    ชุดพารามิเตอร์การตัดสินใจของ Agent (เกณฑ์ cpu/io/mem, ตัวหน่วงคะแนน, ขนาดการปรับน้ำหนักใน learning_cycle)
+    อ่านอย่างเดียวระหว่างรัน จึงใช้อ็อบเจกต์เดียวร่วมกันได้ทุก Agent; ไฟล์ JSON เขียนโดย policy_tuner.py
+    """
+    __slots__ = tuple(DEFAULTS)
+
+    def __init__(self, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown: raise ValueError(f"Unknown policy parameter(s): {sorted(unknown)}")
+        for name, default in DEFAULTS.items(): setattr(self, name, type(default)(params.get(name, default)))
+
+    def replace(self, **changes): return AgentPolicy(**{**self.to_dict(), **changes})
+    def to_dict(self): return {name: getattr(self, name) for name in DEFAULTS}
+    def __eq__(self, other): return isinstance(other, AgentPolicy) and self.to_dict() == other.to_dict()
+    def __repr__(self):
+        changed = {k: v for k, v in self.to_dict().items() if v != DEFAULTS[k]}
+        return f"AgentPolicy({', '.join(f'{k}={v!r}' for k, v in changed.items())})"
+
+    @classmethod
+    def load(cls, path):
+        """ไฟล์ {'params': {...}, ...} (รูปแบบของ save/policy_tuner) หรือ dict ของพารามิเตอร์ตรง ๆ ก็ได้"""
+        with open(path, encoding="utf-8") as f: data = json.load(f)
+        return cls(**data.get('params', data))
+
+    def save(self, path, **extra):
+        with open(path, "w", encoding="utf-8") as f: json.dump({'version': 1, 'params': self.to_dict(), **extra}, f, indent=2)
+
+DEFAULT_POLICY = AgentPolicy()
+_loaded = {}
+
+def load_policy(path=None):
+    """นโยบายจาก path หรือจากไฟล์ใน $PANYARIN_POLICY (แคชตามพาธ เพราะ fleet สร้าง Agent หลายพันตัว) หรือ DEFAULT_POLICY"""
+    path = path or os.environ.get(POLICY_ENV)
+    if not path: return DEFAULT_POLICY
+    policy = _loaded.get(path)
+    if policy is None: policy = _loaded[path] = AgentPolicy.load(path)
+    return policy
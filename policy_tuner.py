@@ -0,0 +1,135 @@
+# filename: policy_tuner.py
+import argparse, itertools, json, os, random, time
+from concurrent.futures import ProcessPoolExecutor
+from policy import AgentPolicy, DEFAULTS
+from montecarlo import run_episode, merge_results
+
+# ช่วงค่าที่สุ่ม (random / halving) ของแต่ละพารามิเตอร์; พารามิเตอร์ที่ไม่อยู่ในนี้คงค่าตั้งต้นไว้
+SEARCH_SPACE = {
+    'cpu_very_busy': (60.0, 90.0), 'cpu_busy': (35.0, 65.0), 'cpu_idle': (10.0, 30.0),
+    'io_high': (10.0, 35.0), 'io_gaming_damper': (0.2, 1.0), 'io_workstation_damper': (0.3, 1.0),
+    'tactical_cpu': (55.0, 90.0), 'reflex_mem': (80.0, 92.0), 'drop_caches_retry_window': (5.0, 60.0),
+    'learning_penalty': (0.8, 1.0), 'learning_reward': (1.0, 1.15),
+}
+# ตาราง grid ตั้งต้น (เปลี่ยนได้ด้วย --grid name=v1,v2,...)
+DEFAULT_GRID = {'reflex_mem': (82.0, 86.0, 90.0), 'drop_caches_retry_window': (10.0, 30.0, 60.0), 'tactical_cpu': (60.0, 70.0, 80.0)}
+DEFAULT_SCENARIOS = ('thrashing', 'stress', 'demo', 'workstation')
+# น้ำหนักของคะแนน (ยิ่งต่ำยิ่งดี): tick ที่ mem > 90%, Action ที่ล้มเหลว, โปรเซสที่ถูกฆ่า — ต่อ episode
+DEFAULT_WEIGHTS = {'pressure': 1.0, 'failures': 1.0, 'kills': 5.0}
+
+def score(report, weights=None):
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}; episodes = report['episodes'] or 1
+    return (w['pressure'] * report['ticks_mem_over_90'] + w['failures'] * report['action_failures'] + w['kills'] * report['kills']) / episodes
+
+def _run_job(job):
+    params, scenario, seed, ticks = job
+    return run_episode(scenario, seed, ticks, policy=AgentPolicy(**params))
+
+def parse_value(name, text):
+    """ค่าพารามิเตอร์จากข้อความบน command line (bool("false") เป็น True จึงแปลง bool แยก)"""
+    default = DEFAULTS[name]
+    if isinstance(default, bool):
+        value = text.strip().lower()
+        if value not in ("1", "true", "yes", "0", "false", "no"): raise ValueError(f"{name}: expected a boolean, got {text!r}")
+        return value in ("1", "true", "yes")
+    return type(default)(text)
+
+def grid_candidates(grid=None):
+    grid = grid or DEFAULT_GRID; names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+def random_candidates(n, rng, space=None):
+    space = space or SEARCH_SPACE
+    return [{name: (rng.randint(int(lo), int(hi)) if isinstance(DEFAULTS[name], int) else rng.uniform(lo, hi)) for name, (lo, hi) in space.items()} for _ in range(n)]
+
+class PolicyTuner:
+    """
+    ประเมินชุดพารามิเตอร์ของ AgentPolicy ด้วย episode จำลองจำนวนมากบน process pool (ทุกคอร์)
+    ทุก candidate ใช้ seed ชุดเดียวกันของแต่ละ Scenario (common random numbers) จึงเทียบกันได้ด้วย episode ไม่มาก
+    candidate แรกเสมอคือนโยบายตั้งต้น เพื่อให้รายงานว่าดีขึ้นกว่าเดิมเท่าใด
+    """
+    def __init__(self, scenarios=DEFAULT_SCENARIOS, ticks=200, workers=None, weights=None):
+        self.scenarios = list(scenarios); self.ticks = ticks; self.weights = weights
+        self.workers = workers or os.cpu_count() or 1; self.episodes_run = 0
+        self._pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def close(self):
+        if self._pool is not None: self._pool.shutdown()
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    def _map(self, jobs):
+        self.episodes_run += len(jobs)
+        if self._pool is None: return [_run_job(job) for job in jobs]
+        return list(self._pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (self.workers * 4))))
+
+    def evaluate(self, candidates, seeds, results=None):
+        """รัน candidate ทุกตัวบน seed ที่ให้มาในทุก Scenario; results (ถ้ามี) คือผลราย episode เดิมของแต่ละตัวที่จะต่อเพิ่ม"""
+        results = results if results is not None else [[] for _ in candidates]
+        jobs = [(params, scenario, seed, self.ticks) for params in candidates for scenario in self.scenarios for seed in seeds]
+        per_candidate = len(self.scenarios) * len(seeds); flat = self._map(jobs)
+        for i in range(len(candidates)): results[i].extend(flat[i * per_candidate:(i + 1) * per_candidate])
+        return results
+
+    def _ranked(self, candidates, results):
+        reports = [merge_results(r) for r in results]
+        return sorted(((score(rep, self.weights), i, rep) for i, rep in enumerate(reports)), key=lambda t: (t[0], t[1]))
+
+    def search(self, candidates, seeds):
+        """grid/random: ทุก candidate ได้ seeds episode ต่อ Scenario เท่ากัน"""
+        candidates = [{}] + list(candidates)
+        return candidates, self._ranked(candidates, self.evaluate(candidates, range(seeds)))
+
+    def successive_halving(self, candidates, min_seeds=2, max_seeds=32, eta=3):
+        """เริ่มทุก candidate ด้วย min_seeds แล้วเก็บเฉพาะ 1/eta ที่ดีที่สุดไปรอบถัดไปพร้อมเพิ่ม seed เป็น eta เท่า (ใช้ผลเดิมต่อ)"""
+        candidates = [{}] + list(candidates); results = [[] for _ in candidates]
+        alive = list(range(len(candidates))); done = 0; seeds = min_seeds
+        while True:
+            subset = self.evaluate([candidates[i] for i in alive], range(done, seeds), [results[i] for i in alive])
+            for i, r in zip(alive, subset): results[i] = r
+            done = seeds
+            ranked = self._ranked([candidates[i] for i in alive], [results[i] for i in alive])
+            ranked = [(s, alive[i], rep) for s, i, rep in ranked]
+            if len(alive) <= 1 or seeds >= max_seeds: return candidates, ranked
+            keep = max(1, len(alive) // eta); alive = sorted(i for _, i, _ in ranked[:keep])
+            if 0 not in alive: alive.insert(0, 0) # นโยบายตั้งต้นอยู่ถึงรอบสุดท้ายเสมอ (ใช้เป็นเส้นฐาน)
+            seeds = min(max_seeds, seeds * eta)
+
+def _summary(report): return {k: report[k] for k in ('episodes', 'ticks_mem_over_90', 'action_failures', 'kills', 'action_failure_rate')}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the agent's decision thresholds offline over simulated episodes")
+    parser.add_argument("--method", choices=("grid", "random", "halving"), default="halving")
+    parser.add_argument("--candidates", type=int, default=81, help="random/halving: number of sampled parameter sets")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...", help="grid axis (replaces the default grid)")
+    parser.add_argument("--scenario", action="append", help=f"scenarios to score on (default: {', '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument("--seeds", type=int, default=8, help="grid/random: seeds per scenario; halving: maximum seeds")
+    parser.add_argument("--min-seeds", type=int, default=2, help="halving: seeds per scenario in the first rung")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--validate-seeds", type=int, default=16, help="held-out seeds to compare the winner against the default policy")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="agent_policy.json", help="where to write the best policy (load with --policy or $PANYARIN_POLICY)")
+    args = parser.parse_args()
+    rng = random.Random(args.seed); start = time.perf_counter()
+    with PolicyTuner(args.scenario or DEFAULT_SCENARIOS, args.ticks, args.workers) as tuner:
+        if args.method == "grid":
+            grid = {name: tuple(parse_value(name, v) for v in values.split(",")) for name, values in (g.split("=", 1) for g in args.grid)}
+            candidates, ranked = tuner.search(grid_candidates(grid or None), args.seeds)
+        elif args.method == "random": candidates, ranked = tuner.search(random_candidates(args.candidates, rng), args.seeds)
+        else: candidates, ranked = tuner.successive_halving(random_candidates(args.candidates, rng), args.min_seeds, args.seeds)
+        best_score, best, report = ranked[0]; best_policy = AgentPolicy(**candidates[best])
+        # ตรวจกับ seed ที่ไม่ได้ใช้ค้นหา เพื่อไม่ให้เลือกนโยบายที่บังเอิญเข้ากับ seed ชุดค้นหา
+        held_out = range(10_000, 10_000 + args.validate_seeds)
+        default_check, best_check = (merge_results(r) for r in tuner.evaluate([{}, candidates[best]], held_out))
+        episodes = tuner.episodes_run
+        kept_default = score(best_check) > score(default_check)
+        if kept_default: best_policy = AgentPolicy() # ชนะเฉพาะ seed ชุดค้นหา: คงค่าตั้งต้นไว้
+    elapsed = time.perf_counter() - start
+    tuning = {'method': args.method, 'scenarios': args.scenario or list(DEFAULT_SCENARIOS), 'ticks': args.ticks, 'weights': DEFAULT_WEIGHTS,
+              'search_score': best_score, 'validation': {'default': {'score': score(default_check), **_summary(default_check)},
+                                                         'best': {'score': score(best_check), **_summary(best_check)}},
+              'kept_default': kept_default, 'episodes': episodes, 'seconds': round(elapsed, 2)}
+    best_policy.save(args.out, tuning=tuning)
+    print(json.dumps({'best': repr(best_policy), **tuning}, indent=2))
+    print(f"wrote {args.out} ({episodes} episodes in {elapsed:.1f}s, {episodes / elapsed:.0f} episodes/s)")
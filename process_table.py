@@ -0,0 +1,80 @@
+# filename: process_table.py
+import heapq
+
+_DEFAULT_RES = {'cpu': [1, 0], 'mem': 1}
+
+class ProcessEntry:
+    """หนึ่งโปรเซสในตาราง: PID คงที่ตลอดอายุ และเก็บโปรไฟล์ทรัพยากรของสถานะปัจจุบันไว้ (ไม่ต้องค้น resource_map ทุก tick)"""
+    __slots__ = ('pid', 'name', 'state', 'base_cpu', 'spike_cpu', 'mem', 'version', 'handle')
+    def __init__(self, pid, name, state):
+        self.pid = pid; self.name = name; self.state = state; self.version = 0; self.handle = None
+    # handle (MockProcess ที่แคชไว้) ไม่ถูก pickle: จะสร้างใหม่จาก RNG ของ sandbox ปลายทางเมื่อถูกใช้ครั้งแรก
+    def __getstate__(self): return (self.pid, self.name, self.state, self.base_cpu, self.spike_cpu, self.mem, self.version)
+    def __setstate__(self, state): self.pid, self.name, self.state, self.base_cpu, self.spike_cpu, self.mem, self.version = state; self.handle = None
+    def __repr__(self): return f"ProcessEntry(pid={self.pid}, name={self.name!r}, state={self.state!r}, mem={self.mem})"
+
+class ProcessTable:
+    """
+    ตารางโปรเซสของ sandbox: ค้นด้วยชื่อ/PID ได้ O(1), วนตามลำดับที่เปิด (ลำดับเดียวกับ dict running_apps เดิม)
+    และมี max-heap ของ mem แบบลบทีหลัง (lazy deletion) จึงหาเป้าหมายของ kill_most_mem_proc ได้ O(log n)
+    แทนการไล่ทุกโปรเซส; ใช้แทน dict 'running_apps' ใน system_state ได้โดยตรง (in, len, iter, keys, items, pop)
+    """
+    def __init__(self, resource_map, protected=(), first_pid=1000):
+        self.resource_map = resource_map; self.protected = frozenset(protected)
+        self._by_name = {}; self._by_pid = {}; self._next_pid = first_pid
+        self._heap = [] # (-mem, pid, version) ของโปรเซสที่ฆ่าได้; รายการที่ version ไม่ตรงคือรายการเก่า
+
+    def __len__(self): return len(self._by_name)
+    def __contains__(self, name): return name in self._by_name
+    def __iter__(self): return iter(self._by_name)
+    def __getitem__(self, name): return self._by_name[name]
+    def keys(self): return self._by_name.keys()
+    def values(self): return self._by_name.values()
+    def items(self): return self._by_name.items()
+    def get(self, name, default=None): return self._by_name.get(name, default)
+    def by_pid(self, pid): return self._by_pid.get(pid)
+
+    def _apply_profile(self, entry):
+        res = self.resource_map.get(entry.name, {}).get(entry.state, _DEFAULT_RES)
+        entry.base_cpu, entry.spike_cpu = res['cpu']; entry.mem = res['mem']; entry.version += 1
+        if entry.name not in self.protected:
+            heapq.heappush(self._heap, (-entry.mem, entry.pid, entry.version))
+            if len(self._heap) > 2 * len(self._by_name) + 64: self._compact()
+
+    def spawn(self, name, state='idle'):
+        """เปิดโปรเซส (ถ้าเปิดอยู่แล้วจะแค่เปลี่ยนสถานะ โดย PID และลำดับเดิมไม่เปลี่ยน)"""
+        entry = self._by_name.get(name)
+        if entry is None:
+            entry = ProcessEntry(self._next_pid, name, state); self._next_pid += 1
+            self._by_name[name] = entry; self._by_pid[entry.pid] = entry
+        else:
+            entry.state = state
+        self._apply_profile(entry); return entry
+
+    def set_state(self, name, state):
+        entry = self._by_name.get(name)
+        if entry is not None: entry.state = state; self._apply_profile(entry)
+        return entry
+
+    def pop(self, name, default=None):
+        """ปิดโปรเซส; รายการใน heap จะถูกทิ้งตอนที่ขึ้นมาอยู่บนสุด"""
+        entry = self._by_name.pop(name, None)
+        if entry is None: return default
+        del self._by_pid[entry.pid]; return entry
+
+    def refresh(self):
+        """คำนวณโปรไฟล์ของทุกโปรเซสใหม่ (เรียกหลังแก้ resource_map ระหว่างรัน)"""
+        for entry in self._by_name.values(): self._apply_profile(entry)
+        self._compact()
+
+    def _compact(self):
+        self._heap = [(-e.mem, e.pid, e.version) for e in self._by_name.values() if e.name not in self.protected]; heapq.heapify(self._heap)
+
+    def top_mem(self):
+        """โปรเซสที่ฆ่าได้ซึ่งใช้ mem สูงสุดตามสถานะปัจจุบัน (เสมอกันเลือก PID ต่ำสุด = เปิดก่อน) หรือ None"""
+        heap = self._heap
+        while heap:
+            _, pid, version = heap[0]; entry = self._by_pid.get(pid)
+            if entry is not None and entry.version == version: return entry
+            heapq.heappop(heap)
+        return None
@@ -0,0 +1,227 @@
+# filename: procfs_backend.py
+import argparse, collections, errno, os, time
+from logger import Logger
+
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_FD_EXHAUSTED = (errno.EMFILE, errno.ENFILE) # fd ของโปรเซส/ระบบเต็ม (ต่างจากโปรเซสเป้าหมายจบไปแล้ว)
+
+def _default_fd_limit():
+    """จำนวน fd ของ /proc/<pid>/stat ที่เปิดค้างได้: หนึ่งในสี่ของ RLIMIT_NOFILE (soft) แต่ไม่เกิน 1024"""
+    try:
+        import resource
+        soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    except (ImportError, OSError, ValueError): return 256
+    return 1024 if soft == resource.RLIM_INFINITY else max(0, min(1024, soft // 4))
+LiveMemory = collections.namedtuple('LiveMemory', ['total', 'available', 'used', 'percent'])
+
+class ProcFile:
+    """ไฟล์ใน /proc ที่เปิดค้างไว้ครั้งเดียวแล้วอ่านซ้ำด้วย pread (ไม่ต้อง open/close ทุก tick)"""
+    __slots__ = ('path', 'fd', 'size')
+    def __init__(self, path, size=4096):
+        self.path = path; self.fd = os.open(path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0)); self.size = size
+    def read(self):
+        data = os.pread(self.fd, self.size, 0)
+        while len(data) >= self.size: self.size *= 2; data = os.pread(self.fd, self.size, 0) # ไฟล์ใหญ่กว่าบัฟเฟอร์ (เช่น /proc/stat บนเครื่องหลายคอร์)
+        return data
+    def close(self):
+        if self.fd >= 0: os.close(self.fd); self.fd = -1
+
+def _read_once(path):
+    with open(path, 'rb', buffering=0) as f: return f.read()
+
+class ProcFileCache:
+    """
+    ProcFile ของไฟล์ต่อโปรเซส (เช่น /proc/<pid>/stat) ที่เปิดค้างไว้แบบ LRU ไม่เกิน limit fd; เกินจากนั้นอ่านแบบ open/read/close
+    ถ้าเปิดไม่ได้เพราะ fd เต็ม (EMFILE/ENFILE) จะปิด fd ที่แคชไว้ครึ่งหนึ่ง ลดเพดาน แล้วลองอ่านแบบไม่แคชอีกครั้ง
+    """
+    __slots__ = ('limit', '_files')
+    def __init__(self, limit=None):
+        self.limit = _default_fd_limit() if limit is None else limit; self._files = collections.OrderedDict()
+    def __len__(self): return len(self._files)
+
+    def read(self, path, size=1024):
+        files = self._files; f = files.get(path)
+        if f is not None: files.move_to_end(path); return f.read()
+        if len(files) >= self.limit:
+            if not self.limit: return _read_once(path)
+            files.popitem(last=False)[1].close()
+        try: f = ProcFile(path, size)
+        except OSError as e:
+            if e.errno not in _FD_EXHAUSTED: raise
+            self.shrink(); return _read_once(path) # ถ้ายังเต็มอยู่ OSError(EMFILE) ส่งต่อให้ผู้เรียก
+        files[path] = f; return f.read()
+
+    def shrink(self):
+        self.limit = len(self._files) // 2
+        while len(self._files) > self.limit: self._files.popitem(last=False)[1].close()
+        Logger.info("procfs: file descriptors exhausted, caching at most %d /proc stat files", self.limit)
+
+    def discard(self, path):
+        f = self._files.pop(path, None)
+        if f is not None: f.close()
+
+    def close(self):
+        for f in self._files.values(): f.close()
+        self._files.clear()
+
+def _open_optional(path):
+    try: return ProcFile(path)
+    except OSError: return None # เช่น /proc/pressure ไม่มีบนเคอร์เนลเก่าหรือถูกปิดไว้
+
+class LiveProcess:
+    """
+    มุมมองแบบ psutil.Process ของโปรเซสจริง; cpu_percent() คำนวณจาก delta ของ utime+stime เทียบกับค่าที่อ่านไว้ตอนสร้าง
+    delta ใหม่คำนวณเมื่อผ่านไปอย่างน้อย interval วินาที (สั้นกว่านั้นความละเอียดระดับ jiffy ให้ค่าเพี้ยน เช่น 100%)
+    ระหว่างนั้นคืนค่าล่าสุด (0.0 จนกว่าจะครบช่วงแรก); fd ของ stat มาจาก ProcFileCache ที่ใช้ร่วมกัน (None = เปิด/ปิดทุกครั้ง)
+    """
+    __slots__ = ('info', '_path', '_files', '_interval', '_percent', '_last_cpu', '_last_time')
+    def __init__(self, pid, name, root="/proc", files=None, interval=10 / CLK_TCK):
+        self.info = {'pid': pid, 'name': name}; self._path = f"{root}/{pid}/stat"; self._files = files; self._interval = interval
+        self._percent = 0.0; self._last_cpu = self._last_time = None
+        try: self._last_cpu = self._read_cpu(); self._last_time = time.monotonic() # baseline
+        except OSError as e:
+            if e.errno in _FD_EXHAUSTED: raise
+    @property
+    def pid(self): return self.info['pid']
+    def name(self): return self.info['name']
+
+    def _read_cpu(self):
+        data = self._files.read(self._path) if self._files is not None else _read_once(self._path)
+        fields = data.rpartition(b')')[2].split() # ชื่อโปรเซสอาจมีช่องว่าง จึงตัดจาก ')' ตัวสุดท้าย
+        return (int(fields[11]) + int(fields[12])) / CLK_TCK # utime + stime
+
+    def cpu_percent(self):
+        now = time.monotonic()
+        if self._last_time is not None and now - self._last_time < self._interval: return self._percent
+        try: cpu = self._read_cpu()
+        except OSError as e:
+            if e.errno in _FD_EXHAUSTED: raise # fd เต็ม ไม่ใช่โปรเซสจบ: อย่าซ่อนโปรเซสนี้ด้วย 0.0
+            self.close(); return 0.0 # โปรเซสจบไปแล้ว
+        if self._last_cpu is not None: self._percent = 100.0 * (cpu - self._last_cpu) / (now - self._last_time)
+        self._last_cpu = cpu; self._last_time = now
+        return self._percent
+
+    def close(self):
+        if self._files is not None: self._files.discard(self._path)
+
+class ProcfsPsutil:
+    """
+    Backend จริงที่อ่าน /proc แทน MockPsutil (ใช้กับ PanyarinNeuralAI ได้ทันที) โดยไม่ต้องใช้สิทธิ์ root:
+    /proc/stat, /proc/meminfo และ /proc/pressure/* เปิด fd ค้างไว้แล้วอ่านด้วย pread, cpu/io_wait คิดจาก delta ของตัวนับเอง
+    และชื่อโปรเซสถูกแคชตาม PID (แต่ละ tick แค่ listdir /proc เพื่อหา PID ที่เกิด/ตาย)
+    การเรียกหลายเมธอดภายใน min_interval วินาทีใช้ตัวอย่างเดียวกัน จึงหนึ่ง snapshot ของ Agent อ่านแต่ละไฟล์ครั้งเดียว
+    """
+    def __init__(self, root="/proc", min_interval=0.01, fd_limit=None):
+        self.root = root; self.min_interval = min_interval
+        self._stat = ProcFile(f"{root}/stat"); self._meminfo = ProcFile(f"{root}/meminfo")
+        self._pressure = {name: _open_optional(f"{root}/pressure/{name}") for name in ('cpu', 'memory', 'io')}
+        self._last_times = None; self._cpu_percent = 0.0; self._io_wait = 0.0; self._memory = None
+        self._sampled_at = None; self._scanned_at = None
+        self._procs = {} # pid -> LiveProcess (ชื่อถูกแคชจนกว่าโปรเซสจะจบ)
+        self._proc_files = ProcFileCache(fd_limit) # fd ของ /proc/<pid>/stat แบบ LRU จำกัดจำนวน (ไม่เกิน RLIMIT_NOFILE)
+        self._proc_interval = max(min_interval, 10 / CLK_TCK)
+        self.sample()
+
+    def close(self):
+        for f in (self._stat, self._meminfo, *self._pressure.values()):
+            if f is not None: f.close()
+        self._proc_files.close(); self._procs.clear()
+
+    def sample(self):
+        """อ่าน /proc/stat และ /proc/meminfo ใหม่หนึ่งครั้ง แล้วอัปเดต cpu_percent / io_wait / หน่วยความจำ"""
+        line = self._stat.read().split(b'\n', 1)[0].split() # "cpu user nice system idle iowait irq softirq steal ..."
+        times = [int(v) for v in line[1:9]]; total = sum(times); idle = times[3]; iowait = times[4]
+        if self._last_times is not None:
+            d_total = total - self._last_times[0]
+            if d_total > 0:
+                self._cpu_percent = 100.0 * (d_total - (idle - self._last_times[1]) - (iowait - self._last_times[2])) / d_total
+                self._io_wait = 100.0 * (iowait - self._last_times[2]) / d_total
+        self._last_times = (total, idle, iowait)
+        mem_total = mem_available = None
+        for row in self._meminfo.read().split(b'\n'):
+            if row.startswith(b'MemTotal:'): mem_total = int(row.split()[1]) * 1024
+            elif row.startswith(b'MemAvailable:'): mem_available = int(row.split()[1]) * 1024
+            if mem_total is not None and mem_available is not None: break
+        if mem_available is None: mem_available = mem_total # เคอร์เนลเก่ากว่า 3.14
+        used = mem_total - mem_available
+        self._memory = LiveMemory(mem_total, mem_available, used, 100.0 * used / mem_total if mem_total else 0.0)
+        self._sampled_at = time.monotonic()
+
+    def _fresh(self):
+        if time.monotonic() - self._sampled_at >= self.min_interval: self.sample()
+
+    def cpu_percent(self, percpu=False): self._fresh(); return self._cpu_percent
+    def io_wait(self): self._fresh(); return self._io_wait
+    def virtual_memory(self): self._fresh(); return self._memory
+    def cpu_count(self): return os.cpu_count()
+    def latest(self):
+        """ค่าจากตัวอย่างล่าสุดโดยไม่อ่าน /proc ใหม่ (ใช้แสดงผลหลัง main_loop_step)"""
+        return {'cpu_percent': self._cpu_percent, 'io_wait': self._io_wait, 'mem_percent': self._memory.percent}
+
+    def pressure(self):
+        """ค่า 'some avg10' ของ PSI ต่อทรัพยากร (หน่วย %) หรือ None ถ้าเคอร์เนลไม่มี /proc/pressure"""
+        result = {}
+        for name, f in self._pressure.items():
+            if f is None: result[name] = None; continue
+            some = f.read().split(b'\n', 1)[0].split() # "some avg10=0.00 avg60=0.00 avg300=0.00 total=0"
+            result[name] = float(some[1].partition(b'=')[2])
+        return result
+
+    def _scan(self):
+        now = time.monotonic()
+        if self._scanned_at is not None and now - self._scanned_at < self.min_interval: return
+        pids = {int(name) for name in os.listdir(self.root) if name.isdigit()}; procs = self._procs
+        for pid in procs.keys() - pids: procs.pop(pid).close()
+        for pid in pids - procs.keys():
+            try:
+                with open(f"{self.root}/{pid}/comm", 'rb') as f: name = f.read().strip().decode(errors='replace')
+            except OSError as e:
+                if e.errno in _FD_EXHAUSTED: raise
+                continue # จบไปก่อนที่จะอ่านได้
+            procs[pid] = LiveProcess(pid, name, self.root, self._proc_files, self._proc_interval)
+        self._scanned_at = now
+
+    def running_app_names(self): self._scan(); return {proc.info['name'] for proc in self._procs.values()}
+    def process_iter(self, attrs=None): self._scan(); return iter(list(self._procs.values()))
+
+class DryRunSubprocess:
+    """ตัวรัน Action ของ backend จริง: ตรวจชื่อ Action แล้ว Log คำสั่งที่จะรันโดยไม่แก้ไขระบบจริง (ไม่ต้องใช้สิทธิ์ root)"""
+    COMMANDS = {
+        'set_governor': "cpupower frequency-set -g {governor}",
+        'drop_caches': "sync; echo 3 > /proc/sys/vm/drop_caches",
+        'renice_high_cpu': "renice -n -5 -p <top cpu pids>",
+        'kill_most_mem_proc': "kill -TERM <top memory pid>",
+    }
+    def __init__(self, history=1000):
+        self.counters = {'attempts': 0, 'failures': 0, 'kills': 0}
+        self.history = collections.deque(maxlen=history) # (time, action, params, command) ล่าสุด
+    def run(self, action_name, params):
+        self.counters['attempts'] += 1
+        template = self.COMMANDS.get(action_name)
+        if template is None: self.counters['failures'] += 1; raise ValueError(f"Unknown action '{action_name}'")
+        try: command = template.format(**params)
+        except KeyError as e: self.counters['failures'] += 1; raise ValueError(f"Action '{action_name}' is missing parameter {e}") from None
+        Logger.action("DRY-RUN (not executed): %s", command)
+        self.history.append((time.time(), action_name, dict(params), command))
+
+if __name__ == "__main__":
+    from isolated_agent import PanyarinNeuralAI
+    parser = argparse.ArgumentParser(description="Run the agent against this host's /proc (actions are dry-run only)")
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between ticks")
+    parser.add_argument("--async-actions", action="store_true", help="run actions on an ActionExecutor thread pool instead of inside the tick")
+    parser.add_argument("--bench", type=int, default=0, metavar="N", help="only time N system snapshots and exit")
+    args = parser.parse_args()
+    psutil = ProcfsPsutil(); subprocess = DryRunSubprocess(); executor = None
+    if args.async_actions: from action_executor import ActionExecutor; executor = ActionExecutor(subprocess)
+    ai = PanyarinNeuralAI(psutil_mock=psutil, subprocess_mock=subprocess, executor=executor)
+    if args.bench:
+        ai.get_system_snapshot(); start = time.perf_counter()
+        for _ in range(args.bench): psutil._sampled_at = psutil._scanned_at = float('-inf'); ai.get_system_snapshot() # บังคับอ่านใหม่ทุกครั้ง
+        elapsed = (time.perf_counter() - start) / args.bench
+        print(f"{len(psutil._procs)} processes: {elapsed * 1e6:.1f} us per uncached snapshot"); raise SystemExit
+    for tick in range(args.ticks):
+        ai.main_loop_step(); snap = psutil.latest()
+        print(f"tick {tick + 1}: cpu {snap['cpu_percent']:.1f}% mem {snap['mem_percent']:.1f}% io_wait {snap['io_wait']:.1f}% "
+              f"psi {psutil.pressure()} strategy {ai.current_strategy.name}")
+        time.sleep(args.interval)
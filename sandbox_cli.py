@@ -0,0 +1,106 @@
+# filename: sandbox_cli.py
+import time
+_STARTED = time.perf_counter() # ก่อน import อื่น ๆ ทั้งหมด เพื่อวัดเวลาที่ใช้ import โมดูลของ sandbox
+import argparse, json, os, sys
+from clock import VirtualClock
+from logger import Logger, ConsoleSink, JsonlSink, NullSink, BufferedSink, LEVEL_NAMES
+from simulation_env import SimulationEnvironment
+from isolated_agent import PanyarinNeuralAI, Strategy
+from scenario import ScenarioScheduler
+_IMPORTED = time.perf_counter()
+# GUI (customtkinter/tkinter), numpy, metrics HTTP server, trace และ policy file ถูก import เฉพาะเมื่อเลือกใช้ผ่าน flag
+
+def process_age():
+    """วินาทีตั้งแต่โปรเซสเริ่ม (รวมเวลาเริ่ม interpreter) จาก /proc; None บนระบบที่ไม่มี /proc"""
+    try:
+        with open("/proc/self/stat", "rb") as f: start_ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+        with open("/proc/uptime", "rb") as f: uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError): return None
+
+def make_sink(spec):
+    """'console', 'null', 'jsonl' (stdout) หรือ 'jsonl:PATH' (เขียนผ่าน BufferedSink ไม่บล็อก tick)"""
+    if spec == "console": return ConsoleSink()
+    if spec == "null": return NullSink()
+    if spec == "jsonl": return JsonlSink(sys.stdout)
+    if spec.startswith("jsonl:"): return BufferedSink(JsonlSink(spec[6:]))
+    raise ValueError(f"Unknown sink {spec!r} (expected console, null, jsonl or jsonl:PATH)")
+
+def run(ticks=60, speed=0.0, seed=None, scenario="demo", quiet=False, trace=None, policy=None, metrics=None):
+    """
+    รัน sandbox แบบ headless ด้วย VirtualClock (1 tick = 1 วินาทีของ sandbox) ผลจึงขึ้นกับ seed เท่านั้น
+    speed = จำนวน tick ต่อวินาทีจริง (0 = เร็วที่สุดเท่าที่ทำได้) คืน dict สรุปผลของ run
+    """
+    setup_start = time.perf_counter(); clock = VirtualClock()
+    env = SimulationEnvironment(clock=clock, seed=seed)
+    ai = PanyarinNeuralAI(psutil_mock=env.psutil_mock, subprocess_mock=env.subprocess_mock, clock=clock, metrics=metrics, policy=policy)
+    scheduler = ScenarioScheduler(); scheduler.schedule(scenario)
+    recorder = None
+    if trace is not None:
+        from tick_trace import TraceRecorder
+        recorder = TraceRecorder(trace)
+    dashboard = None
+    if not quiet: from main_simulator import print_dashboard as dashboard
+    strategy_seconds = {s.name: 0.0 for s in Strategy}; mem_over_90 = 0; first_tick = None
+    run_start = time.perf_counter(); interval = 1.0 / speed if speed > 0 else 0.0; deadline = run_start
+    for tick in range(1, ticks + 1):
+        scheduler.run_due(env, tick); env.update_system_load(); ai.main_loop_step()
+        if recorder is not None: recorder.record(env.state, ai)
+        strategy_seconds[ai.current_strategy.name] += 1.0; mem_over_90 += env.state['mem_percent'] > 90
+        if first_tick is None: first_tick = time.perf_counter()
+        if dashboard is not None: print(f"\n--- Tick {tick} ---"); dashboard(env, ai)
+        clock.advance(1.0)
+        if interval:
+            deadline += interval; delay = deadline - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+    end = time.perf_counter()
+    if recorder is not None: recorder.close()
+    counters = env.subprocess_mock.counters; age = process_age()
+    return {'scenario': scenario if isinstance(scenario, str) else scenario.name, 'seed': seed, 'ticks': ticks,
+            'final_strategy': ai.current_strategy.name, 'strategy_seconds': strategy_seconds, 'ticks_mem_over_90': mem_over_90,
+            'action_attempts': counters['attempts'], 'action_failures': counters['failures'], 'kills': counters['kills'],
+            'timing_ms': {'imports': 1e3 * (_IMPORTED - _STARTED), 'setup': 1e3 * (run_start - setup_start),
+                          'first_tick': 1e3 * (first_tick - run_start) if first_tick is not None else None, 'run': 1e3 * (end - run_start),
+                          'process_start_to_first_tick': 1e3 * (age - (end - first_tick)) if age is not None and first_tick is not None else None}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sandbox_cli", description="Run the Panyarin AI sandbox headless (fast start, no GUI imports)")
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--speed", type=float, default=0.0, help="ticks per wall-clock second (0 = as fast as possible)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the sandbox RNG (default: nondeterministic)")
+    parser.add_argument("--scenario", default="demo", help="bundled scenario name or path to a scenario file")
+    parser.add_argument("--sink", default="console", help="log output: console, null, jsonl (stdout) or jsonl:PATH")
+    parser.add_argument("--log-level", choices=[n for n in LEVEL_NAMES.values() if n != "OFF"], default=None)
+    parser.add_argument("--quiet", action="store_true", help="no per-tick dashboard or log lines, only the final summary")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--trace", default=None, help="record every tick into this trace directory (tick_trace)")
+    parser.add_argument("--policy", default=None, help="agent policy file (default: $PANYARIN_POLICY or built-in thresholds)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve agent metrics in Prometheus format on this port")
+    parser.add_argument("--gui", action="store_true", help="open the desktop control room instead (imports customtkinter)")
+    args = parser.parse_args(argv)
+    if args.gui:
+        from gui_simulator import PanyarinAIControlRoom
+        from clock import make_clock
+        PanyarinAIControlRoom(clock=make_clock(virtual=True)).mainloop(); return 0
+    level = {name: value for value, name in LEVEL_NAMES.items()}.get(args.log_level)
+    # --quiet ปิด Log ด้วย (เว้นแต่เลือก sink อื่นที่ไม่ใช่ console ไว้เอง)
+    Logger.configure(NullSink() if args.quiet and args.sink == "console" else make_sink(args.sink), level)
+    policy = metrics = None
+    if args.policy:
+        from policy import load_policy
+        policy = load_policy(args.policy)
+    if args.metrics_port is not None:
+        from metrics import AgentMetrics
+        metrics = AgentMetrics(); metrics.serve(args.metrics_port)
+    summary = run(args.ticks, args.speed, args.seed, args.scenario, args.quiet or args.sink != "console", args.trace, policy, metrics)
+    Logger.flush()
+    if args.json: print(json.dumps(summary, indent=2)); return 0
+    t = summary['timing_ms']; cold = t['process_start_to_first_tick']
+    print(f"{summary['scenario']}: {summary['ticks']} ticks, final strategy {summary['final_strategy']}, mem>90% {summary['ticks_mem_over_90']} ticks, "
+          f"actions {summary['action_attempts']} ({summary['action_failures']} failed, {summary['kills']} kills)")
+    print(f"startup: imports {t['imports']:.1f}ms, setup {t['setup']:.1f}ms, first tick {t['first_tick']:.2f}ms"
+          + (f", process start to first tick {cold:.1f}ms" if cold is not None else "") + f" | run {t['run']:.1f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# filename: scenario.py
+import argparse, heapq, itertools, json, os, sys
+from logger import Logger
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+
+# action -> (method ของ env, ฟิลด์ที่ต้องมี, ฟิลด์ที่ไม่บังคับพร้อมค่าเริ่มต้น)
+ACTIONS = {
+    'add_app': ('add_app', ('app',), {'state': 'idle'}),
+    'remove_app': ('remove_app', ('app',), {}),
+    'set_app_state': ('set_app_state', ('app', 'state'), {}),
+    'trigger_memory_stress': ('trigger_memory_stress', (), {'level': 95.0}),
+    'trigger_io_stress': ('trigger_io_stress', (), {'level': 40.0}),
+    'close_all_apps': ('close_all_apps', (), {}),
+    'log': (None, (), {}), # แสดงข้อความ message อย่างเดียว
+}
+
+class Scenario:
+    """
+    Scenario ที่คอมไพล์แล้ว: events เป็นรายการ (tick, method, args, message) เรียงตาม tick
+    tick นับจากจุดเริ่ม Scenario (1 tick = 1 วินาทีใน GUI) จึงเล่นได้ทั้งความเร็ว GUI และเร็วที่สุดเท่าที่ CPU ทำได้
+    """
+    def __init__(self, name, events, description="", duration=None, expect=None):
+        self.name = name; self.description = description; self.expect = expect or {}
+        self.events = sorted(events, key=lambda e: e[0])
+        self.duration = duration if duration is not None else (self.events[-1][0] if self.events else 0)
+
+    @classmethod
+    def from_dict(cls, data, name=None):
+        name = data.get('name') or name or "unnamed"; events = []
+        for i, raw in enumerate(data.get('events', ())):
+            action = raw.get('action')
+            if action not in ACTIONS: raise ValueError(f"Scenario '{name}' event #{i}: unknown action {action!r} (expected one of {sorted(ACTIONS)})")
+            tick = raw.get('tick')
+            if not isinstance(tick, int) or tick < 0: raise ValueError(f"Scenario '{name}' event #{i}: 'tick' must be a non-negative integer")
+            method, required, optional = ACTIONS[action]
+            missing = [f for f in required if f not in raw]
+            if missing: raise ValueError(f"Scenario '{name}' event #{i} ({action}): missing field(s) {missing}")
+            args = tuple(raw[f] for f in required) + tuple(raw.get(f, default) for f, default in optional.items())
+            events.append((tick, method, args, raw.get('message')))
+        return cls(name, events, data.get('description', ""), data.get('duration'), data.get('expect'))
+
+def load_scenario(path_or_name):
+    """โหลด Scenario จากไฟล์ .json/.yaml หรือจากชื่อของ Scenario ที่มากับโปรเจกต์ (โฟลเดอร์ scenarios/)"""
+    path = path_or_name
+    if not os.path.exists(path):
+        for ext in ('.json', '.yaml', '.yml'):
+            candidate = os.path.join(SCENARIO_DIR, path_or_name + ext)
+            if os.path.exists(candidate): path = candidate; break
+        else: raise FileNotFoundError(f"Scenario '{path_or_name}' not found (looked for a file and in {SCENARIO_DIR})")
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(('.yaml', '.yml')):
+            try: import yaml
+            except ImportError: raise ImportError("PyYAML is required for YAML scenarios (pip install pyyaml)") from None
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return Scenario.from_dict(data, name=os.path.splitext(os.path.basename(path))[0])
+
+def list_scenarios():
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(SCENARIO_DIR) if f.endswith(('.json', '.yaml', '.yml')))
+
+class ScenarioScheduler:
+    """
+    ตัวจัดลำดับเหตุการณ์แบบ heap ที่ front-end ทุกตัวใช้ร่วมกัน: schedule() ใส่ Scenario ทั้งชุดโดยอ้างอิง tick เริ่มต้น
+    แล้ว run_due(env, tick) เรียกทุกเหตุการณ์ที่ถึงกำหนดก่อน env.update_system_load() ของ tick นั้น
+    """
+    def __init__(self):
+        self._heap = []; self._seq = itertools.count(); self._active = {}
+
+    def __len__(self): return len(self._heap)
+
+    # itertools.count เลิกรองรับ pickle (Python 3.14) จึงเก็บเป็นเลขลำดับถัดไปแทน (ใช้กับ checkpoint)
+    def __getstate__(self): return (self._heap, next(self._seq), self._active)
+    def __setstate__(self, state): self._heap, seq, self._active = state; self._seq = itertools.count(seq)
+
+    def schedule(self, scenario, start_tick=0):
+        if isinstance(scenario, str): scenario = load_scenario(scenario)
+        for tick, method, args, message in scenario.events:
+            heapq.heappush(self._heap, (start_tick + tick, next(self._seq), method, args, message))
+        # เหตุการณ์ปิดท้าย: บอกว่า Scenario จบแล้ว (ใช้แสดงสถานะใน GUI)
+        heapq.heappush(self._heap, (start_tick + scenario.duration, next(self._seq), None, scenario.name, None))
+        self._active[scenario.name] = self._active.get(scenario.name, 0) + 1
+        return scenario
+
+    def active_names(self): return frozenset(self._active)
+    def next_tick(self): return self._heap[0][0] if self._heap else None
+
+    def run_due(self, env, tick):
+        fired = 0; heap = self._heap
+        while heap and heap[0][0] <= tick:
+            _, _, method, args, message = heapq.heappop(heap)
+            if message: Logger.scenario(message)
+            if method is not None: getattr(env, method)(*args); fired += 1
+            elif isinstance(args, str): # เหตุการณ์ปิดท้ายของ Scenario
+                self._active[args] -= 1
+                if not self._active[args]: del self._active[args]
+        return fired
+
+def check_expectations(scenario, result):
+    """เทียบผลของ episode กับบล็อก expect ของ Scenario แล้วคืนรายการข้อผิดพลาด"""
+    problems = []; expect = scenario.expect
+    if 'final_strategy' in expect and result['final_strategy'] != expect['final_strategy']:
+        problems.append(f"final_strategy {result['final_strategy']} != {expect['final_strategy']}")
+    for key, actual in (('max_ticks_mem_over_90', result['ticks_mem_over_90']), ('max_kills', result['kills']), ('max_action_failures', result['action_failures'])):
+        if key in expect and actual > expect[key]: problems.append(f"{key[4:]} {actual} > {expect[key]}")
+    return problems
+
+if __name__ == "__main__":
+    from montecarlo import run_episode
+    parser = argparse.ArgumentParser(description="Run scenario files headless as a regression library")
+    parser.add_argument("scenarios", nargs="*", help="scenario files or bundled names (default: every bundled scenario)")
+    parser.add_argument("--seeds", type=int, default=3, help="seeds 0..N-1 per scenario")
+    parser.add_argument("--ticks", type=int, default=None, help="ticks per episode (default: scenario duration + 20)")
+    args = parser.parse_args()
+    failures = 0
+    for name in args.scenarios or list_scenarios():
+        scenario = load_scenario(name); ticks = args.ticks or scenario.duration + 20; failed = 0
+        for seed in range(args.seeds):
+            problems = check_expectations(scenario, run_episode(scenario, seed, ticks))
+            if problems: failed += 1; print(f"FAIL {scenario.name} seed={seed}: " + "; ".join(problems))
+        print(f"{'FAIL' if failed else 'ok  '} {scenario.name} ({args.seeds - failed}/{args.seeds} seeds)"); failures += failed
+    sys.exit(1 if failures else 0)
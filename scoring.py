@@ -0,0 +1,86 @@
+# filename: scoring.py
+import bisect, collections, json, os
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_rules.json")
+_loaded = {}
+
+def load_rules(path=None):
+    """ตารางกฎจาก path (ค่าเริ่มต้น scoring_rules.json ข้างโมดูลนี้) แคชตามพาธ เพราะ fleet สร้าง Agent หลายพันตัว"""
+    path = path or RULES_PATH
+    rules = _loaded.get(path)
+    if rules is None:
+        with open(path, encoding="utf-8") as f: rules = _loaded[path] = json.load(f)
+    return rules
+
+class ScoringEngine:
+    """
+    คอมไพล์ตารางกฎของ strategic_assessment (scoring_rules.json) เป็นเวกเตอร์คะแนนตามลำดับกลยุทธ์:
+    - กฎแอป (any_of) แต่ละข้อเป็นหนึ่งบิต; ชุดแอปที่ทำงานกลายเป็น bitmap ของกฎที่เข้าเงื่อนไข
+    - เกณฑ์ cpu / จำนวนแอปถูกรวมเป็น bucket (ตำแหน่งเทียบกับเกณฑ์ทั้งหมด) จึงได้ผลเหมือนเทียบค่าจริงทุกประการ
+    ผลลัพธ์ (scores, กลยุทธ์ที่ชนะ, สถานะ I/O) ถูกแคชแบบ LRU ตาม (bitmap, bucket จำนวนแอป, bucket cpu, สถานะ I/O, weights_version)
+    tick ที่สถานะไม่เปลี่ยนจึงแทบไม่ต้องคำนวณ; ผู้ที่แก้ strategy_weights ต้องเพิ่ม weights_version (learning_cycle ทำให้เอง)
+    """
+    def __init__(self, rules, policy, strategies, maxsize=256):
+        self.strategies = tuple(strategies); index = {s.name: i for i, s in enumerate(self.strategies)}
+        def vector(scores, where):
+            unknown = set(scores) - set(index)
+            if unknown: raise ValueError(f"Scoring rule {where}: unknown strategy {sorted(unknown)} (expected one of {list(index)})")
+            v = [0] * len(index)
+            for name, value in scores.items(): v[index[name]] = value
+            return v
+        def value(v, where):
+            if isinstance(v, str):
+                if not hasattr(policy, v): raise ValueError(f"Scoring rule {where}: unknown policy parameter {v!r}")
+                return getattr(policy, v)
+            return v
+
+        self.base = vector(rules.get('base', {}), "base")
+        self.app_bits = {} # แอป -> bitmask ของกฎแอปที่แอปนี้อยู่
+        self.app_vectors = []
+        for i, rule in enumerate(rules.get('apps', ())):
+            for app in rule['any_of']: self.app_bits[app] = self.app_bits.get(app, 0) | 1 << i
+            self.app_vectors.append(vector(rule['scores'], f"apps[{i}]"))
+        self._app_items = tuple(self.app_bits.items())
+        self.cpu_rules = [] # (เกณฑ์ที่ cpu ต้องสูงกว่า, เกณฑ์ที่ cpu ต้องต่ำกว่า, จำนวนแอปต้องน้อยกว่า, เวกเตอร์)
+        for i, rule in enumerate(rules.get('cpu', ())):
+            where = f"cpu[{i}]"
+            above = value(rule['above'], where) if 'above' in rule else None; below = value(rule['below'], where) if 'below' in rule else None
+            fewer = value(rule['fewer_apps_than'], where) if 'fewer_apps_than' in rule else None
+            self.cpu_rules.append((above, below, fewer, vector(rule['scores'], where)))
+        self.cpu_thresholds = sorted({t for above, below, _, _ in self.cpu_rules for t in (above, below) if t is not None})
+        self.count_thresholds = sorted({fewer for _, _, fewer, _ in self.cpu_rules if fewer is not None})
+        dampers = rules.get('io_dampers', {}); vector(dampers, "io_dampers")
+        self.dampers = tuple((index[name], value(v, "io_dampers")) for name, v in dampers.items())
+        self.io_high = policy.io_high; self.forecast_io = policy.forecast_io
+        reasons = rules.get('reasons', {})
+        self.reasons = {s: reasons.get(s.name, "Complex assessment") for s in self.strategies}
+        self.maxsize = maxsize; self.hits = self.misses = 0; self._cache = collections.OrderedDict()
+
+    def clear(self): self._cache.clear()
+
+    def app_mask(self, apps):
+        mask = 0
+        for app, bits in self._app_items: # วนตามแอปที่มีกฎ (ไม่กี่ตัว) ไม่ใช่ตามทุกโปรเซสที่ทำงาน
+            if app in apps: mask |= bits
+        return mask
+
+    def score(self, apps, cpu, io_wait, io_forecast, weights, weights_version):
+        """คืน (scores dict, กลยุทธ์ที่คะแนนสูงสุด, สถานะ I/O: 0 ปกติ / 1 สูง / 2 คาดว่าจะสูง); scores ห้ามแก้ไข (ใช้ร่วมกันจากแคช)"""
+        io_mode = 1 if io_wait > self.io_high else 2 if self.forecast_io and io_forecast > self.io_high else 0
+        cpu_ts = self.cpu_thresholds; n_apps = len(apps)
+        key = (self.app_mask(apps), bisect.bisect_right(self.count_thresholds, n_apps), bisect.bisect_left(cpu_ts, cpu), bisect.bisect_right(cpu_ts, cpu), io_mode, weights_version)
+        cache = self._cache; entry = cache.get(key)
+        if entry is not None: cache.move_to_end(key); self.hits += 1; return entry
+        self.misses += 1
+        totals = list(self.base); mask = key[0]
+        for i, v in enumerate(self.app_vectors):
+            if mask >> i & 1: totals = [a + b for a, b in zip(totals, v)]
+        for above, below, fewer, v in self.cpu_rules:
+            if (above is None or cpu > above) and (below is None or cpu < below) and (fewer is None or n_apps < fewer):
+                totals = [a + b for a, b in zip(totals, v)]
+        if io_mode:
+            for k, damper in self.dampers: totals[k] *= damper
+        scores = {s: totals[k] * weights[s] for k, s in enumerate(self.strategies)}
+        entry = cache[key] = (scores, max(scores, key=scores.get), io_mode)
+        if len(cache) > self.maxsize: cache.popitem(last=False)
+        return entry
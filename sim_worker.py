@@ -0,0 +1,73 @@
+# filename: sim_worker.py
+import collections, queue, threading, time
+from scenario import ScenarioScheduler
+
+# สถานะที่ UI ใช้วาด Dashboard (immutable: worker สร้างใหม่ทุก tick แล้วสลับ reference)
+DashboardSnapshot = collections.namedtuple('DashboardSnapshot', [
+    'tick', 'cpu_percent', 'mem_percent', 'io_wait', 'governor', 'strategy', 'failures', 'trigger_reason', 'running_apps', 'active_scenarios'])
+
+SIM_SECONDS_PER_TICK = 1.0 # เวลาของ sandbox ต่อ tick (เท่ากับ headless runner / Monte Carlo)
+
+class SimulationWorker(threading.Thread):
+    """
+    รัน env.update_system_load() + ai.main_loop_step() บน thread ของตัวเอง แล้วเผยแพร่ DashboardSnapshot ล่าสุดใน self.latest
+    การแก้ไข env จาก thread อื่น (ปุ่ม/Scenario ของ GUI) ต้องส่งผ่าน submit() เพื่อให้ทำงานบน worker thread ระหว่าง tick
+    tick_interval คือเวลาจริงระหว่าง tick (0 = เร็วที่สุดเท่าที่ทำได้); ถ้าใช้ VirtualClock จะเลื่อนเวลา sim_seconds_per_tick ต่อ tick
+    sim_seconds_per_tick ไม่ขึ้นกับ tick_interval: Scenario ให้ผลเหมือนกันทุกความเร็ว (รวมถึง 0 ที่ไม่เช่นนั้นเวลาจะไม่เดินเลย)
+    """
+    def __init__(self, env, ai, tick_interval=1.0, sim_seconds_per_tick=SIM_SECONDS_PER_TICK, clock=None):
+        super().__init__(name="simulation-worker", daemon=True)
+        self.env = env; self.ai = ai; self.clock = clock or ai.clock
+        self.tick_interval = tick_interval; self.sim_seconds_per_tick = sim_seconds_per_tick
+        self.running = False; self.ticks_per_second = 0.0
+        self._commands = queue.SimpleQueue(); self._wakeup = threading.Event(); self._stopped = False
+        self.scheduler = ScenarioScheduler() # ใช้เฉพาะบน worker thread (ผ่าน schedule_scenario)
+        self.latest = self._snapshot()
+
+    def submit(self, fn, *args, **kwargs):
+        """ขอให้เรียก fn(*args, **kwargs) บน worker thread ก่อน tick ถัดไป (ทำงานแม้หยุดจำลองอยู่)"""
+        self._commands.put((fn, args, kwargs)); self._wakeup.set()
+
+    def schedule_scenario(self, scenario):
+        """เริ่ม Scenario (ชื่อ/พาธ/อ็อบเจกต์) โดยนับ tick ต่อจาก tick ปัจจุบัน; เหตุการณ์ tick 0 ทำงานก่อน tick ถัดไป"""
+        self.submit(lambda: self.scheduler.schedule(scenario, start_tick=self.ai.tick_counter + 1))
+
+    def set_running(self, running):
+        self.running = running; self._wakeup.set()
+
+    def stop(self):
+        self._stopped = True; self._wakeup.set()
+
+    def _snapshot(self):
+        state = self.env.state; ai = self.ai
+        return DashboardSnapshot(ai.tick_counter, state['cpu_percent'], state['mem_percent'], state['io_wait'], state['governor'],
+                                 ai.current_strategy, len(ai.failure_tracker), ai.last_trigger_reason, frozenset(state['running_apps']),
+                                 self.scheduler.active_names())
+
+    def _run_commands(self):
+        """คืน True ถ้ามีคำสั่งถูกเรียก"""
+        ran = False
+        while True:
+            try: fn, args, kwargs = self._commands.get_nowait()
+            except queue.Empty: return ran
+            fn(*args, **kwargs); ran = True
+
+    def step(self):
+        if self.clock.is_virtual: self.clock.advance(self.sim_seconds_per_tick)
+        self.scheduler.run_due(self.env, self.ai.tick_counter + 1)
+        self.env.update_system_load(); self.ai.main_loop_step()
+        self.latest = self._snapshot()
+
+    def run(self):
+        next_tick = time.monotonic(); window_start = next_tick; window_ticks = 0
+        while not self._stopped:
+            if self._run_commands() and not self.running: self.latest = self._snapshot() # หยุดอยู่: แสดงผลของปุ่มทันทีโดยไม่ต้องรอ tick
+            if not self.running:
+                self._wakeup.wait(); self._wakeup.clear(); next_tick = time.monotonic(); continue
+            now = time.monotonic()
+            if now < next_tick:
+                self._wakeup.wait(next_tick - now); self._wakeup.clear(); continue
+            self.step(); window_ticks += 1
+            if now - window_start >= 1.0: self.ticks_per_second = window_ticks / (now - window_start); window_start = now; window_ticks = 0
+            # ถ้าตามไม่ทัน ไม่พยายามชดเชย tick ที่เลยมาแล้ว
+            next_tick = max(next_tick + self.tick_interval, now)
@@ -1,15 +1,22 @@
 # filename: simulation_env.py
-import random, time
+import random
 from logger import Logger
+from clock import RealClock
+from process_table import ProcessTable
+
+PROTECTED_APPS = frozenset({'python3', 'cinnamon'}) # โปรเซสระบบที่ไม่ถูกปิด/ฆ่า
 
 class MockSubprocess:
-    def __init__(self, system_state): self.system_state = system_state
+    def __init__(self, system_state, rng=None):
+        self.system_state = system_state; self.rng = rng or random.Random()
+        self.counters = {'attempts': 0, 'failures': 0, 'kills': 0} # สถิติสำหรับการสรุปผลการจำลอง
     def run(self, action_name, params):
-        cmd_str = f"Action: {action_name} with params: {params}"
-        Logger.action(f"Attempting to execute: '{cmd_str}'")
+        Logger.action("Attempting to execute: 'Action: %s with params: %s'", action_name, params)
+        self.counters['attempts'] += 1
         
         # ทำให้ Action มีโอกาสล้มเหลวเมื่อระบบเครียด
-        if self.system_state['system_stress_factor'] > 1.2 and random.random() < 0.3:
+        if self.system_state['system_stress_factor'] > 1.2 and self.rng.random() < 0.3:
+            self.counters['failures'] += 1
             raise PermissionError("Action failed due to high system stress!")
 
         if action_name == "set_governor": self.system_state['governor'] = params['governor']
@@ -19,48 +26,54 @@ class MockSubprocess:
             self.system_state['mem_percent'] = max(20.0, self.system_state['mem_percent'] - mem_reduction)
         elif action_name == "renice_high_cpu": pass # จำลองว่าสำเร็จ
         elif action_name == "kill_most_mem_proc":
-            # หาโปรเซสที่ใช้ mem สูงสุด (ที่ไม่ใช่ process ระบบ) แล้วฆ่าทิ้ง
-            apps = self.system_state['running_apps']
-            mem_map = self.system_state['resource_map']
-            user_apps = {name: data for name, data in apps.items() if name not in {'python3', 'cinnamon'}}
-            if not user_apps: return
-            
-            app_to_kill = max(user_apps.keys(), key=lambda app: mem_map.get(app, {}).get('active', {}).get('mem', 0))
-            Logger.action(f"Killing '{app_to_kill}' to free up memory.")
-            apps.pop(app_to_kill, None)
+            # หาโปรเซสที่ใช้ mem สูงสุด (ที่ไม่ใช่ process ระบบ) จาก heap ของตารางโปรเซส แล้วฆ่าทิ้ง
+            apps = self.system_state['running_apps']; target = apps.top_mem()
+            if target is None: return
+            Logger.action("Killing '%s' (pid %d) to free up memory.", target.name, target.pid)
+            apps.pop(target.name); self.counters['kills'] += 1
+
+class MockProcess:
+    """มุมมองแบบ psutil.Process ของ ProcessEntry (สร้างครั้งเดียวต่อโปรเซสแล้วใช้ซ้ำ เหมือนที่ psutil แคช Process ตาม PID)"""
+    __slots__ = ('info', '_entry', '_rng')
+    def __init__(self, entry, rng):
+        self.info = {'name': entry.name, 'pid': entry.pid}; self._entry = entry; self._rng = rng
+    @property
+    def pid(self): return self._entry.pid
+    def name(self): return self._entry.name
+    def status(self): return self._entry.state
+    def cpu_percent(self):
+        # เพิ่ม CPU Spike แบบสุ่ม
+        entry = self._entry; rng = self._rng
+        current_cpu = entry.base_cpu + rng.uniform(-2, 2)
+        if rng.random() < 0.1: current_cpu += entry.spike_cpu
+        return current_cpu
+    def memory_percent(self): return self._entry.mem
 
 class MockPsutil:
-    def __init__(self, system_state):
-        self.system_state = system_state; self.total_memory_gb = 16.0 
+    def __init__(self, system_state, rng=None):
+        self.system_state = system_state; self.total_memory_gb = 16.0; self.rng = rng or random.Random()
     def cpu_percent(self, percpu=False): return self.system_state['cpu_percent']
     def virtual_memory(self):
         class MockMem:
             def __init__(self, state, total_mem):
                 self.percent = state['mem_percent']; self.total = total_mem * (1024**3); self.used = self.total * (self.percent / 100)
         return MockMem(self.system_state, self.total_memory_gb)
-    def process_iter(self, attrs):
-        # ... ไม่เปลี่ยนแปลงจากเวอร์ชันก่อน ...
-        processes = []
-        for app_name, app_data in self.system_state['running_apps'].items():
-            class MockProcess:
-                def __init__(self, name, state, resource_map): 
-                    self.info = {'name': name, 'pid': random.randint(1000, 20000)}; self._state = state; self._resource_map = resource_map
-                def cpu_percent(self):
-                    res_map = self._resource_map.get(self.info['name'], {})
-                    state_res = res_map.get(self._state, {'cpu': [1,0], 'mem': 1})
-                    base_cpu, spike = state_res['cpu']
-                    # เพิ่ม CPU Spike แบบสุ่ม
-                    current_cpu = base_cpu + random.uniform(-2, 2)
-                    if random.random() < 0.1: current_cpu += spike
-                    return current_cpu
-            processes.append(MockProcess(app_name, app_data['state'], self.system_state['resource_map']))
-        return processes
+    def process_iter(self, attrs=None):
+        # PID คงที่ระหว่างการเรียก และอ็อบเจกต์ MockProcess ถูกแคชไว้ในแต่ละ ProcessEntry
+        rng = self.rng
+        for entry in list(self.system_state['running_apps'].values()):
+            handle = entry.handle
+            if handle is None: handle = entry.handle = MockProcess(entry, rng)
+            yield handle
     def cpu_count(self): return 8
+    def io_wait(self): return self.system_state['io_wait']
+    def running_app_names(self): return set(self.system_state['running_apps'].keys())
 
 class SimulationEnvironment:
-    def __init__(self):
+    @staticmethod
+    def default_resource_map():
         # Resource Map: [base_cpu, spike_cpu], mem
-        self.resource_map = {
+        return {
             'cinnamon':   {'idle': {'cpu': [2, 0], 'mem': 5}}, 'python3':    {'idle': {'cpu': [1, 0], 'mem': 3}},
             'firefox':    {'idle': {'cpu': [5, 15], 'mem': 10}},
             'steam':      {'idle': {'cpu': [2, 10], 'mem': 8}, 'active': {'cpu': [40, 20], 'mem': 20}},
@@ -68,30 +81,38 @@ class SimulationEnvironment:
             'kdenlive':   {'idle': {'cpu': [4, 10], 'mem': 15}, 'active': {'cpu': [75, 20], 'mem': 35}},
             'obs':        {'idle': {'cpu': [8, 10], 'mem': 10}, 'active': {'cpu': [30, 25], 'mem': 18}},
         }
+
+    def __init__(self, clock=None, rng=None, seed=None):
+        self.clock = clock or RealClock(); Logger.set_clock(self.clock)
+        self.rng = rng or random.Random(seed) # สุ่มแยกต่อ sandbox เพื่อให้ผลซ้ำได้และแบ่งรันข้ามโปรเซสได้
+        self.resource_map = self.default_resource_map()
         self.state = {
             'cpu_percent': 5.0, 'mem_percent': 18.0, 
-            'running_apps': {'python3': {'state': 'idle'}, 'cinnamon': {'state': 'idle'}}, 
+            'running_apps': ProcessTable(self.resource_map, protected=PROTECTED_APPS),
             'governor': 'schedutil', 'resource_map': self.resource_map,
             'io_wait': 0.0, 'system_stress_factor': 1.0 # สถานะใหม่
         }
-        self.psutil_mock = MockPsutil(self.state); self.subprocess_mock = MockSubprocess(self.state)
+        self.processes = self.state['running_apps']
+        for name in ('python3', 'cinnamon'): self.processes.spawn(name)
+        self.psutil_mock = MockPsutil(self.state, self.rng); self.subprocess_mock = MockSubprocess(self.state, self.rng)
     
-    def add_app(self, app_name, state='idle'): Logger.user_action(f"Launching '{app_name}'..."); self.state['running_apps'][app_name] = {'state': state}
-    def remove_app(self, app_name): Logger.user_action(f"Closing '{app_name}'..."); self.state['running_apps'].pop(app_name, None)
+    def add_app(self, app_name, state='idle'): Logger.user_action("Launching '%s'...", app_name); self.processes.spawn(app_name, state)
+    def remove_app(self, app_name): Logger.user_action("Closing '%s'...", app_name); self.processes.pop(app_name)
     def set_app_state(self, app_name, new_state):
-        if app_name in self.state['running_apps']: self.state['running_apps'][app_name]['state'] = new_state; Logger.user_action(f"App '{app_name}' state changed to '{new_state}'")
+        if self.processes.set_state(app_name, new_state) is not None: Logger.user_action("App '%s' state changed to '%s'", app_name, new_state)
+    def close_all_apps(self):
+        for app_name in [name for name in self.processes if name not in PROTECTED_APPS]: self.remove_app(app_name)
     def trigger_memory_stress(self, level=95.0): Logger.scenario(f"Memory pressure event triggered! Setting MEM to {level}%."); self.state['mem_percent'] = level
     def trigger_io_stress(self, level=40.0): Logger.scenario(f"I/O saturation event triggered! Setting I/O Wait to {level}%."); self.state['io_wait'] = level
 
     def update_system_load(self):
         potential_cpu = 0; base_mem = 0
         
-        for app_name, app_data in self.state['running_apps'].items():
-            app_state = app_data['state']; res = self.resource_map.get(app_name, {}).get(app_state, {'cpu': [1,0], 'mem': 1})
-            base_cpu, spike = res['cpu']
-            potential_cpu += base_cpu
-            if random.random() < 0.1: potential_cpu += spike # Add spike to potential
-            base_mem += res['mem']
+        rand = self.rng.random
+        for proc in self.processes.values():
+            potential_cpu += proc.base_cpu
+            if rand() < 0.1: potential_cpu += proc.spike_cpu # Add spike to potential
+            base_mem += proc.mem
 
         # System Thrashing Logic
         if potential_cpu > 100:
@@ -105,7 +126,7 @@ class SimulationEnvironment:
             # I/O Wait ลดลงช้าๆ
             self.state['io_wait'] = max(0.0, self.state['io_wait'] - 5)
 
-        self.state['cpu_percent'] = min(99.9, actual_cpu + random.uniform(-2, 2))
+        self.state['cpu_percent'] = min(99.9, actual_cpu + self.rng.uniform(-2, 2))
         
         if self.state['mem_percent'] < 90:
-             self.state['mem_percent'] = min(99.9, base_mem + random.uniform(-1, 1))
\ No newline at end of file
+             self.state['mem_percent'] = min(99.9, base_mem + self.rng.uniform(-1, 1))
\ No newline at end of file
@@ -0,0 +1,153 @@
+# filename: tick_trace.py
+import argparse, json, mmap, os
+from isolated_agent import Event, Strategy, ACTION_NAMES
+
+GOVERNORS = ('schedutil', 'performance', 'powersave')
+# คอลัมน์: (ชื่อ, typecode ของ array/struct, จำนวนค่าต่อ tick)
+SCHEMA = (
+    ('tick', 'q', 1), ('timestamp', 'd', 1),
+    ('cpu_percent', 'f', 1), ('mem_percent', 'f', 1), ('io_wait', 'f', 1), ('stress_factor', 'f', 1),
+    ('governor', 'B', 1), ('apps', 'Q', 1), # bitmap ของแอปที่ทำงาน (บิตตามลำดับใน meta.json; บิต 63 = แอปอื่น ๆ ที่เกิน 63 ชื่อ)
+    ('strategy', 'B', 1), ('scores', 'f', len(Strategy)),
+    ('events', 'H', 1), ('actions_ok', 'B', 1), ('actions_failed', 'B', 1), # bitmask ตามลำดับของ Event / ACTION_NAMES
+)
+_ITEMSIZE = {'q': 8, 'Q': 8, 'd': 8, 'f': 4, 'H': 2, 'B': 1}
+_NUMPY_DTYPE = {'q': '<i8', 'Q': '<u8', 'd': '<f8', 'f': '<f4', 'H': '<u2', 'B': 'u1'}
+OTHER_APPS_BIT = 63
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+class TraceRecorder:
+    """
+    บันทึกสถานะ env + ผลการตัดสินใจของ Agent ทุก tick ลงไฟล์คอลัมน์ (หนึ่งไฟล์ต่อคอลัมน์) ที่ map เข้าหน่วยความจำ
+    การเขียนหนึ่ง tick คือการกำหนดค่าลง memoryview ไม่กี่ช่อง (ไม่มี syscall); ไฟล์ขยายทีละ chunk_ticks
+    จำนวน tick ที่เขียนแล้วอยู่ในไฟล์ 'count' (map เช่นกัน) จึงเปิดอ่านระหว่างที่ยังบันทึกอยู่ได้
+    """
+    def __init__(self, path, chunk_ticks=65536):
+        os.makedirs(path, exist_ok=True); self.path = path; self.chunk_ticks = chunk_ticks
+        self.app_bits = {}; self.count = 0; self.capacity = 0
+        self._files = {}; self._maps = {}; self._views = {}
+        for name, code, width in SCHEMA: self._files[name] = open(os.path.join(path, f"{name}.bin"), "w+b")
+        self._count_file = open(os.path.join(path, "count"), "w+b"); self._count_file.truncate(8)
+        self._count_map = mmap.mmap(self._count_file.fileno(), 8); self._count_view = memoryview(self._count_map).cast('q')
+        self._write_meta(); self._grow()
+
+    def _write_meta(self):
+        _write_meta(self.path, {'version': 1, 'columns': [[name, _NUMPY_DTYPE[code], width] for name, code, width in SCHEMA],
+                                'apps': sorted(self.app_bits, key=self.app_bits.get), 'strategies': [s.name for s in Strategy],
+                                'events': [e.name for e in Event], 'actions': list(ACTION_NAMES), 'governors': list(GOVERNORS)})
+
+    def _release(self):
+        for view in self._views.values(): view.release()
+        for mm in self._maps.values(): mm.close()
+        self._views.clear(); self._maps.clear()
+
+    def _grow(self):
+        self._release(); self.capacity += self.chunk_ticks
+        for name, code, width in SCHEMA:
+            f = self._files[name]; size = self.capacity * width * _ITEMSIZE[code]; f.truncate(size)
+            self._maps[name] = mmap.mmap(f.fileno(), size); self._views[name] = memoryview(self._maps[name]).cast(code)
+
+    def _app_bitmap(self, names):
+        bits = 0; app_bits = self.app_bits
+        for name in names:
+            bit = app_bits.get(name)
+            if bit is None:
+                if len(app_bits) < OTHER_APPS_BIT: bit = app_bits[name] = len(app_bits); self._write_meta()
+                else: bit = OTHER_APPS_BIT
+            bits |= 1 << bit
+        return bits
+
+    def record(self, state, ai):
+        """บันทึกหนึ่ง tick จาก env.state และ Agent (ใช้ ai.drain_tick_flags() จึงนับ Event/Action ของแต่ละ tick แยกกัน)"""
+        i = self.count
+        if i == self.capacity: self._grow()
+        v = self._views; events, ok, failed = ai.drain_tick_flags()
+        v['tick'][i] = ai.tick_counter; v['timestamp'][i] = ai.clock.now()
+        v['cpu_percent'][i] = state['cpu_percent']; v['mem_percent'][i] = state['mem_percent']
+        v['io_wait'][i] = state['io_wait']; v['stress_factor'][i] = state['system_stress_factor']
+        governor = state['governor']; v['governor'][i] = GOVERNORS.index(governor) if governor in GOVERNORS else 255
+        v['apps'][i] = self._app_bitmap(state['running_apps'])
+        v['strategy'][i] = ai.strategy_index[ai.current_strategy]
+        scores = ai.last_scores; base = i * len(Strategy); column = v['scores']
+        for k, strategy in enumerate(Strategy): column[base + k] = scores.get(strategy, 0.0)
+        v['events'][i] = events; v['actions_ok'][i] = ok; v['actions_failed'][i] = failed
+        self.count = i + 1; self._count_view[0] = self.count
+
+    def flush(self):
+        for mm in self._maps.values(): mm.flush()
+        self._count_map.flush()
+
+    def close(self):
+        if self._files is None: return
+        self.flush(); self._release()
+        for name, code, width in SCHEMA: self._files[name].truncate(self.count * width * _ITEMSIZE[code]); self._files[name].close() # ตัดส่วนที่จองไว้เกิน
+        self._count_view.release(); self._count_map.close(); self._count_file.close(); self._files = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+class TraceReader:
+    """
+    อ่าน trace แบบ zero-copy: column() คืน numpy memmap ของคอลัมน์ (ระบบปฏิบัติการโหลดเฉพาะหน้าที่ถูกแตะ)
+    iter_chunks() ไล่ทีละช่วงสำหรับ trace ขนาดหลายร้อยล้าน tick; refresh() อ่านจำนวน tick ใหม่ของ trace ที่ยังบันทึกอยู่
+    """
+    def __init__(self, path):
+        import numpy as np
+        self._np = np; self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f: self.meta = json.load(f)
+        self.columns = {name: (np.dtype(dtype), width) for name, dtype, width in self.meta['columns']}
+        self._cache = {}; self.refresh()
+
+    def refresh(self):
+        with open(os.path.join(self.path, "count"), "rb") as f: self.count = int.from_bytes(f.read(8), "little")
+        with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f: self.meta = json.load(f)
+        self._cache.clear(); return self.count
+
+    def __len__(self): return self.count
+
+    def column(self, name):
+        view = self._cache.get(name)
+        if view is None:
+            dtype, width = self.columns[name]
+            if self.count == 0: view = self._np.empty((0, width) if width > 1 else 0, dtype=dtype)
+            else:
+                shape = (self.count, width) if width > 1 else (self.count,)
+                view = self._np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode='r', shape=shape)
+            self._cache[name] = view
+        return view
+
+    def iter_chunks(self, columns=None, chunk_ticks=1 << 20):
+        """ไล่ trace ทีละ chunk_ticks tick; แต่ละรอบคืน dict ของ view (ไม่คัดลอกข้อมูล)"""
+        names = columns or list(self.columns)
+        for start in range(0, self.count, chunk_ticks):
+            yield {name: self.column(name)[start:start + chunk_ticks] for name in names}
+
+    def app_mask(self, app_name):
+        """bitmask ของแอปหนึ่งสำหรับใช้กับคอลัมน์ 'apps' (เช่น (reader.column('apps') & mask) != 0)"""
+        return self._np.uint64(1 << self.meta['apps'].index(app_name))
+
+    def event_mask(self, event_name): return 1 << self.meta['events'].index(event_name)
+    def action_mask(self, action_name): return 1 << self.meta['actions'].index(action_name)
+
+def summarize(reader, chunk_ticks=1 << 20):
+    """สรุป trace แบบ streaming (หน่วยความจำคงที่ไม่ว่า trace จะยาวแค่ไหน)"""
+    np = reader._np; strategies = np.zeros(len(reader.meta['strategies']), dtype=np.int64)
+    mem_over_90 = io_over_20 = 0; events = np.zeros(len(reader.meta['events']), dtype=np.int64); failed = np.zeros(len(reader.meta['actions']), dtype=np.int64)
+    for c in reader.iter_chunks(('strategy', 'mem_percent', 'io_wait', 'events', 'actions_failed'), chunk_ticks):
+        strategies += np.bincount(c['strategy'], minlength=len(strategies))
+        mem_over_90 += int((c['mem_percent'] > 90).sum()); io_over_20 += int((c['io_wait'] > 20).sum())
+        for bit in range(len(events)): events[bit] += int(np.count_nonzero(c['events'] & (1 << bit)))
+        for bit in range(len(failed)): failed[bit] += int(np.count_nonzero(c['actions_failed'] & (1 << bit)))
+    return {'ticks': len(reader), 'strategy_ticks': dict(zip(reader.meta['strategies'], strategies.tolist())),
+            'ticks_mem_over_90': mem_over_90, 'ticks_io_over_20': io_over_20,
+            'event_ticks': dict(zip(reader.meta['events'], events.tolist())), 'failed_action_ticks': dict(zip(reader.meta['actions'], failed.tolist()))}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise a tick trace recorded with TraceRecorder")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    print(json.dumps(summarize(TraceReader(args.path)), indent=2))